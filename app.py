@@ -1,10 +1,18 @@
+import itertools
+
 import streamlit as st
-import openai
-import config  # enthält openai_api_key, OPENAI_MODEL, OLLAMA_MODEL, TIMEZONE
-from logic.calendar import *
-from logic.parser import extract_data_from_url
-from logic import llm_client
-from logic import negotiation  # Import vorhanden (derzeit nicht für Textgenerierung genutzt)
+import config  # enthält openai_api_key (lazy), OPENAI_MODEL, OLLAMA_MODEL, TIMEZONE
+from logic import calendar as calendar_logic
+from logic import availability
+from logic import llm_client  # importiert openai/ollama erst beim ersten Aufruf
+from logic import http_cache
+from logic import llm_cache
+from logic import metrics
+from logic import ollama_backend
+from logic import prompt as prompt_logic
+from data.models import AdInfo
+# Parser (requests), Marktvergleich (NumPy) und Anzeigen-Speicher werden erst
+# beim Klick auf "Nachricht generieren" importiert – normale Reruns bleiben leicht.
 
 # ----- Seiteneinstellungen -----
 st.set_page_config(
@@ -25,47 +33,121 @@ use_openai = model_choice.startswith("OpenAI")
 if not use_openai:
     st.sidebar.warning("Lokales Modell (Ollama) erfordert eine laufende Ollama-Installation (http://localhost:11434)")
 
-# ----- Textbausteine: 15 vordefinierte Optionen -----
-text_modules = [
-    "Interesse bekunden",
-    "Preisvorschlag machen",
-    "Preis verhandelbar erfragen",
-    "Nach Zustand fragen",
-    "Verfügbarkeit prüfen",
-    "Versand/Lieferung anfragen",
-    "Garantie erfragen",
-    "Abholungstermin vorschlagen",
-    "Besichtigung erbitten",
-    "Zubehör/Umfang erfragen",
-    "Weitere Bilder anfragen",
-    "Grund des Verkaufs erfragen",
-    "Zahlungsmethode klären",
-    "Reservierung erbitten",
-    "Bundle-Angebot vorschlagen",
-]
+# ----- LLM-Router (einmal pro Server-Prozess, Statistik bleibt über Reruns erhalten) -----
+@st.cache_resource
+def get_router():
+    return llm_client.LLMRouter(backends=("ollama", "openai"))
+
+
+# ----- Ollama-Modell im Hintergrund laden, sobald Ollama gewählt ist (einmal pro Server-Prozess) -----
+# Im reinen OpenAI-Betrieb bleibt `ollama` ungeladen, außer OLLAMA_PRELOAD=1 ist gesetzt.
+@st.cache_resource
+def preload_ollama():
+    return ollama_backend.preload_default_model(force=True)
+
+
+ollama_status = preload_ollama() if not use_openai or config.OLLAMA_PRELOAD else None
+if not use_openai and ollama_status is not None:
+    status = ollama_status.status()
+    if status["state"] == "ready":
+        load = f" (Laden {status['load_s']:.1f} s)" if status["load_s"] else ""
+        st.sidebar.caption(f"Modell {status['model']} geladen{load}, bleibt {status['keep_alive']} im Speicher.")
+    elif status["state"] == "loading":
+        st.sidebar.caption(f"Modell {status['model']} wird geladen …")
+    elif status["state"] == "error":
+        st.sidebar.caption(f"Modell {status['model']} nicht vorgeladen: {status['error']}")
+
+hedge_requests = st.sidebar.checkbox("Hedging (zweites Backend bei Verzögerung starten)", value=True)
+with st.sidebar.expander("LLM-Backends"):
+    for name, health in get_router().snapshot().items():
+        p95 = f"{health['p95_s']:.2f} s" if health["p95_s"] is not None else "–"
+        st.write(f"{name}: {health['state']} · p95 {p95} · Fehlerquote {health['error_rate']:.0%} "
+                 f"({health['calls']} Aufrufe)")
+
+# ----- HTTP-Cache-Statistik (was der Cache an Downloads spart) -----
+with st.sidebar.expander("HTTP-Cache"):
+    cache_stats = http_cache.get_default_cache().summary()
+    st.write(
+        f"Treffer: {cache_stats['hits']} · 304: {cache_stats['revalidated']} · "
+        f"Downloads: {cache_stats['misses']} · Quote: {cache_stats['hit_ratio']:.0%}"
+    )
+    st.write(f"Gesparte Daten: {cache_stats['bytes_saved'] / 1024:.1f} KiB")
+
+# ----- LLM-Cache-Statistik (wiederholte Prompts ohne erneute Generierung) -----
+with st.sidebar.expander("LLM-Cache"):
+    llm_stats = llm_cache.get_default_cache().summary()
+    st.write(
+        f"Treffer: {llm_stats['hits']} · Neu generiert: {llm_stats['misses']} · "
+        f"Quote: {llm_stats['hit_ratio']:.0%}"
+    )
+    st.write(f"Gesparte Tokens: {llm_stats['tokens_saved']} "
+             f"(Prompt {llm_stats['prompt_tokens_saved']}, Antwort {llm_stats['completion_tokens_saved']})")
+
+# ----- Laufzeitmessung (Spans/Histogramme je Stufe; Panel am Seitenende) -----
+# Die Messung gilt für den ganzen Server-Prozess und wird nur beim Start per
+# METRICS=1 eingeschaltet; die Checkbox blendet lediglich das Panel dieser Sitzung ein.
+show_metrics = False
+if metrics.enabled():
+    show_metrics = st.sidebar.checkbox("Laufzeiten anzeigen (Debug)", key="show_metrics")
+
+# ----- Textbausteine: 15 vordefinierte Optionen (Tabelle in logic/prompt.py) -----
+text_modules = prompt_logic.MODULE_NAMES
 selected_modules = st.multiselect("Wähle gewünschte Textbausteine aus:", text_modules)
 
+# ----- Prompt-Länge: Beschreibung wird auf dieses Token-Budget gekürzt -----
+description_budget = st.sidebar.number_input(
+    "Token-Budget für die Beschreibung", min_value=50, max_value=2000,
+    value=prompt_logic.DEFAULT_DESCRIPTION_BUDGET, step=50,
+)
+
+# ----- Bildprüfung: Thumbnails und gleiche Bilder in anderen Anzeigen -----
+check_images = st.sidebar.checkbox("Bilder prüfen (Thumbnails, Duplikate)", value=False)
+
 # Erläuterung für Auswahl der Optionen
 st.write("Wähle die Optionen, die in deiner Nachricht berücksichtigt werden sollen:")
 
 # Beispiel: Wenn "Preisvorschlag machen" ausgewählt ist, zusätzlichen Input anfordern 
 offered_price = None
+use_market_offer = False
 if "Preisvorschlag machen" in selected_modules:
-    offered_price = st.number_input("Ihr Preisvorschlag (EUR)", min_value=1, step=1)
+    use_market_offer = st.checkbox("Preisvorschlag aus Marktvergleich übernehmen", value=False)
+    # Eigener Betrag bleibt als Rückfall, falls der Marktvergleich keinen Vorschlag liefert
+    offered_price = st.number_input("Ihr Preisvorschlag (EUR)" if not use_market_offer
+                                    else "Preisvorschlag, falls kein Marktvergleich möglich (EUR)",
+                                    min_value=1, step=1)
 
 # ----- Inputs zum Artikel (Kleinanzeigen-URL) -----
 ad_url = st.text_input("Kleinanzeigen-URL", placeholder="https://www.kleinanzeigen.de/s-anzeige/beispiel...")
 
-# Kalender laden und verfügbare Termine anzeigen (falls Kalender vorhanden)
-calendar_obj, calendar_status = calendar_logic.load_calendar_with_status()
-appointments = calendar_logic.get_available_appointments(calendar_obj, timezone_str=config.TIMEZONE)
+# ----- Termine: Länge der freien Slots -----
+slot_minutes = st.sidebar.selectbox("Termin-Länge (Minuten)", [30, 60, 90, 120], index=1)
+
+# Kalender laden und freie Termine anzeigen (falls Kalender vorhanden)
+# (gecacht: neu geparst wird nur, wenn sich die ICS-Datei ändert)
+with metrics.span("calendar"):
+    if config.CALENDAR_SOURCE == "ics":
+        calendar_obj, calendar_status = calendar_logic.load_calendar_cached()
+        appointments = []
+        if calendar_obj is not None:
+            appointments = availability.get_free_slots_cached(timezone_str=config.TIMEZONE,
+                                                              slot_minutes=slot_minutes)
+    else:
+        # Abgeglichene Quelle (Google/lokal): höchstens einmal pro Minute abfragen, sonst Cache
+        from logic import calendar_sync
+
+        calendar_sync_state = calendar_sync.get_default_sync()
+        appointments = calendar_sync_state.free_slots(config.TIMEZONE, slot_minutes)
+        sync_result = calendar_sync_state.last_result
+        calendar_obj, calendar_status = True, "ok"
+        if sync_result and sync_result.error:
+            st.warning(f"Kalenderabgleich fehlgeschlagen, verwende gespeicherte Termine: {sync_result.error}")
 selected_slots = []
 if appointments:
     selected_slots = st.multiselect("Verfügbare Termine auswählen (Abholung/Besichtigung):", appointments)
 else:
-    # Hinweis, falls Kalender geladen wurde, aber keine Termine vorhanden sind
+    # Hinweis, falls Kalender geladen wurde, aber keine freien Termine vorhanden sind
     if calendar_obj is not None:
-        st.info("Kalender geladen, aber keine Termine gefunden.")
+        st.info("Kalender geladen, aber keine freien Termine gefunden.")
 
 # Zusätzliche Hinweise, falls beim Laden des Kalenders Fehler auftraten
 if calendar_status == "not_found":
@@ -76,10 +158,13 @@ elif calendar_status == "parse_error":
     st.error("Kalender konnte nicht geladen werden (Formatfehler).")
 
 # ----- Button: Nachricht generieren -----
+regenerate = st.checkbox("Neu generieren (gespeicherte Antwort ignorieren)")
 if st.button("Nachricht generieren"):
     if not ad_url:
         st.error("Bitte geben Sie eine URL zur Kleinanzeige ein.")
         st.stop()
+    from logic.parser import extract_data_from_url
+    from logic import market, store
 
     # Kleinanzeigen-Daten abrufen & parsen
     try:
@@ -103,82 +188,113 @@ if st.button("Nachricht generieren"):
         ad_price = ad_data.get("price", "")
         ad_desc = ad_data.get("description", "")
 
-    # Prompt erstellen
-    prompt_parts = []
-    if ad_title:
-        prompt_parts.append(f"**Angebotstitel:** {ad_title}")
-    if ad_desc:
-        prompt_parts.append(f"**Angebotsbeschreibung:** {ad_desc}")
-    if ad_price:
-        prompt_parts.append(f"**Angebotspreis laut Anzeige:** {ad_price}")
-
-    # Ausgewählte Textbausteine in den Prompt integrieren
-    if "Interesse bekunden" in selected_modules:
-        prompt_parts.append("Du willst dein Interesse am Artikel bekunden.")
-    if "Preisvorschlag machen" in selected_modules and offered_price:
-        prompt_parts.append(f"Du möchtest einen Preisvorschlag von {int(offered_price)} Euro unterbreiten.")
-    if "Preis verhandelbar erfragen" in selected_modules:
-        prompt_parts.append("Du fragst, ob der Preis noch verhandelbar ist.")
-    if "Nach Zustand fragen" in selected_modules:
-        prompt_parts.append("Du möchtest mehr über den Zustand des Artikels erfahren.")
-    if "Verfügbarkeit prüfen" in selected_modules:
-        prompt_parts.append("Du fragst, ob der Artikel noch verfügbar ist.")
-    if "Versand/Lieferung anfragen" in selected_modules:
-        prompt_parts.append("Du fragst, ob Versand oder Lieferung möglich ist.")
-    if "Garantie erfragen" in selected_modules:
-        prompt_parts.append("Du fragst nach eventuell bestehender Garantie.")
-    if "Abholungstermin vorschlagen" in selected_modules and selected_slots:
-        prompt_parts.append(f"Du möchtest an folgenden Terminen abholen: {', '.join(selected_slots)}.")
-    if "Besichtigung erbitten" in selected_modules:
-        prompt_parts.append("Du möchtest den Artikel vor dem Kauf besichtigen.")
-    if "Zubehör/Umfang erfragen" in selected_modules:
-        prompt_parts.append("Du fragst, ob sämtliches Zubehör (z.B. Kabel, Verpackung) dabei ist.")
-    if "Weitere Bilder anfragen" in selected_modules:
-        prompt_parts.append("Du möchtest weitere Bilder vom Artikel sehen.")
-    if "Grund des Verkaufs erfragen" in selected_modules:
-        prompt_parts.append("Du erkundigst dich nach dem Grund des Verkaufs.")
-    if "Zahlungsmethode klären" in selected_modules:
-        prompt_parts.append("Du möchtest wissen, welche Zahlungsmethode bevorzugt wird.")
-    if "Reservierung erbitten" in selected_modules:
-        prompt_parts.append("Du fragst, ob der Artikel bis zu einem bestimmten Datum reserviert werden kann.")
-    if "Bundle-Angebot vorschlagen" in selected_modules:
-        prompt_parts.append("Du fragst, ob es einen Rabatt gibt, falls du mehrere Artikel kaufst.")
-
-    # Finale Bitte an das LLM (Abschluss des Prompts)
-    prompt_parts.append(
-        "Bitte schreibe eine freundliche, höfliche Nachricht auf Deutsch an den Anbieter, "
-        "in der alle oben genannten Punkte eingebunden werden."
+    # Anzeige lokal speichern (Duplikate werden erkannt, Preisänderungen protokolliert)
+    listing_store = store.get_default_store()
+    ad_record = ad_data if isinstance(ad_data, AdInfo) else AdInfo(**ad_data)
+    if listing_store.upsert(ad_record) == "updated":
+        history = listing_store.price_history(ad_record.url)
+        if len(history) > 1:
+            st.caption(f"Preis geändert: früher {history[-2][1]}, jetzt {history[-1][1]}")
+
+    # Bilder laden, Thumbnails anzeigen und nach gleichen Bildern in anderen Anzeigen suchen
+    if check_images and ad_record.image_urls:
+        from logic import images
+
+        image_results = images.get_default_pipeline().process_ads([ad_record])
+        thumbnails = [r.thumbnail_path for r in image_results if r.thumbnail_path]
+        if thumbnails:
+            st.image(thumbnails[:8], width=120)
+        duplicate_ads = {ad for r in image_results for _, ad, _ in r.duplicates}
+        if duplicate_ads:
+            st.warning(f"Gleiche Bilder in {len(duplicate_ads)} anderen Anzeige(n) gefunden – "
+                       f"möglicherweise eine erneut eingestellte oder kopierte Anzeige:\n"
+                       + "\n".join(f"- {url}" for url in sorted(duplicate_ads)[:5]))
+
+    # Marktvergleich mit bereits geparsten Anzeigen (die Anzeige wird dem Korpus hinzugefügt)
+    with metrics.span("market"):
+        market_index = market.get_default_index()
+        comparison = market_index.compare(ad_title, ad_price, url=ad_url)
+        market_index.add(ad_title, comparison.asking, ad_url)
+        market_index.save_if_dirty()   # höchstens alle SAVE_INTERVAL_S, der Rest beim Beenden
+    if comparison.ok:
+        p = comparison.percentiles
+        st.info(
+            f"Marktvergleich ({comparison.count} ähnliche Anzeigen): Median {p[50]:.0f} €, "
+            f"typisch {p[25]:.0f}–{p[75]:.0f} €"
+            + (f" · Vorschlag: {comparison.suggested_offer:.0f} €" if comparison.suggested_offer else "")
+        )
+    if use_market_offer:
+        if comparison.suggested_offer:
+            offered_price = comparison.suggested_offer
+        else:
+            st.warning(f"Zu wenige vergleichbare Anzeigen für einen Preisvorschlag – "
+                       f"verwende Ihren Betrag ({offered_price} €).")
+
+    # Prompt aus der Bausteintabelle erstellen (Beschreibung auf das Token-Budget gekürzt)
+    compiled = prompt_logic.get_compiler().compile(
+        ad_title, ad_desc, ad_price, selected_modules,
+        offered_price=offered_price, slots=selected_slots,
+        backend="openai" if use_openai else "ollama",
+        model=config.OPENAI_MODEL if use_openai else config.OLLAMA_MODEL,
+        description_budget=description_budget,
     )
-    final_prompt = "\n".join(prompt_parts)
+    final_prompt = compiled.text
 
     # Zeige den zusammengestellten Prompt (Debug/Info)
     st.write("**Gesammelter Prompt:**")
     st.code(final_prompt, language="markdown")
+    st.caption(
+        f"Prompt: {compiled.tokens} Tokens (Beschreibung: {compiled.description_tokens}"
+        + (", gekürzt" if compiled.description_truncated else "") + ")"
+    )
 
-    # LLM aufrufen 
-    if use_openai:
-        # OpenAI API über llm_client aufrufen
-        try:
-            generated_text = llm_client.ask_openai(final_prompt, model=config.OPENAI_MODEL)
-            st.subheader("Generierte Nachricht (OpenAI):")
-            st.write(generated_text)
-        except Exception as e:
-            st.error(f"Fehler bei der OpenAI-Anfrage: {e}")
-    else:
-        # Lokales LLM (Ollama) aufrufen
-        try:
-            generated_text = llm_client.ask_ollama(final_prompt, model=config.OLLAMA_MODEL)
-            st.subheader("Generierte Nachricht (Lokales LLM):")
-            st.write(generated_text)
-        except Exception as e:
-            # Fallback auf OpenAI, falls das lokale Modell nicht verfügbar ist
-            st.warning(f"Lokales Modell nicht verfügbar. Fallback auf OpenAI: {e}")
-            if not config.openai_api_key:
-                st.error("OpenAI API-Key ist nicht gesetzt. Generierung nicht möglich.")
-            else:
-                try:
-                    generated_text = llm_client.ask_openai(final_prompt, model=config.OPENAI_MODEL)
-                    st.subheader("Generierte Nachricht (Fallback OpenAI):")
-                    st.write(generated_text)
-                except Exception as e2:
-                    st.error(f"Fehler bei der OpenAI-Anfrage (Fallback): {e2}")
+    # LLM aufrufen – Antwort wird gestreamt und schrittweise angezeigt
+    def render_stream(chunks, stats):
+        placeholder = st.empty()
+        text = ""
+        for chunk in chunks:
+            text += chunk
+            placeholder.markdown(text + "▌")
+        placeholder.markdown(text)
+        if stats.cached:
+            st.caption("Antwort aus dem Cache (Option „Neu generieren“ erzwingt eine neue Nachricht).")
+            return text
+        st.caption(
+            f"Erstes Token nach {stats.first_token_s or 0:.2f} s · "
+            f"{stats.tokens} Tokens · {stats.tokens_per_s:.1f} Tokens/s"
+            + (f" · Modell geladen in {stats.load_s:.1f} s" if stats.load_s and stats.load_s >= 0.1 else "")
+        )
+        return text
+
+    # Backend-Auswahl über den Router: bevorzugtes Modell zuerst; hängt es, wird
+    # nach einer p95-basierten Deadline parallel das andere gestartet (Hedging),
+    # dauerhaft fehlerhafte Backends werden per Circuit Breaker übersprungen.
+    backend_labels = {"openai": "OpenAI", "ollama": "Lokales LLM"}
+    preferred = "openai" if use_openai else "ollama"
+    try:
+        stats = llm_client.StreamStats()
+        chunks = get_router().stream(final_prompt, preferred=preferred, stats=stats,
+                                     regenerate=regenerate, hedge=hedge_requests)
+        first_chunk = next(chunks, "")  # Verbindungsfehler vor der ersten Ausgabe erkennen
+        if stats.backend != preferred:
+            st.warning(f"{backend_labels[preferred]} nicht verfügbar oder zu langsam – Antwort von "
+                       f"{backend_labels[stats.backend]}.")
+        st.subheader(f"Generierte Nachricht ({backend_labels[stats.backend]}):")
+        generated_text = render_stream(itertools.chain([first_chunk], chunks), stats)
+    except Exception as e:
+        st.error(f"Fehler bei der LLM-Anfrage: {e}")
+
+# ----- Debug-Panel: Laufzeiten je Stufe, Zähler, letzte Spans, Export -----
+if show_metrics:
+    with st.sidebar.expander("Laufzeiten"):
+        snapshot = metrics.snapshot()
+        for stage in snapshot["stages"]:
+            labels = "".join(f" {k}={v}" for k, v in stage.items() if k not in metrics.STAGE_FIELDS)
+            st.write(f"{stage['stage']}{labels}: {stage['count']}× · p50 {stage['p50_s'] * 1000:.1f} ms · "
+                     f"p95 {stage['p95_s'] * 1000:.1f} ms · max {stage['max_s'] * 1000:.1f} ms")
+        for counter in snapshot["counters"]:
+            labels = ", ".join(f"{k}={v}" for k, v in counter.items() if k not in ("name", "value"))
+            st.write(f"{counter['name']} ({labels}): {metrics.format_value(counter['value'])}")
+        st.dataframe(metrics.recent_spans(20))
+        st.download_button("Prometheus-Export", metrics.to_prometheus(), file_name="metrics.prom")
+        st.download_button("JSON-Export", metrics.to_json(), file_name="metrics.json")
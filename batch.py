@@ -0,0 +1,234 @@
+"""
+Batch-Modus ohne Streamlit: verarbeitet eine JSONL-Datei mit Aufträgen.
+
+Jede Zeile ist ein Auftrag, z. B.
+    {"id": "a1", "url": "https://www.kleinanzeigen.de/s-anzeige/...",
+     "modules": ["Interesse bekunden", "Preisvorschlag machen"], "offered_price": 80}
+
+Pro Auftrag: Anzeige abrufen → parsen → Prompt bauen → LLM. Ergebnisse werden
+sofort nach Fertigstellung als JSONL-Zeile angehängt. Die Ausgabedatei dient
+zugleich als Checkpoint: Beim erneuten Start werden Aufträge mit Status "ok"
+übersprungen, fehlgeschlagene erneut versucht. Ohne "id" gilt die URL als
+Schlüssel.
+
+Aufruf:
+    python batch.py jobs.jsonl [-o results.jsonl] [--model openai|ollama] [--concurrency 4]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+import config
+from logic import llm_client, metrics
+from logic.fetch import HostRateLimiter, fetch_cached, get_session
+from logic.parser import parse_listing_html
+from logic.prompt import get_compiler
+
+DEFAULT_CONCURRENCY = 4
+
+
+def job_key(job: dict) -> str:
+    return str(job.get("id") or job.get("url") or "")
+
+
+def read_jobs(path: str):
+    """Liest Aufträge zeilenweise (die Datei wird nicht komplett geladen)."""
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                job = json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"Zeile {line_no} übersprungen (kein JSON): {e}", file=sys.stderr)
+                continue
+            if not job.get("url"):
+                print(f"Zeile {line_no} übersprungen (keine url)", file=sys.stderr)
+                continue
+            yield job
+
+
+def load_checkpoint(path: str) -> set:
+    """Schlüssel aller bereits erfolgreich abgeschlossenen Aufträge in der Ausgabedatei."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue   # z. B. abgebrochene letzte Zeile
+            if record.get("status") == "ok":
+                done.add(record.get("id"))
+    return done
+
+
+class BatchRunner:
+    """
+    Führt Aufträge mit höchstens `concurrency` gleichzeitigen Pipelines aus.
+    Abruf und Parsen laufen in Threads (gepoolte Session, Rate-Limit pro Host),
+    die LLM-Aufrufe teilen sich einen asynchronen Client.
+    """
+
+    def __init__(self, output_path: str, model: str = "openai", concurrency: int = DEFAULT_CONCURRENCY,
+                 retries: int = 2, description_budget: int = None, per_host_rate: float = 2.0):
+        self.output_path = output_path
+        self.use_openai = model.lower() == "openai"
+        self.concurrency = concurrency
+        self.retries = retries
+        self.description_budget = description_budget
+        self.session = get_session(pool_size=concurrency)
+        self.limiter = HostRateLimiter(per_host_rate)
+        self.compiler = get_compiler()
+        self.results = {"ok": 0, "error": 0, "skipped": 0}
+        self.latencies = []
+        self.stage_times = {"fetch_s": [], "llm_s": []}
+
+    async def run(self, jobs) -> dict:
+        done = load_checkpoint(self.output_path)
+        queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        client = llm_client.openai_async_client() if self.use_openai else llm_client.ollama_async_client()
+        started = time.perf_counter()
+        with open(self.output_path, "a", encoding="utf-8") as out:
+            async def _worker():
+                while True:
+                    job = await queue.get()
+                    if job is None:
+                        return
+                    record = await self._process(job, client)
+                    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    out.flush()
+                    self.results[record["status"]] += 1
+
+            workers = [asyncio.create_task(_worker()) for _ in range(self.concurrency)]
+            try:
+                for job in jobs:
+                    if job_key(job) in done:
+                        self.results["skipped"] += 1
+                        continue
+                    await queue.put(job)
+                for _ in workers:
+                    await queue.put(None)
+                await asyncio.gather(*workers)
+            finally:
+                for worker in workers:
+                    worker.cancel()
+                await client.close()
+        return self.summary(time.perf_counter() - started)
+
+    async def _process(self, job: dict, client) -> dict:
+        start = time.perf_counter()
+        record = {"id": job_key(job), "url": job["url"], "status": "error", "message": None, "error": None,
+                  "attempts": 0}
+        try:
+            t = time.perf_counter()
+            ad = await asyncio.to_thread(self._fetch_and_parse, job["url"])
+            record["timings"] = {"fetch_s": round(time.perf_counter() - t, 3)}
+            compiled = self.compiler.compile(
+                ad["title"], ad["description"], ad["price"], job.get("modules") or [],
+                offered_price=job.get("offered_price"), slots=job.get("slots") or [],
+                backend="openai" if self.use_openai else "ollama",
+                model=config.OPENAI_MODEL if self.use_openai else config.OLLAMA_MODEL,
+                description_budget=self.description_budget,
+            )
+            record["title"] = ad["title"]
+            record["prompt_tokens"] = compiled.tokens
+            t = time.perf_counter()
+            record["message"] = await self._generate(compiled.text, client, record)
+            record["timings"]["llm_s"] = round(time.perf_counter() - t, 3)
+            record["status"] = "ok"
+        except Exception as e:
+            record["error"] = str(e) or e.__class__.__name__
+        total = time.perf_counter() - start
+        record.setdefault("timings", {})["total_s"] = round(total, 3)
+        record["finished_at"] = time.time()
+        if record["status"] == "ok":
+            self.latencies.append(total)
+            for stage in self.stage_times:
+                self.stage_times[stage].append(record["timings"][stage])
+        return record
+
+    def _fetch_and_parse(self, url: str) -> dict:
+        html = fetch_cached(url, session=self.session, limiter=self.limiter)
+        return parse_listing_html(html, url)
+
+    async def _generate(self, prompt: str, client, record: dict) -> str:
+        # Wiederholung mit exponentiellem Backoff und Jitter (wie logic.negotiation)
+        for attempt in range(self.retries + 1):
+            record["attempts"] = attempt + 1
+            try:
+                if self.use_openai:
+                    return await llm_client.ask_openai_async(prompt, model=config.OPENAI_MODEL, client=client)
+                return await llm_client.ask_ollama_async(prompt, model=config.OLLAMA_MODEL, client=client)
+            except Exception:
+                if attempt == self.retries:
+                    raise
+                await asyncio.sleep(random.uniform(0, min(10.0, 0.5 * 2 ** attempt)))
+
+    def summary(self, wall_s: float) -> dict:
+        processed = self.results["ok"] + self.results["error"]
+        summary = dict(self.results, wall_s=round(wall_s, 2),
+                       jobs_per_s=round(processed / wall_s, 2) if wall_s else 0.0)
+        if self.latencies:
+            latencies = sorted(self.latencies)
+            summary["latency_p50_s"] = round(statistics.median(latencies), 3)
+            summary["latency_p95_s"] = round(latencies[max(0, int(len(latencies) * 0.95) - 1)], 3)
+            summary["latency_max_s"] = round(latencies[-1], 3)
+            for stage, values in self.stage_times.items():
+                summary[f"{stage[:-2]}_p50_s"] = round(statistics.median(values), 3)
+        return summary
+
+
+def print_summary(summary: dict):
+    print(f"Fertig: {summary['ok']} ok, {summary['error']} Fehler, {summary['skipped']} übersprungen "
+          f"in {summary['wall_s']:.1f} s ({summary['jobs_per_s']:.2f} Aufträge/s)")
+    if "latency_p50_s" in summary:
+        print(f"Latenz pro Auftrag: p50 {summary['latency_p50_s']:.2f} s · p95 {summary['latency_p95_s']:.2f} s · "
+              f"max {summary['latency_max_s']:.2f} s (Abruf p50 {summary['fetch_p50_s']:.2f} s, "
+              f"LLM p50 {summary['llm_p50_s']:.2f} s)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Nachrichten für viele Anzeigen aus einer JSONL-Datei erzeugen.")
+    parser.add_argument("input", help="JSONL-Datei mit Aufträgen ({url, modules, offered_price})")
+    parser.add_argument("-o", "--output", help="Ergebnis-JSONL (Standard: <input>.results.jsonl)")
+    parser.add_argument("--model", choices=["openai", "ollama"], default="openai")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--retries", type=int, default=2, help="Wiederholungen pro LLM-Anfrage")
+    parser.add_argument("--description-budget", type=int, default=None, help="Token-Budget der Beschreibung")
+    parser.add_argument("--per-host-rate", type=float, default=2.0, help="Seitenabrufe pro Sekunde und Host")
+    parser.add_argument("--metrics", help="Laufzeiten je Stufe hierhin schreiben (.prom = Prometheus, sonst JSON)")
+    args = parser.parse_args(argv)
+    # Vor dem Start prüfen: der LLM-Client wird für alle Aufträge einmal angelegt
+    if args.model == "openai" and not config.openai_api_key:
+        parser.error("openai_api_key ist nicht gesetzt (ENV `openai_api_key` oder .env) – "
+                     "oder --model ollama verwenden.")
+    if args.metrics:
+        metrics.enable()
+
+    output = args.output or os.path.splitext(args.input)[0] + ".results.jsonl"
+    runner = BatchRunner(output, model=args.model, concurrency=args.concurrency, retries=args.retries,
+                         description_budget=args.description_budget, per_host_rate=args.per_host_rate)
+    try:
+        summary = asyncio.run(runner.run(read_jobs(args.input)))
+    except KeyboardInterrupt:
+        print(f"Abgebrochen – fertige Aufträge stehen in {output}, ein erneuter Start setzt dort fort.")
+        return 130
+    print_summary(summary)
+    print(f"Ergebnisse: {output}")
+    if args.metrics:
+        with open(args.metrics, "w", encoding="utf-8") as f:
+            f.write(metrics.to_prometheus() if args.metrics.endswith(".prom") else metrics.to_json())
+        print(f"Metriken: {args.metrics}")
+    return 0 if summary["error"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
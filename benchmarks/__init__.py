@@ -0,0 +1 @@
+# makes the "benchmarks" directory a Python package
@@ -0,0 +1,107 @@
+"""
+Benchmark: Kalender-Skalierung über synthetische ICS-Dateien wachsender Größe.
+
+Misst pro Größe das Parsen, die bisherige lineare Terminliste
+(`get_available_appointments`), den Aufbau des Belegt-Index mit RRULE-Expansion
+und die Kosten einzelner Abfragen (`is_free`, `free_slots`).
+
+Aufruf aus dem Projektverzeichnis:
+    python -m benchmarks.bench_calendar [--sizes 100 1000 10000] [--days 90]
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from icalendar import Calendar
+
+from logic import availability
+from logic.calendar import get_available_appointments
+
+TIMEZONE = "Europe/Berlin"
+
+
+def synthetic_ics(n_events: int, recurring_ratio: float = 0.3, seed: int = 0) -> bytes:
+    """
+    Erzeugt einen Kalender mit `n_events` VEVENTs rund um den heutigen Tag;
+    ein Anteil davon wiederholt sich (täglich/wöchentlich, teils mit EXDATE).
+    """
+    rng = random.Random(seed)
+    base = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0) - timedelta(days=30)
+    fmt = "%Y%m%dT%H%M%SZ"
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//kleinanzeigen//benchmark//DE"]
+    for i in range(n_events):
+        start = base + timedelta(days=rng.randint(0, 180), hours=rng.randint(6, 20))
+        end = start + timedelta(minutes=rng.choice([30, 60, 90, 120]))
+        lines += ["BEGIN:VEVENT", f"UID:bench-{i}", f"DTSTART:{start.strftime(fmt)}",
+                  f"DTEND:{end.strftime(fmt)}", f"SUMMARY:Termin {i}"]
+        if rng.random() < recurring_ratio:
+            if rng.random() < 0.5:
+                lines.append(f"RRULE:FREQ=DAILY;COUNT={rng.randint(5, 60)}")
+            else:
+                until = start + timedelta(weeks=rng.randint(4, 52))
+                lines.append(f"RRULE:FREQ=WEEKLY;UNTIL={until.strftime(fmt)}")
+            if rng.random() < 0.3:
+                lines.append(f"EXDATE:{(start + timedelta(days=7)).strftime(fmt)}")
+        lines.append("END:VEVENT")
+    lines.append("END:VCALENDAR")
+    return "\r\n".join(lines).encode()
+
+
+def _timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def run(sizes=(100, 1000, 5000, 20000), days_ahead: int = 90, lookups: int = 2000) -> dict:
+    """Liefert `{größe: {kennzahl: wert}}` (Zeiten in Millisekunden bzw. Mikrosekunden)."""
+    results = {}
+    for n in sizes:
+        data = synthetic_ics(n)
+        cal, parse_ms = _timed(Calendar.from_ical, data)
+        _, legacy_ms = _timed(get_available_appointments, cal, TIMEZONE)
+        intervals, expand_ms = _timed(
+            lambda: list(availability.busy_intervals(
+                cal, datetime.now(timezone.utc), datetime.now(timezone.utc) + timedelta(days=days_ahead),
+                availability._load_tz(TIMEZONE))))
+        index, index_ms = _timed(availability.build_index, cal, TIMEZONE, days_ahead)
+
+        rng = random.Random(1)
+        lo = time.time()
+        probes = [(t, t + 3600) for t in (lo + rng.random() * days_ahead * 86400 for _ in range(lookups))]
+        start = time.perf_counter()
+        for a, b in probes:
+            index.is_free(a, b)
+        lookup_us = (time.perf_counter() - start) / lookups * 1e6
+        _, slots_ms = _timed(availability.free_slots, index, TIMEZONE, 60, days_ahead)
+
+        results[n] = {
+            "occurrences": len(intervals),
+            "merged_intervals": len(index),
+            "parse_ms": round(parse_ms, 2),
+            "legacy_appointments_ms": round(legacy_ms, 2),
+            "expand_ms": round(expand_ms, 2),
+            "index_ms": round(index_ms, 2),
+            "lookup_us": round(lookup_us, 3),
+            "free_slots_ms": round(slots_ms, 3),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000, 20000])
+    parser.add_argument("--days", type=int, default=90)
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.days)
+    columns = ["occurrences", "merged_intervals", "parse_ms", "legacy_appointments_ms",
+               "expand_ms", "index_ms", "lookup_us", "free_slots_ms"]
+    print(f"{'VEVENTs':>8}" + "".join(f"{c:>24}" for c in columns))
+    for n, r in results.items():
+        print(f"{n:>8}" + "".join(f"{r[c]:>24}" for c in columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark: Kalender-Abgleich – vollständig vs. inkrementell mit Sync-Token.
+
+Befüllt die dateibasierte Ersatzquelle (`LocalCalendarSource`) mit `--events`
+Terminen über ein halbes Jahr und gleicht sie mit dem Frei/Belegt-Cache ab.
+Danach folgen `--refreshes` Runden mit je `--changes` Änderungen (verschieben,
+löschen, neu anlegen); gemessen werden übertragene Termine und Zeit pro
+Abgleich – einmal inkrementell, einmal mit vollständigem Neuladen wie bisher.
+Die Zeiten enthalten das Einlesen der Ersatzdatei (wächst mit der Terminzahl);
+gegen die echte API zählt vor allem die Zahl der übertragenen Termine.
+
+Aufruf aus dem Projektverzeichnis:
+    python -m benchmarks.bench_calendar_sync [--events 5000] [--refreshes 10] [--changes 5]
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("CACHE_DIR", tempfile.mkdtemp(prefix="kleinanzeigen-bench-"))
+
+from data.models import CalendarEvent
+from logic.calendar_sync import CalendarSync, FreeBusyCache, LocalCalendarSource
+
+
+def _random_event(uid: str, now: float, rng: random.Random) -> CalendarEvent:
+    start = now + rng.randrange(0, 180 * 24) * 3600
+    return CalendarEvent(uid, start, start + rng.choice((1800, 3600, 5400)), f"Termin {uid}")
+
+
+def _change(source: LocalCalendarSource, uids: list, count: int, now: float, rng: random.Random):
+    for _ in range(count):
+        action = rng.random()
+        if action < 0.5:
+            source.put(_random_event(rng.choice(uids), now, rng))
+        elif action < 0.7 and len(uids) > 1:
+            uid = uids.pop(rng.randrange(len(uids)))
+            source.delete(uid)
+        else:
+            uid = f"neu-{len(uids)}-{rng.random():.6f}"
+            uids.append(uid)
+            source.put(_random_event(uid, now, rng))
+
+
+def run(events: int = 5000, refreshes: int = 10, changes: int = 5, seed: int = 24) -> dict:
+    directory = tempfile.mkdtemp(prefix="calendar-sync-")
+    rng = random.Random(seed)
+    now = time.time()
+    source = LocalCalendarSource(os.path.join(directory, "remote.json"))
+    uids = [f"e{i}" for i in range(events)]
+    source.put(*(_random_event(uid, now, rng) for uid in uids))
+    cache = FreeBusyCache(os.path.join(directory, "calendar.sqlite3"))
+    sync = CalendarSync(source, cache, min_interval=0)
+
+    initial = sync.refresh()
+    incremental, full = [], []
+    for _ in range(refreshes):
+        _change(source, uids, changes, now, rng)
+        incremental.append(sync.refresh(force=True))
+        # Zum Vergleich: vollständiger Abgleich ohne Token (bisheriges Verhalten)
+        start = time.perf_counter()
+        page = source.changes(None)
+        cache.apply("vollständig", page)
+        full.append((len(page.events), time.perf_counter() - start))
+
+    start = time.perf_counter()
+    slots = sync.free_slots(slot_minutes=60, days_ahead=14, refresh=False)
+    slots_ms = (time.perf_counter() - start) * 1000
+    source.purge()
+    _change(source, uids, changes, now, rng)
+    expired = sync.refresh(force=True)
+    return {
+        "events": events,
+        "initial": {"transferred": initial.transferred, "ms": round(initial.duration_s * 1000, 2)},
+        "incremental": {"transferred": statistics.mean(r.transferred for r in incremental),
+                        "ms": round(statistics.median(r.duration_s for r in incremental) * 1000, 3)},
+        "full": {"transferred": statistics.mean(n for n, _ in full),
+                 "ms": round(statistics.median(s for _, s in full) * 1000, 3)},
+        "token_expired": {"full": expired.full, "transferred": expired.transferred},
+        "free_slots_ms": round(slots_ms, 3),
+        "free_slots": len(slots),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--refreshes", type=int, default=10)
+    parser.add_argument("--changes", type=int, default=5)
+    args = parser.parse_args()
+
+    r = run(args.events, args.refreshes, args.changes)
+    print(f"{'Abgleich':<28}{'Termine':>10}{'ms':>10}")
+    print(f"{'erster (vollständig)':<28}{r['initial']['transferred']:>10}{r['initial']['ms']:>10.2f}")
+    print(f"{'inkrementell (Median)':<28}{r['incremental']['transferred']:>10.1f}{r['incremental']['ms']:>10.2f}")
+    print(f"{'jedes Mal vollständig':<28}{r['full']['transferred']:>10.1f}{r['full']['ms']:>10.2f}")
+    print(f"\nToken abgelaufen → vollständig: {r['token_expired']['full']} "
+          f"({r['token_expired']['transferred']} Termine)")
+    print(f"Freie Termine (14 Tage) aus dem Cache: {r['free_slots']} in {r['free_slots_ms']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
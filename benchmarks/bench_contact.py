@@ -0,0 +1,86 @@
+"""
+Benchmark: Worst-Case-Laufzeit der Kontakt-Erkennung auf adversarialen Eingaben.
+
+Vergleicht die früheren Telefon-/Adress-Regexes aus `extract_data_from_url`
+(backtracken auf langen Texten quadratisch) mit `logic.contact`. Für jede
+Eingabeart wird die Textlänge verdoppelt; bei linearer Laufzeit verdoppelt
+sich auch die Zeit. Die alte Variante wird übersprungen, sobald ein Lauf
+länger als `--legacy-budget` Sekunden dauert.
+
+Aufruf aus dem Projektverzeichnis:
+    python -m benchmarks.bench_contact [--max-size 262144]
+"""
+import argparse
+import re
+import time
+
+from logic.contact import find_address, find_phone
+
+LEGACY_PHONE_RE = re.compile(r'\b(\+?\d{1,3}[-.\s]?)?(\(?\d{2,5}\)?[-.\s]?)?\d{3,}([-.\s]?\d{2,})?\b')
+LEGACY_ADDRESS_RE = re.compile(
+    r'(?P<strasse>[A-Za-zäöüÄÖÜß\s\-]+)\s+(?P<hausnummer>\d+[a-zA-Z]?)\,?\s*(?P<plz>\d{5})\s(?P<stadt>[A-Za-zäöüÄÖÜß\s\-]+)'
+)
+
+# Eingabeart -> Generator für einen Text der Länge ~n
+CASES = {
+    "buchstaben+leerzeichen": lambda n: "ab " * (n // 3) + "12 x",
+    "ziffernfolgen": lambda n: "1 " * (n // 2),
+    "plz-flut": lambda n: "12345 " * (n // 6) + "x",
+    "wortketten-vor-plz": lambda n: "Haus " * (n // 5) + "5, 12345 Berlin",
+}
+
+
+def legacy(text: str):
+    LEGACY_PHONE_RE.findall(text)
+    if not LEGACY_ADDRESS_RE.search(text):
+        re.search(r'(\d{5})\s([A-Za-zäöüÄÖÜß\s\-]+)', text)
+
+
+def current(text: str):
+    find_phone(text)
+    find_address(text)
+
+
+def _timed(func, text) -> float:
+    start = time.perf_counter()
+    func(text)
+    return (time.perf_counter() - start) * 1000
+
+
+def run(max_size: int = 262144, legacy_budget: float = 2.0) -> dict:
+    """Liefert `{fall: {größe: {"legacy_ms": .. | None, "current_ms": ..}}}`."""
+    results = {}
+    for case, make in CASES.items():
+        results[case] = {}
+        legacy_alive = True
+        size = 1024
+        while size <= max_size:
+            text = make(size)
+            legacy_ms = None
+            if legacy_alive:
+                legacy_ms = _timed(legacy, text)
+                legacy_alive = legacy_ms < legacy_budget * 1000
+            results[case][size] = {
+                "legacy_ms": round(legacy_ms, 3) if legacy_ms is not None else None,
+                "current_ms": round(_timed(current, text), 3),
+            }
+            size *= 2
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--max-size", type=int, default=262144)
+    parser.add_argument("--legacy-budget", type=float, default=2.0)
+    args = parser.parse_args()
+
+    results = run(args.max_size, args.legacy_budget)
+    print(f"{'Eingabe':<24}{'Zeichen':>10}{'alt ms':>14}{'neu ms':>12}")
+    for case, per_size in results.items():
+        for size, r in per_size.items():
+            legacy_ms = f"{r['legacy_ms']:.2f}" if r["legacy_ms"] is not None else "–"
+            print(f"{case:<24}{size:>10}{legacy_ms:>14}{r['current_ms']:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
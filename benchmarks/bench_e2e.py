@@ -0,0 +1,135 @@
+"""
+Benchmark: Ende-zu-Ende-Latenz ohne Netzwerk (Anzeige → Prompt → LLM).
+
+Die HTML-Fixtures aus `benchmarks/fixtures/` werden von einem lokalen
+HTTP-Server ausgeliefert und über `extract_data_from_url` bzw. `parse_ad`
+abgerufen (jede Anfrage mit eigener URL, also ohne HTTP-Cache-Treffer).
+Die Nachricht erzeugt `llm_client` gegen den LLM-Stub
+(`benchmarks.llm_stub`) über das Ollama- und das OpenAI-Protokoll.
+Caches liegen in einem temporären Verzeichnis (ENV `CACHE_DIR`).
+
+Aufruf aus dem Projektverzeichnis:
+    python -m benchmarks.bench_e2e [--requests 20] [--first-token 0.05] [--token 0.005]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+os.environ.setdefault("CACHE_DIR", tempfile.mkdtemp(prefix="kleinanzeigen-bench-"))
+
+from benchmarks.bench_parser import load_fixtures
+from benchmarks.llm_stub import StubLLMServer
+from logic import llm_client
+from logic.parser import extract_data_from_url, parse_ad
+from logic.prompt import get_compiler
+
+MODULES = ["Interesse bekunden", "Verfügbarkeit prüfen", "Versand/Lieferung anfragen"]
+
+
+def serve_fixtures(fixtures: dict) -> ThreadingHTTPServer:
+    """Liefert jede Fixture unter `/s-anzeige/<name>/<beliebig>` aus."""
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True   # Header und Body sonst mit 40 ms Delayed-ACK
+
+        def do_GET(self):
+            name = self.path.split("/")[2] if self.path.count("/") >= 3 else ""
+            body = fixtures.get(name)
+            if body is None:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def use_stub(stub: StubLLMServer):
+    """Leitet beide Backends auf den Stub um (Clients werden danach neu erzeugt)."""
+    os.environ["OLLAMA_HOST"] = stub.url
+    os.environ["OPENAI_BASE_URL"] = stub.url + "/v1"
+    os.environ.setdefault("openai_api_key", "stub")
+    llm_client._clients.clear()
+
+
+def _p(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, round(q * len(values)) - 1))]
+
+
+def run(requests: int = 20, first_token_s: float = 0.05, token_s: float = 0.005) -> dict:
+    fixtures = load_fixtures()
+    names = sorted(fixtures)
+    server = serve_fixtures(fixtures)
+    base = f"http://127.0.0.1:{server.server_address[1]}/s-anzeige"
+    counter = iter(range(10 ** 9))
+    next_url = lambda name: f"{base}/{name}/{time.time_ns()}-{next(counter)}"
+
+    extract_data_from_url(next_url(names[0]))   # Aufwärmen (Session, Parser-Backend)
+    timings = {"extract_ms": [], "parse_ad_ms": [], "prompt_ms": []}
+    for i in range(requests):
+        name = names[i % len(names)]
+        start = time.perf_counter()
+        data = extract_data_from_url(next_url(name))
+        timings["extract_ms"].append((time.perf_counter() - start) * 1000)
+        assert data and data["title"], f"Fixture {name} nicht geparst"
+        start = time.perf_counter()
+        parse_ad(next_url(name))
+        timings["parse_ad_ms"].append((time.perf_counter() - start) * 1000)
+
+    with StubLLMServer(first_token_s, token_s) as stub:
+        use_stub(stub)
+        for backend, stream in (("ollama", llm_client.stream_ollama), ("openai", llm_client.stream_openai)):
+            # Aufwärmen: Import des Client-Pakets und Verbindungsaufbau nicht mitmessen
+            "".join(stream("Aufwärmen", model="stub", regenerate=True))
+            ttft, total = [], []
+            for i in range(requests):
+                start = time.perf_counter()
+                ad = extract_data_from_url(next_url(names[i % len(names)]))
+                t = time.perf_counter()
+                compiled = get_compiler().compile(ad["title"], ad["description"], ad["price"], MODULES,
+                                                  backend=backend)
+                timings["prompt_ms"].append((time.perf_counter() - t) * 1000)
+                stats = llm_client.StreamStats()
+                text = "".join(stream(compiled.text, model="stub", stats=stats, regenerate=True))
+                assert text, f"Leere Antwort vom Stub ({backend})"
+                total.append((time.perf_counter() - start) * 1000)
+                ttft.append(stats.first_token_s * 1000)
+            timings[f"{backend}_ttft_ms"] = ttft
+            timings[f"{backend}_e2e_ms"] = total
+    server.shutdown()
+
+    result = {"requests": requests, "stub_first_token_ms": first_token_s * 1000}
+    for key, values in timings.items():
+        result[f"{key[:-3]}_p50_ms"] = round(statistics.median(values), 3)
+        result[f"{key[:-3]}_p95_ms"] = round(_p(values, 0.95), 3)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--first-token", type=float, default=0.05, help="Stub: Sekunden bis zum ersten Chunk")
+    parser.add_argument("--token", type=float, default=0.005, help="Stub: Sekunden pro weiterem Chunk")
+    args = parser.parse_args()
+
+    result = run(args.requests, args.first_token, args.token)
+    for key, value in result.items():
+        print(f"{key:<24}{value:>12}")
+
+
+if __name__ == "__main__":
+    main()
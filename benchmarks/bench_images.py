@@ -0,0 +1,150 @@
+"""
+Benchmark: Bild-Pipeline (`logic.images`) gegen einen lokalen HTTP-Server.
+
+Erzeugt synthetische JPEGs; ein Teil der Anzeigen verwendet dieselben Bilder
+erneut (neu komprimiert und leicht skaliert, wie bei erneut eingestellten
+Anzeigen). Gemessen werden Durchsatz (Bilder/min) beim ersten Lauf und mit
+warmem Cache, gefundene Duplikate und die Latenz der Hash-Suche im Index.
+
+Aufruf aus dem Projektverzeichnis:
+    python -m benchmarks.bench_images [--images 300] [--duplicates 0.2] [--workers 4]
+"""
+import argparse
+import asyncio
+import io
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from logic.images import HashIndex, ImagePipeline, ThumbnailCache
+
+
+def synthetic_image(seed: int, size=(1024, 768), quality: int = 85) -> bytes:
+    """Zufällige Rechtecke und Ellipsen auf Farbverlauf – unterschiedlich genug für eindeutige Hashes."""
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(seed)
+    image = Image.linear_gradient("L").resize(size).convert("RGB")
+    draw = ImageDraw.Draw(image)
+    for _ in range(12):
+        x0, y0 = rng.randrange(size[0]), rng.randrange(size[1])
+        box = (x0, y0, x0 + rng.randint(80, 500), y0 + rng.randint(80, 400))
+        color = tuple(rng.randrange(256) for _ in range(3))
+        (draw.rectangle if rng.random() < 0.5 else draw.ellipse)(box, fill=color)
+    out = io.BytesIO()
+    image.save(out, "JPEG", quality=quality)
+    return out.getvalue()
+
+
+def repost(data: bytes, seed: int) -> bytes:
+    """Dasselbe Bild, neu komprimiert und leicht verkleinert."""
+    from PIL import Image
+
+    rng = random.Random(seed)
+    with Image.open(io.BytesIO(data)) as image:
+        scale = rng.uniform(0.8, 0.95)
+        image = image.resize((int(image.width * scale), int(image.height * scale)))
+        out = io.BytesIO()
+        image.save(out, "JPEG", quality=rng.randint(60, 80))
+    return out.getvalue()
+
+
+def _serve(files: dict):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True   # Header und Body sonst mit 40 ms Delayed-ACK
+
+        def do_GET(self):
+            body = files.get(self.path)
+            if body is None:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "image/jpeg")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run(images: int = 300, duplicates: float = 0.2, workers: int = None, concurrency: int = 16,
+        queries: int = 500) -> dict:
+    rng = random.Random(0)
+    n_dup = int(images * duplicates)
+    originals = [synthetic_image(i) for i in range(images - n_dup)]
+    files = {f"/img/{i}.jpg": data for i, data in enumerate(originals)}
+    pairs = [(f"https://example.invalid/ad/{i}", f"/img/{i}.jpg") for i in range(len(originals))]
+    for j, source in enumerate(rng.sample(range(len(originals)), n_dup)):
+        path = f"/img/repost-{j}.jpg"
+        files[path] = repost(originals[source], j)
+        pairs.append((f"https://example.invalid/ad/repost-{j}", path))
+
+    server = _serve(files)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    pairs = [(ad, base + path) for ad, path in pairs]
+    with tempfile.TemporaryDirectory() as tmp:
+        pipeline = ImagePipeline(ThumbnailCache(os.path.join(tmp, "thumbs"), max_bytes=50 * 1024 * 1024),
+                                 HashIndex(os.path.join(tmp, "hashes.sqlite3")),
+                                 concurrency=concurrency, workers=workers)
+        start = time.perf_counter()
+        results = asyncio.run(pipeline.process(pairs))
+        cold_s = time.perf_counter() - start
+        start = time.perf_counter()
+        asyncio.run(pipeline.process(pairs))
+        warm_s = time.perf_counter() - start
+
+        errors = sum(1 for r in results if r.error)
+        found = sum(1 for r in results if "repost" in r.ad_url and r.duplicates)
+        false_positive = sum(1 for r in results if "repost" not in r.ad_url
+                             and any("repost" not in ad for _, ad, _ in r.duplicates))
+
+        hashes = [r.dhash for r in results if r.dhash is not None]
+        latencies = []
+        for value in rng.choices(hashes, k=queries):
+            t = time.perf_counter()
+            pipeline.index.similar(value)
+            latencies.append((time.perf_counter() - t) * 1000)
+        pipeline.close()
+    server.shutdown()
+    return {
+        "images": images,
+        "errors": errors,
+        "cold_images_per_min": round(images / cold_s * 60),
+        "warm_images_per_min": round(images / warm_s * 60),
+        "reposts": n_dup,
+        "reposts_found": found,
+        "false_positives": false_positive,
+        "lookup_median_ms": round(statistics.median(latencies), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--images", type=int, default=300)
+    parser.add_argument("--duplicates", type=float, default=0.2, help="Anteil erneut eingestellter Bilder")
+    parser.add_argument("--workers", type=int, default=None, help="Prozesse für Thumbnails (Standard: CPU-Kerne)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    result = run(args.images, args.duplicates, args.workers, args.concurrency)
+    print(f"Bilder:              {result['images']} ({result['errors']} Fehler)")
+    print(f"Erster Lauf:         {result['cold_images_per_min']} Bilder/min")
+    print(f"Mit Cache:           {result['warm_images_per_min']} Bilder/min")
+    print(f"Duplikate erkannt:   {result['reposts_found']} von {result['reposts']} "
+          f"({result['false_positives']} falsch positiv)")
+    print(f"Index-Suche Median:  {result['lookup_median_ms']:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
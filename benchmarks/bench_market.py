@@ -0,0 +1,83 @@
+"""
+Benchmark: Marktvergleich (`logic.market`) über einen synthetischen Korpus.
+
+Misst Aufbau des Token-Index, das erste "Einfrieren" in NumPy-Arrays und die
+Latenz einzelner `compare()`-Abfragen (Median/p95 über viele Titel).
+
+Aufruf aus dem Projektverzeichnis:
+    python -m benchmarks.bench_market [--size 100000] [--queries 200]
+"""
+import argparse
+import random
+import statistics
+import time
+
+from logic.market import MarketIndex
+
+PRODUCTS = {
+    "Fahrrad": 350, "Mountainbike": 600, "Kinderwagen": 180, "Sofa": 250, "Kühlschrank": 150,
+    "iPhone": 420, "Waschmaschine": 200, "Schreibtisch": 80, "Gitarre": 160, "Playstation": 280,
+    "Kamera": 390, "Monitor": 120, "Rasenmäher": 140, "Laufschuhe": 45, "Winterjacke": 60,
+}
+BRANDS = ["Cube", "Bosch", "Apple", "Samsung", "Ikea", "Sony", "Canon", "Miele", "Nike", "Yamaha"]
+EXTRAS = ["schwarz", "weiß", "28 Zoll", "128GB", "Leder", "Holz", "Größe 42", "Pro", "XL", "2022"]
+
+
+def synthetic_corpus(size: int, seed: int = 0) -> list:
+    """`(titel, betrag, url)`-Tripel; ein kleiner Teil ohne Preis oder verschenkt."""
+    rng = random.Random(seed)
+    rows = []
+    products = list(PRODUCTS.items())
+    for i in range(size):
+        product, base = rng.choice(products)
+        title = f"{rng.choice(BRANDS)} {product} {rng.choice(EXTRAS)}"
+        roll = rng.random()
+        amount = None if roll < 0.03 else 0.0 if roll < 0.05 else round(base * rng.lognormvariate(0, 0.35))
+        rows.append((title, amount, f"https://www.kleinanzeigen.de/s-anzeige/bench/{i}"))
+    return rows
+
+
+def run(size: int = 100000, queries: int = 200, seed: int = 0) -> dict:
+    corpus = synthetic_corpus(size, seed)
+    start = time.perf_counter()
+    index = MarketIndex()
+    for title, amount, url in corpus:
+        index.add(title, amount, url)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    index._freeze()
+    freeze_ms = (time.perf_counter() - start) * 1000
+
+    rng = random.Random(seed + 1)
+    latencies = []
+    for title, amount, url in rng.sample(corpus, min(queries, size)):
+        start = time.perf_counter()
+        index.compare(title, f"{amount} € VB" if amount else "", url)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return {
+        "size": size,
+        "build_ms": round(build_ms, 1),
+        "freeze_ms": round(freeze_ms, 1),
+        "compare_median_ms": round(statistics.median(latencies), 3),
+        "compare_p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    result = run(args.size, args.queries)
+    print(f"Korpus:            {result['size']} Anzeigen")
+    print(f"Index-Aufbau:      {result['build_ms']:.1f} ms")
+    print(f"Einfrieren:        {result['freeze_ms']:.1f} ms")
+    print(f"compare() Median:  {result['compare_median_ms']:.3f} ms")
+    print(f"compare() p95:     {result['compare_p95_ms']:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark: Promptgröße und Latenz pro Runde einer mehrrundigen Verhandlung.
+
+Spielt `--rounds` Runden mit vorgegebenen Verkäufer-Antworten gegen den
+LLM-Stub (`benchmarks.llm_stub`, Ollama-Protokoll) durch. Der Stub verzögert
+das erste Token pro Prompt-Token (`--prompt-token`), so wirkt sich die
+Promptgröße wie bei einem lokalen Modell auf die Latenz aus. Verglichen werden
+- voller Verlauf: jede Runde schickt alle bisherigen Nachrichten,
+- kompaktiert: Zusammenfassung + letzte Nachrichten (`NegotiationSession`),
+- kompaktiert + Context: zusätzlich Ollama-Context, nur die neue Nachricht geht raus.
+
+Aufruf aus dem Projektverzeichnis:
+    python -m benchmarks.bench_negotiation [--rounds 20] [--prompt-token 0.0005]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("CACHE_DIR", tempfile.mkdtemp(prefix="kleinanzeigen-bench-"))
+
+from benchmarks.bench_e2e import use_stub
+from benchmarks.llm_stub import StubLLMServer
+from data.models import AdInfo
+from logic.negotiation import NegotiationSession
+
+AD = AdInfo(
+    title="Trekkingrad Kalkhoff 28 Zoll, 24 Gänge",
+    price="450 € VB",
+    location="10437 Berlin",
+    description=("Verkaufe mein gut erhaltenes Trekkingrad. Rahmenhöhe 56 cm, Shimano Deore Schaltung. "
+                 "Neue Reifen seit letztem Sommer, Bremsen frisch eingestellt. Kleine Kratzer am Rahmen. "
+                 "Mit Gepäckträger, Schutzblechen und Nabendynamo. Abholung in Prenzlauer Berg, kein Versand. "
+                 "Rechnung vorhanden. Probefahrt nach Absprache gerne möglich.") * 2,
+    url="https://www.kleinanzeigen.de/s-anzeige/trekkingrad/2900000001-217-3331",
+)
+SELLER_REPLIES = [
+    "Hallo, ja das Rad ist noch da. 450 € sind aber schon knapp kalkuliert.",
+    "Die Kratzer sind nur oberflächlich, technisch ist alles top. Ich könnte auf 420 € runtergehen.",
+    "Probefahrt geht am Samstag ab 10 Uhr. Wann würde es Ihnen passen?",
+    "400 € ist mir zu wenig, 410 € wäre mein letztes Wort.",
+    "Ein Schloss lege ich gerne dazu, die Rechnung bekommen Sie auch.",
+    "Versand mache ich nicht, nur Abholung. Bar oder PayPal Freunde geht beides.",
+    "Samstag 11 Uhr passt. Die Adresse schicke ich Ihnen dann.",
+    "Der Nabendynamo funktioniert einwandfrei, das Licht ist erst ein Jahr alt.",
+]
+
+
+def _play(stub: StubLLMServer, session: NegotiationSession, rounds: int) -> dict:
+    start_index = len(stub.prompt_tokens)
+    latencies = []
+    start = time.perf_counter()
+    session.opening_message(regenerate=True)
+    latencies.append(time.perf_counter() - start)
+    for i in range(rounds - 1):
+        start = time.perf_counter()
+        session.reply(SELLER_REPLIES[i % len(SELLER_REPLIES)], regenerate=True)
+        latencies.append(time.perf_counter() - start)
+    tokens = stub.prompt_tokens[start_index:]
+    return {"prompt_tokens": tokens, "latency_ms": [round(s * 1000, 1) for s in latencies],
+            "summary_tokens": session._count(session.summary), "compacted": session.compacted}
+
+
+def run(rounds: int = 20, prompt_token_s: float = 0.0005, first_token_s: float = 0.02,
+        token_s: float = 0.001) -> dict:
+    directory = tempfile.mkdtemp(prefix="negotiations-")
+    variants = {
+        "voller Verlauf": dict(history_budget=10 ** 9, use_context=False),
+        "kompaktiert": dict(use_context=False),
+        "kompaktiert + Context": dict(use_context=True),
+    }
+    results = {}
+    with StubLLMServer(first_token_s, token_s, prompt_token_s=prompt_token_s) as stub:
+        use_stub(stub)
+        for name, options in variants.items():
+            session = NegotiationSession(AD, ["Interesse bekunden", "Nach Zustand fragen"], backend="ollama",
+                                         model="stub", directory=directory, **options)
+            results[name] = _play(stub, session, rounds)
+            # Wiederaufnahme aus der JSON-Datei liefert denselben Stand
+            restored = NegotiationSession.load(session.session_id, directory)
+            assert restored.build_prompt() == session.build_prompt()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--prompt-token", type=float, default=0.0005, help="Stub: Sekunden pro Prompt-Token")
+    args = parser.parse_args()
+
+    results = run(args.rounds, args.prompt_token)
+    marks = [r for r in (1, 5, 10, 20, 50) if r <= args.rounds]
+    print(f"{'Variante':<24}" + "".join(f"{'R' + str(r):>8}" for r in marks) + f"{'ms/Runde':>10}{'letzte':>9}")
+    for name, r in results.items():
+        tokens = "".join(f"{r['prompt_tokens'][m - 1]:>8}" for m in marks)
+        print(f"{name:<24}{tokens}{statistics.mean(r['latency_ms']):>10.1f}{r['latency_ms'][-1]:>9.1f}")
+    print("\nSpalten R1, R5, ...: Prompt-Tokens in Runde n (vom Stub gezählt, ohne wiederverwendeten Context)")
+
+
+if __name__ == "__main__":
+    main()
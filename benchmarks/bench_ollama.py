@@ -0,0 +1,90 @@
+"""
+Benchmark: Zeit bis zum ersten Token bei kaltem und warmem Ollama-Modell.
+
+Läuft gegen den LLM-Stub (`benchmarks.llm_stub`), der das Laden eines Modells
+mit `--load` Sekunden nachahmt und `keep_alive` wie Ollama auswertet. Szenarien:
+- kalt: erste Anfrage an ein nicht geladenes Modell (Ladezeit + erstes Token)
+- warm: direkt folgende Anfrage an dasselbe Modell
+- vorgeladen: `OllamaBackend.preload()` im Hintergrund beim "App-Start",
+  erste Anfrage nach `--think` Sekunden (Nutzer füllt das Formular aus)
+- abgelaufen: Pause länger als ein kurzes `keep_alive` → wieder kalt;
+  mit dem konfigurierten `keep_alive` bleibt das Modell warm
+
+Aufruf aus dem Projektverzeichnis:
+    python -m benchmarks.bench_ollama [--load 1.0] [--think 1.5] [--first-token 0.05]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+os.environ.setdefault("CACHE_DIR", tempfile.mkdtemp(prefix="kleinanzeigen-bench-"))
+
+import config
+from benchmarks.bench_e2e import use_stub
+from benchmarks.llm_stub import StubLLMServer
+from logic import llm_client
+from logic.ollama_backend import OllamaBackend
+
+PROMPT = "Formuliere eine kurze, freundliche Anfrage zur Verfügbarkeit."
+
+
+def _request(model: str) -> llm_client.StreamStats:
+    stats = llm_client.StreamStats()
+    "".join(llm_client.stream_ollama(PROMPT, model=model, stats=stats, regenerate=True))
+    return stats
+
+
+def _row(stats: llm_client.StreamStats) -> dict:
+    return {"ttft_ms": round(stats.first_token_s * 1000, 1), "load_ms": round((stats.load_s or 0) * 1000, 1)}
+
+
+def run(load_s: float = 1.0, think_s: float = 1.5, first_token_s: float = 0.05, token_s: float = 0.005,
+        short_keep_alive: float = 0.5) -> dict:
+    results = {}
+    keep_alive = config.OLLAMA_KEEP_ALIVE
+    with StubLLMServer(first_token_s, token_s, load_s=load_s) as stub:
+        use_stub(stub)
+        llm_client.get_ollama_client().list()   # Client-Import und Verbindung nicht mitmessen
+
+        results["kalt"] = _row(_request("modell-a"))
+        results["warm"] = _row(_request("modell-a"))
+
+        backend = OllamaBackend(model="modell-b").preload()
+        time.sleep(think_s)
+        results["vorgeladen"] = _row(_request("modell-b"))
+        results["vorgeladen"]["preload_ms"] = round((backend.preload_s or 0) * 1000, 1)
+        results["vorgeladen"]["resident"] = backend.is_resident()
+
+        try:
+            config.OLLAMA_KEEP_ALIVE = short_keep_alive
+            _request("modell-c")
+            time.sleep(short_keep_alive + 0.2)
+            results[f"abgelaufen (keep_alive {short_keep_alive:g} s)"] = _row(_request("modell-c"))
+        finally:
+            config.OLLAMA_KEEP_ALIVE = keep_alive
+        _request("modell-d")
+        time.sleep(short_keep_alive + 0.2)
+        results[f"nach Pause (keep_alive {keep_alive})"] = _row(_request("modell-d"))
+        backend.unload()
+        results["loads"] = stub.loads
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--load", type=float, default=1.0, help="Stub: Sekunden zum Laden des Modells")
+    parser.add_argument("--think", type=float, default=1.5, help="Sekunden zwischen App-Start und erster Anfrage")
+    parser.add_argument("--first-token", type=float, default=0.05, help="Stub: Sekunden bis zum ersten Chunk")
+    args = parser.parse_args()
+
+    results = run(args.load, args.think, args.first_token)
+    loads = results.pop("loads")
+    print(f"{'Szenario':<36}{'TTFT ms':>10}{'Laden ms':>10}")
+    for name, row in results.items():
+        print(f"{name:<36}{row['ttft_ms']:>10.1f}{row['load_ms']:>10.1f}")
+    print(f"\nModell-Ladevorgänge im Stub: {loads}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark: Parse-Zeit und Speicherspitze pro Anzeigenseite und Backend.
+
+Läuft offline über die HTML-Fixtures in `benchmarks/fixtures/` und vergleicht
+die frühere BeautifulSoup-Implementierung (mehrere Baum-Durchläufe) mit dem
+Single-Pass-Extractor auf allen installierten Backends.
+
+Aufruf aus dem Projektverzeichnis:
+    python -m benchmarks.bench_parser [--repeat 50]
+"""
+import argparse
+import glob
+import os
+import re
+import time
+import tracemalloc
+
+from logic.extractor import available_backends
+from logic.parser import parse_listing_html
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def legacy_parse(html, url):
+    """Vorherige Implementierung von `parse_listing_html` (BeautifulSoup) als Referenz."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+    title_tag = soup.find("h1")
+    title = title_tag.get_text(strip=True) if title_tag else ""
+    price_tag = soup.find(lambda tag: tag.name == "span" and "€" in tag.get_text())
+    price = price_tag.get_text(strip=True) if price_tag else ""
+    desc_section = soup.find(lambda tag: tag.name in ["h2", "div"] and "Beschreibung" in tag.get_text())
+    description = ""
+    if desc_section:
+        for sib in desc_section.find_next_siblings():
+            if sib.name == "p":
+                description += sib.get_text(strip=True) + "\n"
+            else:
+                break
+    image_urls = [img.get('src') for img in soup.find_all('img')
+                  if img.get('src') and "placeholder" not in img.get('src')]
+    contact_info = {}
+    seller_tag = soup.find(lambda tag: tag.name in ['span', 'div'] and 'verkäufer' in tag.get_text().lower())
+    if seller_tag:
+        contact_info['vorname'] = seller_tag.get_text(strip=True).split(" ", 1)[0]
+    all_text = soup.get_text(separator="\n")
+    phone_regex = re.compile(r'\b(\+?\d{1,3}[-.\s]?)?(\(?\d{2,5}\)?[-.\s]?)?\d{3,}([-.\s]?\d{2,})?\b')
+    phones = ["".join(p) for p in phone_regex.findall(all_text) if len("".join(p)) >= 8]
+    if phones:
+        contact_info['telefon'] = phones[0]
+    return {'title': title, 'price': price, 'description': description.strip(),
+            'image_urls': image_urls, 'contact_info': contact_info, 'url': url}
+
+
+def load_fixtures() -> dict:
+    fixtures = {}
+    for path in sorted(glob.glob(os.path.join(FIXTURE_DIR, "*.html"))):
+        with open(path, "rb") as f:
+            fixtures[os.path.basename(path)] = f.read()
+    return fixtures
+
+
+def _measure(func, html, repeat: int) -> tuple:
+    func(html, "fixture")  # Aufwärmen (Imports, Caches)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(html, "fixture")
+    elapsed_ms = (time.perf_counter() - start) / repeat * 1000
+    tracemalloc.start()
+    func(html, "fixture")
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed_ms, peak / 1024
+
+
+def run(repeat: int = 50) -> dict:
+    """
+    Führt den Benchmark aus und liefert `{backend: {fixture: {"ms": .., "peak_kib": ..}}}`.
+    """
+    candidates = {"bs4 (alt)": legacy_parse}
+    for backend in available_backends():
+        candidates[backend] = lambda html, url, b=backend: parse_listing_html(html, url, backend=b)
+
+    results = {}
+    for name, func in candidates.items():
+        results[name] = {}
+        for fixture, html in load_fixtures().items():
+            ms, peak = _measure(func, html, repeat)
+            results[name][fixture] = {"ms": round(ms, 3), "peak_kib": round(peak, 1)}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    results = run(args.repeat)
+    print(f"{'Backend':<14}{'Fixture':<26}{'ms/Seite':>10}{'Peak KiB':>12}")
+    for name, per_fixture in results.items():
+        for fixture, r in per_fixture.items():
+            print(f"{name:<14}{fixture:<26}{r['ms']:>10.2f}{r['peak_kib']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
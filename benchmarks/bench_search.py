@@ -0,0 +1,152 @@
+"""
+Benchmark: Suchergebnisseiten – Parse-Zeit pro Seite und Abrufe pro Anzeige.
+
+Läuft offline über `benchmarks/fixtures/search/` (Seite 1 mit 25, Seite 2
+mit 12 Ergebniskarten). Gemessen werden
+- die Parse-Zeit pro Suchseite für die frühere BeautifulSoup-Variante und den
+  Single-Pass-Extractor auf allen installierten Backends,
+- die Anzahl HTTP-Abrufe, die `iter_search_results` für alle Anzeigen einer
+  Suche braucht, im Vergleich zu einem Abruf pro Detailseite.
+
+Aufruf aus dem Projektverzeichnis:
+    python -m benchmarks.bench_search [--repeat 50]
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urljoin
+
+os.environ.setdefault("CACHE_DIR", tempfile.mkdtemp(prefix="kleinanzeigen-bench-"))
+
+from logic.extractor import available_backends
+from logic.fetch import HostRateLimiter
+from logic.search import iter_search_results, parse_search_page
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "search")
+PAGES = ("suche_seite1.html", "suche_seite2.html")
+SEARCH_PATH = "/s-fahrraeder/berlin/c217l3331"
+
+
+def load_pages() -> dict:
+    pages = {}
+    for name in PAGES:
+        with open(os.path.join(FIXTURE_DIR, name), "rb") as f:
+            pages[name] = f.read()
+    return pages
+
+
+def legacy_parse(html, base_url):
+    """Vorherige Implementierung von `parse_search_page` (BeautifulSoup) als Referenz."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    text = lambda tag: " ".join(tag.get_text(" ", strip=True).split()) if tag else ""
+    ads = []
+    for card in soup.select("article.aditem"):
+        link = card.select_one("a.ellipsis") or card.select_one("h2 a")
+        href = card.get("data-href") or (link.get("href") if link else None)
+        if not href:
+            continue
+        imagebox = card.select_one("[data-imgsrc]")
+        img = card.select_one("img[src]")
+        image = (imagebox.get("data-imgsrc") if imagebox else None) or (img.get("src") if img else None)
+        ads.append({"title": text(link), "url": urljoin(base_url, href), "image": image,
+                    "price": text(card.select_one(".aditem-main--middle--price-shipping--price")),
+                    "location": text(card.select_one(".aditem-main--top--left"))})
+    soup.select_one("a.pagination-next")
+    return ads
+
+
+def serve_pages(pages: dict) -> tuple:
+    """Liefert Seite 2 für Pfade mit `seite:2`, sonst Seite 1; zählt die Abrufe."""
+    hits = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            hits.append(self.path)
+            body = pages[PAGES[1] if "seite:2" in self.path else PAGES[0]]
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, hits
+
+
+def _measure(func, html, repeat: int) -> float:
+    func(html)   # Aufwärmen
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(html)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def run(repeat: int = 50) -> dict:
+    """
+    Liefert `{"parse": {backend: {seite: ms}}, "requests": {...}}`.
+    """
+    pages = load_pages()
+    base = "https://www.kleinanzeigen.de" + SEARCH_PATH
+    candidates = {"bs4 (alt)": lambda html: legacy_parse(html, base)}
+    for backend in available_backends():
+        candidates[backend] = lambda html, b=backend: parse_search_page(html, base, backend=b)
+    parse = {name: {page.removesuffix(".html"): round(_measure(func, html, repeat), 3)
+                    for page, html in pages.items()}
+             for name, func in candidates.items()}
+
+    server, hits = serve_pages(pages)
+    url = f"http://127.0.0.1:{server.server_address[1]}{SEARCH_PATH}?t={time.time_ns()}"
+    start = time.perf_counter()
+    ads = list(iter_search_results(url, limiter=HostRateLimiter(0)))
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    page_fetches = len(hits)
+    # Lazy: nur die ersten 10 Anzeigen -> Seite 2 wird nicht abgerufen
+    hits.clear()
+    gen = iter_search_results(url.replace("?t=", "?u="), limiter=HostRateLimiter(0))
+    first = [next(gen) for _ in range(10)]
+    gen.close()
+    lazy_fetches = len(hits)
+    server.shutdown()
+    return {
+        "parse": parse,
+        "requests": {
+            "ads": len(ads),
+            "search_fetches": page_fetches,
+            "detail_fetches": len(ads),
+            "fetches_for_first_10": lazy_fetches if len(first) == 10 else None,
+            "scan_ms": round(elapsed_ms, 3),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    result = run(args.repeat)
+    print(f"{'Backend':<14}{'Seite':<16}{'ms/Seite':>10}")
+    for name, per_page in result["parse"].items():
+        for page, ms in per_page.items():
+            print(f"{name:<14}{page:<16}{ms:>10.2f}")
+    r = result["requests"]
+    print(f"\n{r['ads']} Anzeigen mit {r['search_fetches']} Abrufen der Suchseiten ({r['scan_ms']:.1f} ms) "
+          f"statt {r['detail_fetches']} Detailseiten-Abrufen; für die ersten 10 Anzeigen: "
+          f"{r['fetches_for_first_10']} Abruf(e)")
+
+
+if __name__ == "__main__":
+    main()
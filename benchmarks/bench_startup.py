@@ -0,0 +1,109 @@
+"""
+Benchmark: Startzeit und Rerun-Overhead der Streamlit-App.
+
+- Import-Report: `python -X importtime` für die Importe von app.py, die
+  teuersten Module nach kumulierter Zeit.
+- Kaltstart: Wandzeit eines frischen Interpreters, der app.py einmal
+  ausführt (ohne Streamlit-Server, "bare mode").
+- Rerun: app.py wiederholt im selben Prozess ausführen (wie ein Streamlit-
+  Rerun ohne Klick auf "Nachricht generieren") und prüfen, welche der
+  schweren, erst bei Bedarf geladenen Module dabei importiert wurden.
+
+Aufruf aus dem Projektverzeichnis:
+    python -m benchmarks.bench_startup [--repeat 5] [--top 15]
+"""
+import argparse
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT, "app.py")
+# Module, die ein normaler Rerun nicht laden soll
+DEFERRED_MODULES = ("openai", "ollama", "requests", "bs4", "lxml", "logic.parser", "logic.market", "logic.store")
+_RUN_APP = f"import sys; sys.path.insert(0, {ROOT!r}); exec(compile(open({APP_PATH!r}).read(), 'app.py', 'exec'))"
+
+
+def importtime_report(statement: str = _RUN_APP, top: int = 15) -> list:
+    """
+    Führt `statement` mit `-X importtime` aus und liefert die `top` teuersten
+    Top-Level-Importe als `(modul, eigene_ms, kumuliert_ms)`.
+    """
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", statement],
+                          capture_output=True, text=True, cwd=ROOT)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if name.startswith(" ") and not name.startswith("  "):   # nur direkte Importe
+            rows.append((name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000))
+    rows.sort(key=lambda row: row[2], reverse=True)
+    return rows[:top]
+
+
+def cold_start(repeat: int = 5) -> float:
+    """Median der Wandzeit (ms) für Interpreterstart + einmaliges Ausführen von app.py."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", _RUN_APP], capture_output=True, cwd=ROOT, check=True)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def rerun_overhead(repeat: int = 20) -> tuple:
+    """
+    Median (ms) eines Reruns von app.py im laufenden Prozess und die Liste der
+    dabei geladenen `DEFERRED_MODULES`.
+    """
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    import streamlit  # noqa: F401  (Logger anlegen, um die "bare mode"-Warnungen abzuschalten)
+
+    for name in list(logging.root.manager.loggerDict):
+        if name.startswith("streamlit"):
+            logging.getLogger(name).setLevel(logging.ERROR)
+    with open(APP_PATH, encoding="utf-8") as f:
+        code = compile(f.read(), "app.py", "exec")
+    exec(code, {"__name__": "__main__"})      # erster Lauf: Importe, Caches füllen
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        exec(code, {"__name__": "__main__"})
+        times.append((time.perf_counter() - start) * 1000)
+    loaded = [name for name in DEFERRED_MODULES if name in sys.modules]
+    return statistics.median(times), loaded
+
+
+def run(repeat: int = 5, top: int = 15) -> dict:
+    rerun_ms, loaded = rerun_overhead(repeat * 4)
+    return {
+        "imports": importtime_report(top=top),
+        "cold_start_ms": round(cold_start(repeat), 1),
+        "rerun_ms": round(rerun_ms, 2),
+        "deferred_loaded": loaded,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    result = run(args.repeat, args.top)
+    print(f"{'Modul':<32}{'eigen ms':>10}{'kumuliert ms':>14}")
+    for name, self_ms, cumulative_ms in result["imports"]:
+        print(f"{name:<32}{self_ms:>10.1f}{cumulative_ms:>14.1f}")
+    print()
+    print(f"Kaltstart (Interpreter + app.py): {result['cold_start_ms']:.0f} ms")
+    print(f"Rerun ohne Generierung:           {result['rerun_ms']:.2f} ms")
+    print(f"Geladene schwere Module:          {', '.join(result['deferred_loaded']) or 'keine'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark: Anzeigen-Speicher (`logic.store`) mit synthetischen Anzeigen.
+
+Misst Bulk-Import (Batches in Transaktionen), erneuten Import derselben
+Anzeigen (Deduplizierung, Preisänderungen) und die Latenz von `similar()`.
+
+Aufruf aus dem Projektverzeichnis:
+    python -m benchmarks.bench_store [--size 200000] [--queries 200]
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from benchmarks.bench_market import synthetic_corpus
+from data.models import AdInfo
+from logic.store import ListingStore
+
+WORDS = ["gepflegt", "wenig", "benutzt", "Kratzer", "Rechnung", "vorhanden", "Nichtraucher", "Haushalt",
+         "funktioniert", "einwandfrei", "Originalverpackung", "Akku", "Garantie", "Zubehör", "Keller"]
+
+
+def synthetic_ads(size: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    ads = []
+    for i, (title, amount, _) in enumerate(synthetic_corpus(size, seed)):
+        description = " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 30))) + f" Nr. {i}"
+        price = "VB" if amount is None else "Zu verschenken" if amount == 0 else f"{amount:.0f} € VB"
+        ads.append(AdInfo(title=title, price=price, location="10245 Berlin", description=description,
+                          url=f"https://www.kleinanzeigen.de/s-anzeige/bench/{1000000000 + i}-217-3331"))
+    return ads
+
+
+def run(size: int = 200000, queries: int = 200, path: str = None) -> dict:
+    ads = synthetic_ads(size)
+    tmp_dir = None
+    if path is None:
+        tmp_dir = tempfile.TemporaryDirectory()
+        path = os.path.join(tmp_dir.name, "listings.sqlite3")
+    store = ListingStore(path)
+
+    start = time.perf_counter()
+    store.upsert_many(ads)
+    insert_s = time.perf_counter() - start
+
+    rng = random.Random(1)
+    for ad in rng.sample(ads, size // 10):
+        ad.price = f"{rng.randint(5, 900)} €"
+    start = time.perf_counter()
+    statuses = store.upsert_many(ads)
+    reimport_s = time.perf_counter() - start
+
+    latencies = []
+    for ad in rng.sample(ads, min(queries, size)):
+        start = time.perf_counter()
+        store.similar(ad, limit=20)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    result = {
+        "size": size,
+        "insert_rows_per_s": round(size / insert_s),
+        "reimport_rows_per_s": round(size / reimport_s),
+        "updated": statuses.count("updated"),
+        "similar_median_ms": round(statistics.median(latencies), 2),
+        "similar_p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 2),
+    }
+    if tmp_dir:
+        tmp_dir.cleanup()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=int, default=200000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--path", default=None, help="SQLite-Datei (Standard: temporär)")
+    args = parser.parse_args()
+
+    result = run(args.size, args.queries, args.path)
+    print(f"Anzeigen:            {result['size']}")
+    print(f"Import:              {result['insert_rows_per_s']} Zeilen/s")
+    print(f"Erneuter Import:     {result['reimport_rows_per_s']} Zeilen/s ({result['updated']} Preisänderungen)")
+    print(f"similar() Median:    {result['similar_median_ms']:.2f} ms")
+    print(f"similar() p95:       {result['similar_p95_ms']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
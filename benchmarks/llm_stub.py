@@ -0,0 +1,272 @@
+"""
+Lokaler LLM-Ersatz für Benchmarks: spricht die HTTP-Protokolle von Ollama
+(`/api/chat`, `/api/generate`, `/api/tags`) und OpenAI (`/v1/chat/completions`)
+mit einstellbarer Latenz, ohne ein Modell zu laden.
+
+Antworten werden gestreamt (NDJSON bzw. Server-Sent Events) oder am Stück
+geliefert, je nach `stream` im Request. Die Latenz setzt sich aus
+`first_token_s` (bis zum ersten Chunk) und `token_s` pro weiterem Chunk
+zusammen.
+
+Mit `load_s` ahmt der Stub das Laden eines Ollama-Modells nach: Ist das
+Modell nicht geladen, wartet die Anfrage zusätzlich `load_s` (gemeldet als
+`load_duration`). Danach bleibt es `keep_alive` lang geladen (Standard 5 min,
+`0` entlädt sofort, negativ = unbegrenzt); `/api/ps` listet geladene Modelle.
+Eine Anfrage ohne Prompt lädt nur das Modell.
+
+`prompt_token_s` verzögert das erste Token zusätzlich pro Prompt-Token
+(≈ 4 Zeichen). `/api/generate` liefert wie Ollama einen `context`; wird er
+zurückgeschickt, zählt nur der neue Prompt (der Verlauf liegt schon im Cache).
+
+Eigenständig starten:
+    python -m benchmarks.llm_stub [--port 11434] [--first-token 0.2] [--token 0.01]
+
+Danach z. B. `OLLAMA_HOST=http://127.0.0.1:11434` bzw.
+`OPENAI_BASE_URL=http://127.0.0.1:11434/v1` setzen.
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_KEEP_ALIVE = 300.0
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_keep_alive(value) -> float:
+    """`keep_alive` wie bei Ollama: Sekunden als Zahl oder Dauer wie "30m", "1h30m"."""
+    if value is None:
+        return DEFAULT_KEEP_ALIVE
+    if isinstance(value, (int, float)):
+        seconds = float(value)
+    else:
+        value = str(value).strip()
+        try:
+            seconds = float(value)
+        except ValueError:
+            sign = -1.0 if value.startswith("-") else 1.0
+            parts = re.findall(r"([\d.]+)(ms|s|m|h)", value)
+            seconds = sign * sum(float(n) * _DURATION_UNITS[u] for n, u in parts)
+    return float("inf") if seconds < 0 else seconds
+
+
+REPLY = ("Hallo, ich interessiere mich für Ihren Artikel. Ist er noch verfügbar? "
+         "Wäre eine Abholung am Wochenende möglich? Viele Grüße")
+
+
+class StubLLMServer:
+    """HTTP-Server in einem Hintergrund-Thread; `url` ist die Basisadresse."""
+
+    def __init__(self, first_token_s: float = 0.05, token_s: float = 0.005, reply: str = REPLY,
+                 host: str = "127.0.0.1", port: int = 0, load_s: float = 0.0, prompt_token_s: float = 0.0):
+        self.first_token_s = first_token_s
+        self.token_s = token_s
+        self.load_s = load_s
+        self.prompt_token_s = prompt_token_s
+        self.prompt_tokens = []  # Prompt-Tokens pro Anfrage (ohne wiederverwendeten Context)
+        self.chunks = [word + " " for word in reply.split(" ")]
+        self.requests = 0
+        self.loads = 0
+        self._loaded = {}        # Modell -> Zeitpunkt (monotonic), zu dem es entladen wird
+        self._load_lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubLLMServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _ensure_loaded(self, model: str, keep_alive) -> float:
+        """Lädt `model` falls nötig (wartet `load_s`) und gibt die Ladezeit zurück."""
+        keep = parse_keep_alive(keep_alive)
+        with self._load_lock:   # wie Ollama: ein Modell wird nur einmal gleichzeitig geladen
+            now = time.monotonic()
+            load = 0.0
+            if self._loaded.get(model, 0.0) <= now and self.load_s:
+                time.sleep(self.load_s)
+                self.loads += 1
+                load = self.load_s
+            if keep:
+                self._loaded[model] = time.monotonic() + keep
+            else:
+                self._loaded.pop(model, None)
+        return load
+
+    def loaded(self) -> dict:
+        """Geladene Modelle -> Restzeit in Sekunden."""
+        now = time.monotonic()
+        return {m: until - now for m, until in self._loaded.items() if until > now}
+
+    def _tokens(self, prompt_tokens: int = 0):
+        # Wartezeiten wie bei einem echten Modell: Prompt-Verarbeitung, dann Token für Token
+        time.sleep(self.first_token_s + prompt_tokens * self.prompt_token_s)
+        for i, chunk in enumerate(self.chunks):
+            if i:
+                time.sleep(self.token_s)
+            yield chunk
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True   # Header und Body sonst mit 40 ms Delayed-ACK
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._json({"models": [{"name": "stub", "model": "stub", "size": 0}]})
+                elif self.path == "/api/ps":
+                    now = time.time()
+                    models = [{"name": m, "model": m, "size": 0, "size_vram": 0, "digest": "",
+                               "expires_at": datetime.fromtimestamp(min(now + rest, 4e9), timezone.utc).isoformat()}
+                              for m, rest in stub.loaded().items()]
+                    self._json({"models": models})
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                stub.requests += 1
+                if self.path in ("/api/chat", "/api/generate"):
+                    self._ollama(body, chat=self.path == "/api/chat")
+                elif self.path in ("/v1/chat/completions", "/chat/completions"):
+                    self._openai(body)
+                else:
+                    self.send_error(404)
+
+            def _json(self, obj, status=200):
+                data = json.dumps(obj).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _start_chunked(self, content_type: str):
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+            def _chunk(self, data: bytes):
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+
+            def _ollama(self, body: dict, chat: bool):
+                model = body.get("model", "stub")
+                started = time.perf_counter()
+
+                def message(text, done, **extra):
+                    payload = {"model": model, "created_at": "2024-01-01T00:00:00Z", "done": done, **extra}
+                    if chat:
+                        payload["message"] = {"role": "assistant", "content": text}
+                    else:
+                        payload["response"] = text
+                    return payload
+
+                empty = not (body.get("messages") if chat else body.get("prompt"))
+                if empty and not parse_keep_alive(body.get("keep_alive")):
+                    stub._loaded.pop(model, None)    # nur entladen
+                    self._json(message("", True, done_reason="unload", total_duration=0, load_duration=0))
+                    return
+                load_ns = int(stub._ensure_loaded(model, body.get("keep_alive")) * 1e9)
+                if chat:
+                    prompt = "".join(m.get("content") or "" for m in body.get("messages") or ())
+                else:
+                    prompt = body.get("prompt") or ""
+                prompt_tokens = len(prompt) // 4 + 1
+
+                def final():
+                    elapsed = int((time.perf_counter() - started) * 1e9)
+                    extra = {}
+                    if not chat:
+                        # Context = bisherige "Token-IDs" + neuer Prompt + Antwort
+                        extra["context"] = list(body.get("context") or ()) + list(
+                            range(prompt_tokens + len(stub.chunks)))
+                    return dict(done_reason="stop", total_duration=elapsed, load_duration=load_ns,
+                                eval_count=len(stub.chunks), eval_duration=elapsed - load_ns,
+                                prompt_eval_count=prompt_tokens, **extra)
+
+                if empty:
+                    # Nur Modell laden (Ollama antwortet ohne Tokens)
+                    elapsed = int((time.perf_counter() - started) * 1e9)
+                    self._json(message("", True, done_reason="load", total_duration=elapsed, load_duration=load_ns))
+                    return
+
+                stub.prompt_tokens.append(prompt_tokens)
+                if body.get("stream", True):
+                    self._start_chunked("application/x-ndjson")
+                    for text in stub._tokens(prompt_tokens):
+                        self._chunk((json.dumps(message(text, False)) + "\n").encode())
+                    self._chunk((json.dumps(message("", True, **final())) + "\n").encode())
+                    self.wfile.write(b"0\r\n\r\n")
+                else:
+                    text = "".join(stub._tokens(prompt_tokens))
+                    self._json(message(text, True, **final()))
+
+            def _openai(self, body: dict):
+                model = body.get("model", "stub")
+                usage = {"prompt_tokens": len(str(body)) // 4, "completion_tokens": len(stub.chunks)}
+                usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+                base = {"id": "chatcmpl-stub", "created": int(time.time()), "model": model}
+                if body.get("stream"):
+                    self._start_chunked("text/event-stream")
+                    for text in stub._tokens():
+                        event = dict(base, object="chat.completion.chunk",
+                                     choices=[{"index": 0, "delta": {"content": text}, "finish_reason": None}])
+                        self._chunk(f"data: {json.dumps(event)}\n\n".encode())
+                    if (body.get("stream_options") or {}).get("include_usage"):
+                        event = dict(base, object="chat.completion.chunk", choices=[], usage=usage)
+                        self._chunk(f"data: {json.dumps(event)}\n\n".encode())
+                    self._chunk(b"data: [DONE]\n\n")
+                    self.wfile.write(b"0\r\n\r\n")
+                else:
+                    text = "".join(stub._tokens()).strip()
+                    self._json(dict(base, object="chat.completion", usage=usage, choices=[
+                        {"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}]))
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--first-token", type=float, default=0.2, help="Sekunden bis zum ersten Chunk")
+    parser.add_argument("--token", type=float, default=0.01, help="Sekunden pro weiterem Chunk")
+    parser.add_argument("--load", type=float, default=0.0, help="Sekunden zum Laden eines nicht geladenen Modells")
+    args = parser.parse_args()
+
+    server = StubLLMServer(args.first_token, args.token, port=args.port, load_s=args.load)
+    print(f"LLM-Stub auf {server.url} (Ollama: {server.url}, OpenAI: {server.url}/v1)")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
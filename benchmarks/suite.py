@@ -0,0 +1,185 @@
+"""
+Offline-Benchmark-Suite mit gespeicherten Baselines.
+
+Führt die Benchmarks ohne Netzwerk aus – Parser über die HTML-Fixtures
+(Detail- und Suchseiten), Kalender über synthetische ICS-Dateien wachsender
+Größe, Ende-zu-Ende gegen den lokalen LLM-Stub – und vergleicht die Kennzahlen mit
+`benchmarks/baselines.json`. Eine Kennzahl gilt als Regression, wenn sie
+um mehr als `--tolerance` (relativ) UND mehr als `--min-delta` (absolut)
+schlechter ist als die Baseline. Dann ist der Exit-Code 1.
+
+Die Toleranz ist bewusst grob (50 %): Zeiten auf geteilten Maschinen
+schwanken zwischen Prozessen um bis zu 40 %; gesucht sind echte Einbrüche,
+keine Prozente. Pro Kennzahl zählt der beste von mehreren Läufen.
+
+Zur Kalender-Skalierung wird zusätzlich das Verhältnis der Laufzeiten bei
+5000 und 1000 Terminen geteilt durch das Größenverhältnis erfasst
+(`calendar.*_scaling`, ≈ 1 bei linearem Verhalten) – so fällt ein
+quadratischer Ausreißer auch auf, wenn die kleinen Größen schnell bleiben.
+
+Aufruf aus dem Projektverzeichnis:
+    python -m benchmarks.suite                 # messen und vergleichen
+    python -m benchmarks.suite --update        # Baselines neu schreiben
+    python -m benchmarks.suite --only parser calendar
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("CACHE_DIR", tempfile.mkdtemp(prefix="kleinanzeigen-bench-"))
+
+from benchmarks import bench_calendar, bench_e2e, bench_parser, bench_search
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines.json")
+DEFAULT_TOLERANCE = 0.5
+DEFAULT_MIN_DELTA = 1.0          # Millisekunden bzw. Faktor – kleinere Ausschläge sind Rauschen
+CALENDAR_SIZES = (100, 1000, 5000)
+REPEATS = 3
+
+
+def best_of(func, repeats: int = REPEATS) -> dict:
+    runs = [func() for _ in range(repeats)]
+    return {key: min(run[key] for run in runs) for key in runs[0]}
+
+
+def parser_metrics() -> dict:
+    results = bench_parser.run(repeat=20)
+    return {f"parser.{backend}.{fixture.removesuffix('.html')}.ms": r["ms"]
+            for backend, per_fixture in results.items() if backend != "bs4 (alt)"
+            for fixture, r in per_fixture.items()}
+
+
+def search_metrics() -> dict:
+    results = bench_search.run(repeat=20)
+    metrics = {f"search.{backend}.{page}.ms": ms
+               for backend, per_page in results["parse"].items() if backend != "bs4 (alt)"
+               for page, ms in per_page.items()}
+    metrics["search.fetches_per_ad"] = round(results["requests"]["search_fetches"] / results["requests"]["ads"], 3)
+    return metrics
+
+
+def calendar_metrics() -> dict:
+    results = bench_calendar.run(CALENDAR_SIZES, days_ahead=90, lookups=2000)
+    metrics = {}
+    for n, r in results.items():
+        for key in ("parse_ms", "legacy_appointments_ms", "index_ms", "free_slots_ms"):
+            metrics[f"calendar.{n}.{key}"] = r[key]
+        metrics[f"calendar.{n}.lookup_us"] = r["lookup_us"]
+    small, large = CALENDAR_SIZES[-2], CALENDAR_SIZES[-1]
+    for key in ("parse_ms", "legacy_appointments_ms", "index_ms"):
+        if results[small][key]:
+            ratio = results[large][key] / results[small][key] / (large / small)
+            metrics[f"calendar.{key[:-3]}_scaling"] = round(ratio, 3)
+    return metrics
+
+
+def e2e_metrics() -> dict:
+    result = bench_e2e.run(requests=20, first_token_s=0.05, token_s=0.005)
+    # Nur Mediane: p95 aus 20 Anfragen schwankt zu stark für einen Regressionstest
+    return {f"e2e.{key}": value for key, value in result.items() if key.endswith("_p50_ms")}
+
+
+SUITES = {
+    "parser": lambda: best_of(parser_metrics),
+    "search": lambda: best_of(search_metrics),
+    "calendar": lambda: best_of(calendar_metrics),
+    "e2e": lambda: best_of(e2e_metrics),
+}
+
+
+def load_baseline(path: str = BASELINE_PATH) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f).get("metrics", {})
+
+
+def save_baseline(metrics: dict, path: str = BASELINE_PATH):
+    data = {
+        "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPU",
+        "metrics": dict(sorted(metrics.items())),
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+
+
+def compare(current: dict, baseline: dict, tolerance: float = DEFAULT_TOLERANCE,
+            min_delta: float = DEFAULT_MIN_DELTA) -> list:
+    """
+    Vergleicht alle Kennzahlen (kleiner ist besser). Rückgabe: Liste von
+    `(name, baseline, aktuell, änderung, status)` mit status "regression",
+    "improved", "ok" oder "new".
+    """
+    rows = []
+    for name, value in sorted(current.items()):
+        base = baseline.get(name)
+        if base is None:
+            rows.append((name, None, value, None, "new"))
+            continue
+        change = (value - base) / base if base else 0.0
+        delta = value - base
+        if change > tolerance and delta > min_delta:
+            status = "regression"
+        elif change < -tolerance and -delta > min_delta:
+            status = "improved"
+        else:
+            status = "ok"
+        rows.append((name, base, value, change, status))
+    return rows
+
+
+def run(only=None) -> dict:
+    metrics = {}
+    for name, func in SUITES.items():
+        if only and name not in only:
+            continue
+        start = time.perf_counter()
+        metrics.update(func())
+        print(f"{name}: {time.perf_counter() - start:.1f} s", file=sys.stderr)
+    return metrics
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--only", nargs="+", choices=sorted(SUITES), help="nur diese Benchmarks")
+    parser.add_argument("--update", action="store_true", help="Baselines mit den aktuellen Werten überschreiben")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="erlaubte relative Verschlechterung")
+    parser.add_argument("--min-delta", type=float, default=DEFAULT_MIN_DELTA, help="erlaubte absolute Verschlechterung")
+    parser.add_argument("--json", action="store_true", help="Ergebnis als JSON ausgeben")
+    args = parser.parse_args(argv)
+
+    current = run(args.only)
+    baseline = load_baseline(args.baseline)
+    if args.update:
+        # Nur die gemessenen Kennzahlen ersetzen, die übrigen Baselines bleiben erhalten
+        save_baseline({**baseline, **current}, args.baseline)
+        print(f"Baselines gespeichert: {args.baseline}")
+        return 0
+
+    rows = compare(current, baseline, args.tolerance, args.min_delta)
+    if args.json:
+        print(json.dumps([dict(zip(("name", "baseline", "current", "change", "status"), row)) for row in rows],
+                         indent=2))
+    else:
+        print(f"{'Kennzahl':<48}{'Baseline':>12}{'Aktuell':>12}{'Änderung':>10}  Status")
+        for name, base, value, change, status in rows:
+            base_text = f"{base:.3f}" if base is not None else "–"
+            change_text = f"{change:+.0%}" if change is not None else "–"
+            print(f"{name:<48}{base_text:>12}{value:>12.3f}{change_text:>10}  {status}")
+    regressions = [row[0] for row in rows if row[4] == "regression"]
+    if regressions:
+        print(f"{len(regressions)} Regression(en): {', '.join(regressions)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
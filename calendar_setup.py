@@ -0,0 +1,52 @@
+"""
+Kalenderquelle einrichten und abgleichen, ohne Streamlit.
+
+Die Google-Anmeldung öffnet einen Browser und wartet auf den Redirect – das
+gehört nicht in einen Streamlit-Rerun, sondern wird hier einmalig erledigt.
+Das Token landet unter `data/cache/google_token.json` und wird danach von der
+App (mit `CALENDAR_SOURCE=google`) nur noch gelesen und erneuert.
+
+Aufruf:
+    python calendar_setup.py authorize [--calendar primary]
+    python calendar_setup.py sync [--source google] [--full]
+    python calendar_setup.py status [--source google]
+"""
+import argparse
+import os
+
+from logic import calendar_sync
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Kalenderquelle für freie Termine einrichten und abgleichen.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    authorize = sub.add_parser("authorize", help="Google-Konto anmelden (öffnet den Browser)")
+    authorize.add_argument("--calendar", default=os.getenv("GOOGLE_CALENDAR_ID", "primary"))
+    sync = sub.add_parser("sync", help="einmal abgleichen")
+    sync.add_argument("--source", help="ics, google oder local (Standard: CALENDAR_SOURCE)")
+    sync.add_argument("--full", action="store_true", help="Cache verwerfen und vollständig abgleichen")
+    status = sub.add_parser("status", help="Stand des Abgleichs anzeigen")
+    status.add_argument("--source", help="ics, google oder local (Standard: CALENDAR_SOURCE)")
+    args = parser.parse_args(argv)
+
+    if args.command == "authorize":
+        source = calendar_sync.GoogleCalendarSource(args.calendar)
+        source.authorize()
+        print(f"Angemeldet, Token gespeichert unter {source.token_path}")
+        return
+    sync_state = calendar_sync.CalendarSync(calendar_sync.make_source(args.source))
+    if args.command == "sync":
+        if args.full:
+            sync_state.cache.clear(sync_state.source.name)
+        result = sync_state.refresh(force=True)
+        if result.error:
+            raise SystemExit(f"Abgleich fehlgeschlagen: {result.error}")
+        print(f"{'Vollständig' if result.full else 'Inkrementell'}: {result.transferred} Termine übertragen, "
+              f"{result.busy} belegt ({result.duration_s * 1000:.0f} ms)")
+    elif args.command == "status":
+        for key, value in sync_state.status().items():
+            print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
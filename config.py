@@ -1,45 +1,64 @@
 """
 Globale Konfiguration (Modelle, API-Keys, Zeitzone).
 Lädt .env lokal UND Streamlit-Secrets in der Cloud.
+
+Der OpenAI-Key wird erst beim ersten Zugriff auf `config.openai_api_key`
+ermittelt (Modul-`__getattr__`); ein fehlender Key ist kein Fehler beim
+Import, sondern wird erst beim Aufruf des OpenAI-Backends gemeldet. So
+startet die App auch im reinen Ollama-Betrieb.
 """
-import streamlit as st
 import os
-from pathlib import Path
-from dotenv import load_dotenv
-import openai
-
-
-openai.api_key = st.secrets.get("openai_api_key", None) or os.getenv("openai_api_key")
-if not openai.api_key:
-    raise RuntimeError(
-        "OpenAI-Modus aktiv, aber kein API-Key gefunden. "
-        "Bitte in `.streamlit/secrets.toml` oder als ENV `openai_api_key` setzen "
-        "oder `USE_OLLAMA=True` in config.py wählen."
-    )
-# 2) Key zunächst aus der Umgebung holen
-openai_api_key: str | None = os.getenv("openai_api_key")
-
-# 3) Wenn leer → versuchen, aus Streamlit-Secrets zu lesen
-try:
-    import streamlit as st  # funktioniert nur, wenn Code im Streamlit-Runtime läuft
-
-    if not openai_api_key and "openai_api_key" in st.secrets:
-        openai_api_key = st.secrets["openai_api_key"]
-except ModuleNotFoundError:
-    # Streamlit nicht importierbar (z. B. bei reinem CLI-Script) → ignorieren
-    pass
-
-# 4) Weitere Defaults
+
+# Defaults (ohne schwere Importe)
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.2")
+# Wie lange Ollama das Modell nach der letzten Anfrage im Speicher hält
+# (Dauer wie "30m"/"2h", Sekunden, "-1" = unbegrenzt). Vorgeladen wird, sobald Ollama
+# ausgewählt ist; mit OLLAMA_PRELOAD=1 schon beim Start, auch wenn OpenAI ausgewählt ist
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+OLLAMA_PRELOAD = os.getenv("OLLAMA_PRELOAD", "0").lower() in ("1", "true", "yes", "on")
 TIMEZONE = os.getenv("TIMEZONE", "Europe/Berlin")
+# Kalenderquelle für freie Termine: "ics" (data/Kalender.ics), "google" oder "local" (siehe logic.calendar_sync)
+CALENDAR_SOURCE = os.getenv("CALENDAR_SOURCE", "ics").lower()
+
+_UNSET = object()
+_openai_api_key = _UNSET
+
+
+def _resolve_openai_api_key() -> str | None:
+    # 1) Umgebung bzw. lokale .env-Datei
+    key = os.getenv("openai_api_key")
+    if not key:
+        try:
+            from dotenv import load_dotenv
+
+            load_dotenv()
+            key = os.getenv("openai_api_key")
+        except ImportError:
+            pass
+    # 2) Wenn leer → versuchen, aus Streamlit-Secrets zu lesen
+    if not key:
+        try:
+            import streamlit as st  # funktioniert nur, wenn Code im Streamlit-Runtime läuft
+
+            if "openai_api_key" in st.secrets:
+                key = st.secrets["openai_api_key"]
+        except Exception:
+            # Streamlit nicht importierbar oder keine secrets.toml (z. B. bei reinem CLI-Script)
+            pass
+    return key or None
+
+
+def get_openai_api_key() -> str | None:
+    """OpenAI-Key (einmalig ermittelt und danach gemerkt) oder None."""
+    global _openai_api_key
+    if _openai_api_key is _UNSET:
+        _openai_api_key = _resolve_openai_api_key()
+    return _openai_api_key
 
-# 5) Optional sofort in openai-SDK registrieren
-try:
-    import openai
 
-    if openai_api_key:
-        openai.api_key = openai_api_key
-except ImportError:
-    # openai nicht installiert – z. B. reiner Ollama-Betrieb
-    pass
+def __getattr__(name):
+    # `config.openai_api_key` bleibt als Attribut nutzbar, wird aber lazy aufgelöst
+    if name == "openai_api_key":
+        return get_openai_api_key()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
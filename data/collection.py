@@ -0,0 +1,247 @@
+"""
+Spaltenorientierte Ablage vieler Anzeigen (`AdCollection`).
+
+Für Auswertungen über zehntausende Anzeigen ist eine Liste von `AdInfo`-
+Objekten (je ein Objekt plus Liste und Dict pro Anzeige) unnötig groß. Die
+Collection speichert stattdessen eine Spalte pro Feld:
+
+- Texte als Listen, der Ort dictionary-kodiert (`array('i')` + Werteliste),
+- der numerische Preis als `array('d')` (NaN = unbekannt),
+- Bild-URLs als flache Liste mit Offsets (`array('i')`, Arrow-Layout).
+
+Filter arbeiten vektorisiert direkt auf den Spalten (NumPy-Sichten auf die
+Array-Puffer per `np.frombuffer`, ohne Kopie); `AdInfo`-Objekte werden erst
+beim Zugriff (`collection[i]`, Iteration) erzeugt. Der Export nach Arrow nutzt
+die Puffer der Arrays ohne Kopie; Parquet/Arrow-IPC setzen `pyarrow` voraus.
+NumPy wird erst beim ersten Filter importiert.
+"""
+import math
+from array import array
+from typing import Iterable
+
+from data.models import AdInfo
+from data.prices import normalize_price
+
+
+def _price_value(text: str) -> float:
+    """Zahlenwert des Preistexts (NaN, falls keiner erkennbar ist)."""
+    amount = normalize_price(text).amount
+    return math.nan if amount is None else amount
+
+
+class AdCollection:
+    """
+    Spaltenspeicher für `AdInfo`-Datensätze.
+
+    Hinweis zum Arrow-Export: Solange eine mit `to_arrow()` erzeugte Tabelle
+    lebt, teilt sie sich die Puffer mit der Collection; `append` schlägt dann
+    mit `BufferError` fehl.
+    """
+
+    def __init__(self, ads: Iterable[AdInfo] = ()):
+        self._title = []
+        self._price = []
+        self._price_value = array("d")
+        self._location_codes = array("i")
+        self._locations = []             # Code -> Ortstext
+        self._location_lookup = {}       # Ortstext -> Code
+        self._description = []
+        self._image_offsets = array("i", [0])
+        self._image_urls = []
+        self._contact_info = []
+        self._url = []
+        for ad in ads:
+            self.append(ad)
+
+    # --- Aufbau -----------------------------------------------------------
+    def append(self, ad: AdInfo):
+        """
+        Hängt eine Anzeige an. Löst `BufferError` aus, solange eine mit
+        `to_arrow()` erzeugte Tabelle (oder eine andere Sicht auf die Puffer) lebt.
+        """
+        self._append_row(ad.title, ad.price, _price_value(ad.price), ad.location, ad.description,
+                         ad.image_urls, ad.contact_info, ad.url)
+
+    def extend(self, ads: Iterable[AdInfo]):
+        for ad in ads:
+            self.append(ad)
+
+    def _append_row(self, title, price, price_value, location, description, image_urls, contact_info, url):
+        self._price_value.append(price_value)
+        self._location_codes.append(self._location_code(location))
+        self._image_urls.extend(image_urls)
+        self._image_offsets.append(len(self._image_urls))
+        self._title.append(title)
+        self._price.append(price)
+        self._description.append(description)
+        self._contact_info.append(contact_info)
+        self._url.append(url)
+
+    def _location_code(self, location: str) -> int:
+        code = self._location_lookup.get(location)
+        if code is None:
+            code = self._location_lookup[location] = len(self._locations)
+            self._locations.append(location)
+        return code
+
+    # --- Zugriff ----------------------------------------------------------
+    def __len__(self):
+        return len(self._title)
+
+    def __getitem__(self, i: int) -> AdInfo:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("AdCollection index out of range")
+        return AdInfo(
+            title=self._title[i],
+            price=self._price[i],
+            location=self._locations[self._location_codes[i]],
+            description=self._description[i],
+            image_urls=self._image_urls[self._image_offsets[i]:self._image_offsets[i + 1]],
+            contact_info=dict(self._contact_info[i]),
+            url=self._url[i],
+        )
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def price_values(self) -> array:
+        """Numerische Preise (ohne Kopie; NaN = unbekannt)."""
+        return self._price_value
+
+    def titles(self) -> list:
+        return self._title
+
+    def urls(self) -> list:
+        return self._url
+
+    def locations(self) -> list:
+        """Alle vorkommenden Orte (je einmal)."""
+        return list(self._locations)
+
+    # --- Filter -----------------------------------------------------------
+    def indices(self, min_price: float = None, max_price: float = None, location: str = None,
+                include_unpriced: bool = False) -> list:
+        """
+        Zeilennummern, deren Preis in [min_price, max_price] liegt und deren Ort
+        `location` enthält (ohne Groß-/Kleinschreibung). Anzeigen ohne
+        erkennbaren Preis zählen nur mit `include_unpriced=True`.
+
+        Der Ortsfilter prüft nur die (wenigen) verschiedenen Orte als Text und
+        vergleicht dann die Codes; Orts- und Preisfilter laufen als NumPy-Masken
+        über Sichten auf die Array-Puffer. Die Sichten leben nur während des Aufrufs.
+        """
+        import numpy as np
+
+        n = len(self)
+        price_filter = min_price is not None or max_price is not None or include_unpriced
+        if not n or (not location and not price_filter):
+            return list(range(n))
+        mask = None
+        if location:
+            needle = location.lower()
+            codes = [code for code, value in enumerate(self._locations) if needle in value.lower()]
+            if not codes:
+                return []
+            mask = np.isin(np.frombuffer(self._location_codes, dtype=np.intc, count=n), codes)
+        if price_filter:
+            values = np.frombuffer(self._price_value, dtype=np.float64, count=n)
+            price_mask = np.ones(n, dtype=bool)
+            if min_price is not None:
+                price_mask &= values >= min_price
+            if max_price is not None:
+                price_mask &= values <= max_price
+            if include_unpriced:
+                price_mask |= np.isnan(values)
+            else:
+                price_mask &= ~np.isnan(values)
+            mask = price_mask if mask is None else mask & price_mask
+        return np.flatnonzero(mask).tolist()
+
+    def filter(self, **kwargs) -> "AdCollection":
+        """Neue Collection mit den Treffern von `indices(**kwargs)`."""
+        return self.take(self.indices(**kwargs))
+
+    def take(self, rows: Iterable[int]) -> "AdCollection":
+        """Neue Collection mit den angegebenen Zeilen (spaltenweise kopiert)."""
+        result = AdCollection()
+        offsets = self._image_offsets
+        for i in rows:
+            result._append_row(
+                self._title[i], self._price[i], self._price_value[i],
+                self._locations[self._location_codes[i]], self._description[i],
+                self._image_urls[offsets[i]:offsets[i + 1]], self._contact_info[i], self._url[i],
+            )
+        return result
+
+    # --- Arrow / Parquet --------------------------------------------------
+    def to_arrow(self):
+        """
+        Liefert eine `pyarrow.Table`. Preis, Orts-Codes und Bild-Offsets werden
+        ohne Kopie aus den Array-Puffern übernommen – solange die Tabelle lebt,
+        löst `append` daher `BufferError` aus (Tabelle vorher freigeben oder eine
+        Kopie per `take(range(len(self)))` exportieren).
+        """
+        import pyarrow as pa
+
+        n = len(self)
+        price_value = pa.Array.from_buffers(pa.float64(), n, [None, pa.py_buffer(self._price_value)])
+        codes = pa.Array.from_buffers(pa.int32(), n, [None, pa.py_buffer(self._location_codes)])
+        offsets = pa.Array.from_buffers(pa.int32(), n + 1, [None, pa.py_buffer(self._image_offsets)])
+        return pa.table({
+            "title": pa.array(self._title, pa.string()),
+            "price": pa.array(self._price, pa.string()),
+            "price_value": price_value,
+            "location": pa.DictionaryArray.from_arrays(codes, pa.array(self._locations, pa.string())),
+            "description": pa.array(self._description, pa.string()),
+            "image_urls": pa.ListArray.from_arrays(offsets, pa.array(self._image_urls, pa.string())),
+            "contact_info": pa.array([list(c.items()) for c in self._contact_info],
+                                     pa.map_(pa.string(), pa.string())),
+            "url": pa.array(self._url, pa.string()),
+        })
+
+    @classmethod
+    def from_arrow(cls, table) -> "AdCollection":
+        """Baut eine Collection aus einer Tabelle im Format von `to_arrow()`."""
+        result = cls()
+        result._title = table.column("title").to_pylist()
+        result._price = table.column("price").to_pylist()
+        result._description = table.column("description").to_pylist()
+        result._url = table.column("url").to_pylist()
+        result._contact_info = [dict(items or []) for items in table.column("contact_info").to_pylist()]
+        result._price_value = array("d", (math.nan if v is None else v
+                                          for v in table.column("price_value").to_pylist()))
+        for location in table.column("location").to_pylist():
+            result._location_codes.append(result._location_code(location or ""))
+        for urls in table.column("image_urls").to_pylist():
+            result._image_urls.extend(urls or [])
+            result._image_offsets.append(len(result._image_urls))
+        return result
+
+    def to_parquet(self, path: str, **kwargs):
+        import pyarrow.parquet as pq
+
+        pq.write_table(self.to_arrow(), path, **kwargs)
+
+    @classmethod
+    def read_parquet(cls, path: str) -> "AdCollection":
+        import pyarrow.parquet as pq
+
+        return cls.from_arrow(pq.read_table(path))
+
+    def to_ipc(self, path: str):
+        """Schreibt die Tabelle als Arrow-IPC-Datei (Feather v2)."""
+        import pyarrow as pa
+
+        table = self.to_arrow()
+        with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+    @classmethod
+    def read_ipc(cls, path: str) -> "AdCollection":
+        import pyarrow as pa
+
+        with pa.memory_map(path, "r") as source:
+            return cls.from_arrow(pa.ipc.open_file(source).read_all())
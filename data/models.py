@@ -1,7 +1,7 @@
-from dataclasses import dataclass, field, asdict
+from dataclasses import dataclass, field, fields, asdict
 from typing import List, Dict
 
-@dataclass
+@dataclass(slots=True)
 class AdInfo:
     title: str = ""
     price: str = ""
@@ -12,7 +12,11 @@ class AdInfo:
     url: str = ""
 
     def to_dict(self):
-        return asdict(self)
+        # Flache Kopie: Listen/Dicts werden kopiert, aber nicht rekursiv wie bei asdict()
+        data = {f.name: getattr(self, f.name) for f in fields(self)}
+        data["image_urls"] = list(self.image_urls)
+        data["contact_info"] = dict(self.contact_info)
+        return data
 
     def as_markdown(self) -> str:
         # Übersichtliche Ausgabe für Streamlit etc.
@@ -32,3 +36,42 @@ class AdInfo:
         if self.url:
             md += f"\n[Zur Anzeige]({self.url})"
         return md
+
+
+@dataclass(slots=True)
+class ContactInfo:
+    """Strukturierte Kontaktdaten einer Anzeige (siehe `logic.contact`)."""
+    vorname: str = ""
+    nachname: str = ""
+    anbieter: str = ""      # "privat" oder "gewerblich"
+    telefon: str = ""
+    strasse: str = ""
+    hausnummer: str = ""
+    plz: str = ""
+    stadt: str = ""
+    land: str = ""
+
+    def to_dict(self) -> Dict[str, str]:
+        # Nur gefüllte Felder; Schlüssel wie bisher in AdInfo.contact_info ("straße")
+        data = {("straße" if k == "strasse" else k): v for k, v in asdict(self).items() if v}
+        return data
+
+
+@dataclass(slots=True)
+class CalendarEvent:
+    """
+    Ein Termin aus einer Kalenderquelle (siehe `logic.calendar_sync`), auf
+    Frei/Belegt reduziert. Zeiten als Unix-Zeitstempel; `deleted` markiert
+    gelöschte bzw. abgesagte Termine in einer inkrementellen Änderungsliste.
+    """
+    uid: str
+    start: float = 0.0
+    end: float = 0.0
+    summary: str = ""
+    transparent: bool = False     # "frei" markiert (blockiert nicht)
+    deleted: bool = False
+    updated: str = ""
+
+    @property
+    def busy(self) -> bool:
+        return not (self.deleted or self.transparent) and self.end > self.start
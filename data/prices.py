@@ -0,0 +1,47 @@
+"""
+Normalisierung von Preistexten der Anzeigen ("1.200 € VB", "Zu verschenken", ...).
+"""
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+
+# Tausenderpunkte und Dezimalkomma ("1.234,50") oder einfache Zahl ("85", "85,5")
+_NUMBER = re.compile(r"(?<![\d.,])(\d{1,3}(?:\.\d{3})+|\d+)(?:,(\d{1,2}))?(?!\d)")
+# Betrag direkt vor dem Währungszeichen hat Vorrang ("Modell 2024, 350 €")
+_EURO_NUMBER = re.compile(_NUMBER.pattern + r"[ \t]*(?:€|EUR\b)")
+_NEGOTIABLE = re.compile(r"\bVB\b|verhandelbar|Verhandlungsbasis", re.IGNORECASE)
+_FREE = re.compile(r"verschenken|kostenlos|gratis|umsonst", re.IGNORECASE)
+
+
+@dataclass(slots=True, frozen=True)
+class PriceInfo:
+    """Normalisierter Preis: `amount` in Euro (None = unbekannt)."""
+    amount: float | None = None
+    negotiable: bool = False   # "VB" / Verhandlungsbasis
+    free: bool = False         # "Zu verschenken" (amount = 0.0)
+    raw: str = ""
+
+    @property
+    def known(self) -> bool:
+        return self.amount is not None
+
+
+@lru_cache(maxsize=4096)
+def normalize_price(text: str) -> PriceInfo:
+    """
+    Wandelt einen Preistext in `PriceInfo` um, z. B.
+    "1.200 € VB" → amount=1200.0, negotiable=True;
+    "Zu verschenken" → amount=0.0, free=True;
+    "VB" (ohne Betrag) → amount=None, negotiable=True.
+    """
+    text = (text or "").strip()
+    negotiable = bool(_NEGOTIABLE.search(text))
+    if _FREE.search(text):
+        return PriceInfo(0.0, negotiable, True, text)
+    match = _EURO_NUMBER.search(text) or _NUMBER.search(text)
+    if not match:
+        return PriceInfo(None, negotiable, False, text)
+    amount = float(match.group(1).replace(".", ""))
+    if match.group(2):
+        amount += float("0." + match.group(2))
+    return PriceInfo(amount, negotiable, amount == 0.0, text)
@@ -0,0 +1,256 @@
+"""
+Verfügbarkeits-Engine: freie Abhol-/Besichtigungstermine aus dem Kalender.
+
+Belegte Zeiten werden aus allen VEVENTs innerhalb eines begrenzten
+Vorausschau-Fensters gebildet. Wiederkehrende Termine (RRULE/RDATE, EXDATE)
+werden dabei lazy expandiert, d. h. nur bis zum Fensterende. Die belegten
+Intervalle werden zusammengeführt und sortiert in einem `IntervalIndex`
+abgelegt; Abfragen laufen per Binärsuche in O(log n) statt linear.
+"""
+import bisect
+import logging
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+from logic import calendar as calendar_logic
+from logic.calendar import _load_tz
+
+DEFAULT_SLOT_MINUTES = 60
+DEFAULT_DAYS_AHEAD = 14
+DEFAULT_DAY_START = 9     # frühester Terminbeginn (Stunde)
+DEFAULT_DAY_END = 20      # spätestes Terminende (Stunde)
+
+
+class IntervalIndex:
+    """
+    Sortierte, disjunkte Belegt-Intervalle (Unix-Zeitstempel).
+
+    Beim Aufbau werden überlappende oder aneinandergrenzende Intervalle
+    verschmolzen; danach sind `starts` und `ends` jeweils aufsteigend sortiert.
+    """
+
+    def __init__(self, intervals=()):
+        merged_starts, merged_ends = [], []
+        for start, end in sorted(intervals):
+            if end <= start:
+                continue
+            if merged_ends and start <= merged_ends[-1]:
+                if end > merged_ends[-1]:
+                    merged_ends[-1] = end
+            else:
+                merged_starts.append(start)
+                merged_ends.append(end)
+        self.starts = merged_starts
+        self.ends = merged_ends
+
+    def __len__(self):
+        return len(self.starts)
+
+    def is_free(self, start: float, end: float) -> bool:
+        """True, wenn [start, end) kein belegtes Intervall schneidet."""
+        i = bisect.bisect_right(self.ends, start)
+        return i >= len(self.starts) or self.starts[i] >= end
+
+    def free_gaps(self, start: float, end: float):
+        """Liefert die freien Lücken `(von, bis)` innerhalb von [start, end)."""
+        i = bisect.bisect_right(self.ends, start)
+        cursor = start
+        while cursor < end:
+            if i >= len(self.starts) or self.starts[i] >= end:
+                yield cursor, end
+                return
+            if self.starts[i] > cursor:
+                yield cursor, self.starts[i]
+            cursor = max(cursor, self.ends[i])
+            i += 1
+
+
+def _as_zoneinfo(dt: datetime, tz) -> datetime:
+    """
+    Bringt Datums-/Zeitwerte aus icalendar in eine einheitliche Form:
+    Datum → 00:00 in `tz`, "floating" → `tz`, pytz-Zonen → zoneinfo
+    (pytz-Offsets wären bei der RRULE-Expansion über die Zeitumstellung falsch).
+    """
+    if not isinstance(dt, datetime):
+        return datetime(dt.year, dt.month, dt.day, tzinfo=tz)
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=tz)
+    zone = getattr(dt.tzinfo, "zone", None)
+    if zone:
+        try:
+            return dt.replace(tzinfo=ZoneInfo(zone))
+        except Exception:
+            pass
+    return dt
+
+
+def _date_values(prop, tz) -> list:
+    """Werte einer (ggf. mehrfach vorkommenden) EXDATE/RDATE-Property."""
+    if prop is None:
+        return []
+    props = prop if isinstance(prop, list) else [prop]
+    return [_as_zoneinfo(d.dt, tz) for p in props for d in getattr(p, "dts", [])]
+
+
+def _occurrences(component, start: datetime, window_start: datetime, window_end: datetime, duration: timedelta):
+    """
+    Startzeitpunkte eines (ggf. wiederkehrenden) Events, die das Fenster berühren.
+    Die RRULE wird nur bis `window_end` ausgewertet; auch einmalige Termine
+    außerhalb des Fensters (z. B. die ganze Vergangenheit im Kalender) entfallen.
+    """
+    rule_prop = component.get("rrule")
+    if rule_prop is None:
+        if window_start - duration <= start < window_end:
+            yield start
+    else:
+        from dateutil.rrule import rrulestr
+
+        rule_str = rule_prop.to_ical().decode()
+        try:
+            rule, naive = rrulestr(rule_str, dtstart=start), False
+        except ValueError:
+            # z. B. UNTIL als Datum bei zeitzonenbehaftetem DTSTART
+            rule, naive = rrulestr(rule_str, dtstart=start.replace(tzinfo=None)), True
+        lower = window_start - duration
+        if naive:
+            lower = lower.astimezone(start.tzinfo).replace(tzinfo=None)
+        for occ in rule.xafter(lower, inc=True):
+            if naive:
+                occ = occ.replace(tzinfo=start.tzinfo)
+            if occ >= window_end:
+                break
+            yield occ
+    for extra in _date_values(component.get("rdate"), start.tzinfo):
+        if window_start - duration <= extra < window_end:
+            yield extra
+
+
+def busy_intervals(cal, window_start: datetime, window_end: datetime, tz):
+    """
+    Erzeugt alle belegten Intervalle `(start_ts, end_ts)` im Fenster.
+    Transparente (TRANSP:TRANSPARENT) und abgesagte Events blockieren nicht.
+    """
+    for component in cal.walk("VEVENT"):
+        if str(component.get("transp", "")).upper() == "TRANSPARENT":
+            continue
+        if str(component.get("status", "")).upper() == "CANCELLED":
+            continue
+        yield from event_intervals(component, window_start, window_end, tz)
+
+
+def event_intervals(component, window_start: datetime, window_end: datetime, tz):
+    """Intervalle `(start_ts, end_ts)` eines einzelnen VEVENTs im Fenster (inkl. Wiederholungen)."""
+    dtstart_prop = component.get("dtstart")
+    if not dtstart_prop:
+        return
+    try:
+        start = _as_zoneinfo(dtstart_prop.dt, tz)
+        dtend_prop = component.get("dtend")
+        duration_prop = component.get("duration")
+        if dtend_prop:
+            duration = _as_zoneinfo(dtend_prop.dt, tz) - start
+        elif duration_prop:
+            duration = getattr(duration_prop, "dt", duration_prop)
+        elif not isinstance(dtstart_prop.dt, datetime):
+            duration = timedelta(days=1)   # ganztägig
+        else:
+            duration = timedelta(0)
+        # Früh aussteigen, bevor EXDATEs/RRULE ausgewertet werden: ohne RDATE beginnt
+        # kein Vorkommen vor DTSTART, ein einmaliger Termin hat nur dieses eine
+        if component.get("rdate") is None:
+            if start >= window_end:
+                return
+            if component.get("rrule") is None and start < window_start - duration:
+                return
+        excluded = {d.timestamp() for d in _date_values(component.get("exdate"), start.tzinfo)}
+        for occ in _occurrences(component, start, window_start, window_end, duration):
+            occ_ts = occ.timestamp()
+            if occ_ts in excluded:
+                continue
+            yield occ_ts, (occ + duration).timestamp()
+    except Exception as e:
+        logging.warning(f"Event {component.get('uid')} übersprungen: {e}")
+
+
+def build_index(cal, timezone_str: str = "UTC", days_ahead: int = DEFAULT_DAYS_AHEAD,
+                now: datetime = None) -> IntervalIndex:
+    """Baut den Belegt-Index für heute 00:00 bis `days_ahead` Tage voraus."""
+    tz = _load_tz(timezone_str)
+    now = now or datetime.now(tz)
+    window_start = datetime.combine(now.date(), time(0), tzinfo=tz)
+    window_end = window_start + timedelta(days=days_ahead + 1)
+    if not cal:
+        return IntervalIndex()
+    return IntervalIndex(busy_intervals(cal, window_start, window_end, tz))
+
+
+def free_slots(index: IntervalIndex, timezone_str: str = "UTC", slot_minutes: int = DEFAULT_SLOT_MINUTES,
+               days_ahead: int = DEFAULT_DAYS_AHEAD, day_start: int = DEFAULT_DAY_START,
+               day_end: int = DEFAULT_DAY_END, max_slots: int = 50, now: datetime = None) -> list:
+    """
+    Freie Termine der Länge `slot_minutes` zwischen `day_start` und `day_end` Uhr,
+    beginnend ab jetzt (auf die nächste Viertelstunde gerundet). Rückgabe als
+    Liste von `(start, end)`-datetimes in der gewünschten Zeitzone.
+    """
+    tz = _load_tz(timezone_str)
+    now = now or datetime.now(tz)
+    slot = slot_minutes * 60
+    earliest = now.timestamp()
+    earliest += -earliest % 900
+    result = []
+    for day_offset in range(days_ahead + 1):
+        day = now.date() + timedelta(days=day_offset)
+        # Tagesgrenzen über datetime bilden, damit die Zeitumstellung stimmt
+        lo = max(datetime.combine(day, time(day_start), tzinfo=tz).timestamp(), earliest)
+        hi = datetime.combine(day, time(day_end) if day_end < 24 else time(0), tzinfo=tz)
+        if day_end >= 24:
+            hi += timedelta(days=1)
+        for gap_start, gap_end in index.free_gaps(lo, hi.timestamp()):
+            cursor = gap_start
+            while cursor + slot <= gap_end:
+                result.append((datetime.fromtimestamp(cursor, tz), datetime.fromtimestamp(cursor + slot, tz)))
+                if len(result) >= max_slots:
+                    return result
+                cursor += slot
+    return result
+
+
+def format_slot(start: datetime, end: datetime) -> str:
+    # Zeitraumformat wie bei den Kalenderterminen (z.B. "15.05.2025 10:00 - 11:00")
+    return f"{start.strftime('%d.%m.%Y %H:%M')} - {end.strftime('%H:%M')}"
+
+
+def get_free_slots(cal, timezone_str: str = "UTC", slot_minutes: int = DEFAULT_SLOT_MINUTES,
+                   days_ahead: int = DEFAULT_DAYS_AHEAD, **kwargs) -> list:
+    """
+    Freie Abhol-/Besichtigungstermine als formatierte Strings.
+    Ohne Kalender ist jeder Slot im Fenster frei.
+    """
+    index = build_index(cal, timezone_str, days_ahead)
+    slots = free_slots(index, timezone_str, slot_minutes, days_ahead, **kwargs)
+    return [format_slot(start, end) for start, end in slots]
+
+
+def get_free_slots_cached(ics_path: str = None, timezone_str: str = "UTC",
+                          slot_minutes: int = DEFAULT_SLOT_MINUTES,
+                          days_ahead: int = DEFAULT_DAYS_AHEAD, **kwargs) -> list:
+    """
+    Wie `get_free_slots`, aber der Belegt-Index wird zusammen mit dem Kalender
+    gecacht (siehe `logic.calendar.load_calendar_cached`) und nur neu gebaut,
+    wenn sich die ICS-Datei oder der aktuelle Tag ändert. Indizes vergangener
+    Tage werden dabei verworfen, der Cache wächst auf einem lange laufenden
+    Server also nicht mit jedem Tag.
+    """
+    entry = calendar_logic._cached_entry(ics_path or calendar_logic.DEFAULT_ICS_PATH)
+    tz = _load_tz(timezone_str)
+    today = datetime.now(tz).date()
+    key = ("busy_index", timezone_str, days_ahead, today)
+    derived = entry["derived"]
+    index = derived.get(key)
+    if index is None:
+        index = build_index(entry["calendar"], timezone_str, days_ahead)
+        for old in [k for k in list(derived) if k[0] == "busy_index" and k[3] < today]:
+            derived.pop(old, None)
+        derived[key] = index
+    slots = free_slots(index, timezone_str, slot_minutes, days_ahead, **kwargs)
+    return [format_slot(start, end) for start, end in slots]
@@ -1,8 +1,12 @@
 import os
 import logging
+import threading
 from datetime import datetime, date, timezone
 from zoneinfo import ZoneInfo
-from icalendar import Calendar
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from icalendar import Calendar  # wird erst beim Parsen importiert
 
 # Datenverzeichnis ermitteln (Ordner "data" neben dem Ordner "logic")
 DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
@@ -35,6 +39,8 @@ def load_calendar_with_status(ics_path: str = None):
     if not data or data.strip() == b"":
         # Datei ist leer
         return None, "empty_file"
+    from icalendar import Calendar
+
     try:
         cal = Calendar.from_ical(data)
         return cal, "ok"
@@ -42,21 +48,33 @@ def load_calendar_with_status(ics_path: str = None):
         logging.error(f"Fehler beim Parsen des Kalenders: {e}")
         return None, "parse_error"
 
-def get_available_appointments(cal: Calendar, timezone_str: str = "UTC"):
+def get_available_appointments(cal: "Calendar", timezone_str: str = "UTC"):
     """
     Extrahiert zukünftige Termine (VEVENTs) aus dem Calendar-Objekt und gibt eine
     Liste von formatierten Strings zurück (sortiert nach Startzeit).
     """
     if not cal:
         return []
+    return _filter_future(_collect_appointments(cal, _load_tz(timezone_str)), timezone_str)
+
+def _load_tz(timezone_str: str):
     # Gewünschte Zeitzone laden (Fallback UTC)
     try:
-        tz = ZoneInfo(timezone_str)
+        return ZoneInfo(timezone_str)
     except Exception:
-        tz = timezone.utc
+        return timezone.utc
 
+def _filter_future(appointments: list, timezone_str: str) -> list:
+    # Nur zukünftige Termine berücksichtigen
+    now = datetime.now(_load_tz(timezone_str))
+    return [slot_str for _, end_dt, slot_str in appointments if end_dt >= now]
+
+def _collect_appointments(cal: "Calendar", tz) -> list:
+    """
+    Liefert alle Termine als `(start_dt, end_dt, slot_str)`, sortiert nach Startzeit.
+    Unabhängig von der aktuellen Uhrzeit und daher cachebar.
+    """
     slots = []
-    now = datetime.now(tz)
     # Alle Events im Kalender prüfen
     for component in cal.walk():
         if component.name == "VEVENT":
@@ -96,10 +114,6 @@ def get_available_appointments(cal: Calendar, timezone_str: str = "UTC"):
                 end_date = dtend.date() if isinstance(dtend, datetime) else dtend
             end_dt = datetime(end_date.year, end_date.month, end_date.day, 23, 59, tzinfo=tz)
 
-            # Nur zukünftige Termine berücksichtigen 
-            if end_dt < now:
-                continue
-
             # Zeitraumformat erstellen (z.B. "15.05.2025 10:00 - 11:00")
             try:
                 start_str = start_dt.strftime("%d.%m.%Y %H:%M")
@@ -113,8 +127,61 @@ def get_available_appointments(cal: Calendar, timezone_str: str = "UTC"):
             except Exception:
                 end_str = str(end_dt)
             slot_str = f"{start_str} - {end_str}"
-            slots.append(slot_str)
+            slots.append((start_dt, end_dt, slot_str))
 
-    # Nach Datum sortieren
-    slots.sort()
+    # Nach Datum sortieren (chronologisch, nicht nach dem formatierten String)
+    slots.sort(key=lambda slot: slot[0])
     return slots
+
+
+# ----- Cache über Streamlit-Reruns und Sessions hinweg -----
+# Pfad -> {"signature": (mtime_ns, size), "calendar": ..., "status": ..., "derived": {schlüssel: ...}}
+# "derived" enthält aus dem Kalender abgeleitete Daten (Terminlisten, Belegt-Index).
+_calendar_cache = {}
+_cache_lock = threading.Lock()
+
+def _file_signature(path: str):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def _cached_entry(path: str) -> dict:
+    signature = _file_signature(path)
+    with _cache_lock:
+        entry = _calendar_cache.get(path)
+        if entry is not None and entry["signature"] == signature:
+            return entry
+    # Datei neu oder verändert (mtime/Größe) – einmal neu parsen
+    cal, status = load_calendar_with_status(path)
+    entry = {"signature": signature, "calendar": cal, "status": status, "derived": {}}
+    with _cache_lock:
+        _calendar_cache[path] = entry
+    return entry
+
+def load_calendar_cached(ics_path: str = None):
+    """
+    Wie `load_calendar_with_status`, aber das geparste Calendar-Objekt wird pro
+    Dateipfad zwischengespeichert und nur neu geladen, wenn sich mtime oder
+    Größe der Datei ändern. Der Cache gilt prozessweit, also für alle
+    Streamlit-Sessions; das zurückgegebene Objekt darf nicht verändert werden.
+    """
+    entry = _cached_entry(ics_path or DEFAULT_ICS_PATH)
+    return entry["calendar"], entry["status"]
+
+def get_available_appointments_cached(ics_path: str = None, timezone_str: str = "UTC"):
+    """
+    Wie `get_available_appointments`, aber die aus dem Kalender abgeleitete
+    Terminliste wird zusammen mit dem Kalender gecacht. Pro Aufruf wird nur
+    noch nach der aktuellen Uhrzeit gefiltert.
+    """
+    entry = _cached_entry(ics_path or DEFAULT_ICS_PATH)
+    if not entry["calendar"]:
+        return []
+    key = ("appointments", timezone_str)
+    appointments = entry["derived"].get(key)
+    if appointments is None:
+        appointments = _collect_appointments(entry["calendar"], _load_tz(timezone_str))
+        entry["derived"][key] = appointments
+    return _filter_future(appointments, timezone_str)
@@ -0,0 +1,511 @@
+"""
+Kalenderquellen mit inkrementellem Abgleich und lokalem Frei/Belegt-Cache.
+
+Eine `CalendarSource` liefert Termine als Änderungsliste ab einem Sync-Token:
+Der erste Abgleich überträgt alle Termine, jeder weitere nur die seitdem
+geänderten oder gelöschten. Ist das Token abgelaufen (Google: HTTP 410), wird
+einmal vollständig neu abgeglichen. Die Termine liegen als Belegt-Intervalle
+in SQLite (`data/cache/calendar.sqlite3`); daraus baut `CalendarSync` den
+`IntervalIndex` für `logic.availability`.
+
+Quellen (Auswahl über `config.CALENDAR_SOURCE` bzw. ENV `CALENDAR_SOURCE`):
+- "ics" (Standard): die von Hand exportierte `data/Kalender.ics`; Änderungen
+  werden an mtime/Größe erkannt, dann wird die Datei komplett neu eingelesen
+- "google": Google Calendar API mit `syncToken` (OAuth über google-auth-oauthlib,
+  Client-Datei aus ENV `GOOGLE_CREDENTIALS`, Standard `credentials.json`); die
+  Anmeldung im Browser läuft einmalig über `python calendar_setup.py authorize`,
+  nie im Streamlit-Rerun
+- "local": dateibasierter Ersatz für die Google-API (JSON mit Änderungszähler),
+  um Abgleich und Übertragungsmenge offline zu testen
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, time as dtime, timedelta, timezone
+
+import config
+from data.models import CalendarEvent
+from logic import availability, metrics
+from logic import calendar as calendar_logic
+from logic.calendar import _load_tz
+from logic.http_cache import CACHE_DIR
+
+DEFAULT_CACHE_PATH = os.path.join(CACHE_DIR, "calendar.sqlite3")
+DEFAULT_LOCAL_PATH = os.path.join(CACHE_DIR, "calendar_local.json")
+DEFAULT_TOKEN_PATH = os.path.join(CACHE_DIR, "google_token.json")
+DEFAULT_MIN_INTERVAL = 60         # Sekunden zwischen zwei Abgleichen (Streamlit-Reruns)
+MAX_BACKOFF = 15 * 60             # längste Pause nach wiederholten Fehlern
+ICS_EXPAND_DAYS = 180             # Wiederholungen aus der ICS-Datei so weit voraus auflösen
+GOOGLE_SCOPES = ["https://www.googleapis.com/auth/calendar.readonly"]
+
+
+class SyncTokenExpired(Exception):
+    """Das Sync-Token wird von der Quelle nicht mehr akzeptiert – vollständiger Abgleich nötig."""
+
+
+class AuthorizationRequired(Exception):
+    """Kein gültiges OAuth-Token – einmalig `python calendar_setup.py authorize` ausführen."""
+
+
+@dataclass(slots=True)
+class SyncPage:
+    """Antwort einer Quelle: Änderungen (oder bei `full` alle Termine) und das nächste Token."""
+    events: list
+    sync_token: str | None
+    full: bool = False
+
+
+@dataclass(slots=True)
+class SyncResult:
+    source: str
+    full: bool = False
+    skipped: bool = False         # innerhalb von `min_interval` – Cache unverändert genutzt
+    transferred: int = 0          # von der Quelle gelieferte Termine
+    busy: int = 0                 # danach im Cache gespeicherte Belegt-Termine
+    duration_s: float = 0.0
+    error: str | None = None
+
+
+class CalendarSource:
+    """Schnittstelle einer Kalenderquelle; `name` identifiziert sie im Cache."""
+    name = "source"
+
+    def changes(self, sync_token: str | None) -> SyncPage:
+        """Alle Termine (`sync_token` None) bzw. die Änderungen seit `sync_token`."""
+        raise NotImplementedError
+
+
+def _window(days_back: int, days_ahead: int, tz) -> tuple:
+    today = datetime.now(tz).date()
+    start = datetime.combine(today - timedelta(days=days_back), dtime(0), tzinfo=tz)
+    return start, datetime.combine(today + timedelta(days=days_ahead + 1), dtime(0), tzinfo=tz)
+
+
+class IcsFileSource(CalendarSource):
+    """
+    Die bisherige ICS-Datei als Quelle. Das Token besteht aus mtime, Größe und
+    Datum: Solange die Datei unverändert ist, liefert ein Abgleich nichts; sonst
+    (und einmal täglich, weil das Auflösefenster der Wiederholungen weiterrückt)
+    werden alle Termine neu übertragen.
+    """
+
+    def __init__(self, path: str = None, timezone_str: str = None, days_ahead: int = ICS_EXPAND_DAYS):
+        self.path = path or calendar_logic.DEFAULT_ICS_PATH
+        self.timezone_str = timezone_str or config.TIMEZONE
+        self.days_ahead = days_ahead
+        self.name = f"ics:{os.path.abspath(self.path)}"
+
+    def changes(self, sync_token: str | None) -> SyncPage:
+        signature = calendar_logic._file_signature(self.path)
+        tz = _load_tz(self.timezone_str)
+        token = f"{signature[0]}:{signature[1]}:{datetime.now(tz).date()}" if signature else None
+        if token and token == sync_token:
+            return SyncPage([], token)
+        cal, status = calendar_logic.load_calendar_with_status(self.path)
+        if cal is None:
+            return SyncPage([], None, full=True)
+        window_start, window_end = _window(1, self.days_ahead, tz)
+        events = []
+        for component in cal.walk("VEVENT"):
+            if str(component.get("status", "")).upper() == "CANCELLED":
+                continue
+            transparent = str(component.get("transp", "")).upper() == "TRANSPARENT"
+            uid = str(component.get("uid", "")) or f"event-{len(events)}"
+            summary = str(component.get("summary", ""))
+            for start, end in availability.event_intervals(component, window_start, window_end, tz):
+                events.append(CalendarEvent(f"{uid}/{int(start)}", start, end, summary, transparent))
+        return SyncPage(events, token, full=True)
+
+
+def _parse_google_time(value: dict, tz) -> float:
+    if "dateTime" in value:
+        return datetime.fromisoformat(value["dateTime"].replace("Z", "+00:00")).timestamp()
+    day = date.fromisoformat(value["date"])
+    return datetime.combine(day, dtime(0), tzinfo=tz).timestamp()
+
+
+class GoogleCalendarSource(CalendarSource):
+    """
+    Google Calendar API (`events.list` mit `syncToken`, `singleEvents=True`,
+    `showDeleted=True`). Der erste Abgleich beginnt `days_back` Tage in der
+    Vergangenheit; weitere Abgleiche übertragen nur Änderungen. HTTP 410 wird
+    zu `SyncTokenExpired`.
+    """
+
+    def __init__(self, calendar_id: str = "primary", credentials_path: str = None,
+                 token_path: str = DEFAULT_TOKEN_PATH, days_back: int = 1, timezone_str: str = None):
+        self.calendar_id = calendar_id
+        self.credentials_path = credentials_path or os.getenv("GOOGLE_CREDENTIALS", "credentials.json")
+        self.token_path = token_path
+        self.days_back = days_back
+        self.timezone_str = timezone_str or config.TIMEZONE
+        self.name = f"google:{calendar_id}"
+        self._service = None
+
+    def authorize(self):
+        """
+        Interaktive Anmeldung im Browser (lokaler Redirect-Server); speichert das
+        Token unter `token_path`. Nur aus der Kommandozeile aufrufen – blockiert,
+        bis die Anmeldung abgeschlossen ist.
+        """
+        from google_auth_oauthlib.flow import InstalledAppFlow
+
+        flow = InstalledAppFlow.from_client_secrets_file(self.credentials_path, GOOGLE_SCOPES)
+        self._save_token(flow.run_local_server(port=0))
+        self._service = None
+
+    def _save_token(self, creds):
+        os.makedirs(os.path.dirname(self.token_path), exist_ok=True)
+        with open(self.token_path, "w", encoding="utf-8") as f:
+            f.write(creds.to_json())
+
+    def _get_service(self):
+        if self._service is None:
+            from google.auth.transport.requests import Request
+            from google.oauth2.credentials import Credentials
+            from googleapiclient.discovery import build
+
+            creds = None
+            if os.path.exists(self.token_path):
+                creds = Credentials.from_authorized_user_file(self.token_path, GOOGLE_SCOPES)
+            if creds and creds.expired and creds.refresh_token:
+                creds.refresh(Request())
+                self._save_token(creds)
+            elif not creds or not creds.valid:
+                raise AuthorizationRequired(
+                    f"Kein gültiges Google-Token in {self.token_path} – "
+                    f"einmalig `python calendar_setup.py authorize` ausführen")
+            self._service = build("calendar", "v3", credentials=creds, cache_discovery=False)
+        return self._service
+
+    def changes(self, sync_token: str | None) -> SyncPage:
+        from googleapiclient.errors import HttpError
+
+        tz = _load_tz(self.timezone_str)
+        params = {"calendarId": self.calendar_id, "singleEvents": True, "showDeleted": True, "maxResults": 2500}
+        if sync_token:
+            params["syncToken"] = sync_token
+        else:
+            start = datetime.now(timezone.utc) - timedelta(days=self.days_back)
+            params["timeMin"] = start.isoformat()
+        events, page_token = [], None
+        while True:
+            try:
+                response = self._get_service().events().list(pageToken=page_token, **params).execute()
+            except HttpError as e:
+                if getattr(e, "status_code", None) == 410 or getattr(e.resp, "status", None) == 410:
+                    raise SyncTokenExpired(str(e))
+                raise
+            for item in response.get("items", []):
+                if item.get("status") == "cancelled" or "start" not in item:
+                    events.append(CalendarEvent(item["id"], deleted=True, updated=item.get("updated", "")))
+                    continue
+                events.append(CalendarEvent(
+                    item["id"], _parse_google_time(item["start"], tz), _parse_google_time(item["end"], tz),
+                    item.get("summary", ""), item.get("transparency") == "transparent",
+                    updated=item.get("updated", ""),
+                ))
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                return SyncPage(events, response.get("nextSyncToken"), full=not sync_token)
+
+
+class LocalCalendarSource(CalendarSource):
+    """
+    Dateibasierter Ersatz für die Google-API. Jede Änderung (`put`, `delete`)
+    erhält eine fortlaufende Nummer; das Sync-Token ist die höchste bekannte
+    Nummer. `purge()` entfernt gelöschte Einträge und macht ältere Tokens
+    ungültig – wie Google, das gelöschte Termine nur begrenzt vorhält.
+    `requests` und `transferred` zählen Abrufe und übertragene Termine.
+    """
+
+    def __init__(self, path: str = DEFAULT_LOCAL_PATH):
+        self.path = path
+        self.name = f"local:{os.path.abspath(path)}"
+        self.requests = 0
+        self.transferred = 0
+        self._lock = threading.Lock()
+
+    def _read(self) -> dict:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"seq": 0, "floor": 0, "events": {}}
+
+    def _write(self, data: dict):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, self.path)
+
+    def put(self, *events: CalendarEvent):
+        """Legt Termine an oder ändert sie (gleiche `uid`)."""
+        with self._lock:
+            data = self._read()
+            for event in events:
+                data["seq"] += 1
+                data["events"][event.uid] = {"start": event.start, "end": event.end, "summary": event.summary,
+                                             "transparent": event.transparent, "deleted": False,
+                                             "seq": data["seq"], "updated": time.strftime("%Y-%m-%dT%H:%M:%SZ")}
+            self._write(data)
+
+    def delete(self, *uids: str):
+        with self._lock:
+            data = self._read()
+            for uid in uids:
+                if uid in data["events"]:
+                    data["seq"] += 1
+                    data["events"][uid].update(deleted=True, seq=data["seq"])
+            self._write(data)
+
+    def purge(self):
+        """Gelöschte Einträge endgültig entfernen; bisherige Tokens laufen ab."""
+        with self._lock:
+            data = self._read()
+            data["events"] = {uid: e for uid, e in data["events"].items() if not e["deleted"]}
+            data["seq"] += 1
+            data["floor"] = data["seq"]
+            self._write(data)
+
+    def changes(self, sync_token: str | None) -> SyncPage:
+        with self._lock:
+            data = self._read()
+        since = int(sync_token) if sync_token else None
+        if since is not None and since < data["floor"]:
+            raise SyncTokenExpired(f"Token {since} älter als {data['floor']}")
+        events = [CalendarEvent(uid, e["start"], e["end"], e["summary"], e["transparent"], e["deleted"],
+                                e.get("updated", ""))
+                  for uid, e in data["events"].items()
+                  if (since is None and not e["deleted"]) or (since is not None and e["seq"] > since)]
+        self.requests += 1
+        self.transferred += len(events)
+        return SyncPage(events, str(data["seq"]), full=since is None)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS busy (
+    source TEXT,
+    uid TEXT,
+    start REAL,
+    "end" REAL,
+    summary TEXT,
+    PRIMARY KEY (source, uid)
+);
+CREATE INDEX IF NOT EXISTS busy_time ON busy(source, start);
+CREATE TABLE IF NOT EXISTS sync_state (
+    source TEXT PRIMARY KEY,
+    sync_token TEXT,
+    last_sync REAL,
+    full_syncs INTEGER DEFAULT 0,
+    incremental_syncs INTEGER DEFAULT 0,
+    transferred INTEGER DEFAULT 0
+);
+"""
+
+
+class FreeBusyCache:
+    """
+    Belegt-Intervalle pro Quelle plus Sync-Token und Zähler. Freie
+    (transparente) und gelöschte Termine werden nicht gespeichert bzw. entfernt.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def apply(self, source: str, page: SyncPage) -> int:
+        """Übernimmt eine Änderungsliste in einer Transaktion; Rückgabe: Anzahl Belegt-Termine."""
+        upserts = [(source, e.uid, e.start, e.end, e.summary) for e in page.events if e.busy]
+        removals = [(source, e.uid) for e in page.events if not e.busy]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                if page.full:
+                    self._conn.execute("DELETE FROM busy WHERE source = ?", (source,))
+                else:
+                    self._conn.executemany("DELETE FROM busy WHERE source = ? AND uid = ?", removals)
+                self._conn.executemany("INSERT OR REPLACE INTO busy VALUES (?, ?, ?, ?, ?)", upserts)
+                self._conn.execute(
+                    "INSERT INTO sync_state (source, sync_token, last_sync, full_syncs, incremental_syncs, "
+                    "transferred) VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(source) DO UPDATE SET "
+                    "sync_token = excluded.sync_token, last_sync = excluded.last_sync, "
+                    "full_syncs = full_syncs + excluded.full_syncs, "
+                    "incremental_syncs = incremental_syncs + excluded.incremental_syncs, "
+                    "transferred = transferred + excluded.transferred",
+                    (source, page.sync_token, time.time(), int(page.full), int(not page.full), len(page.events)),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            return self._conn.execute("SELECT COUNT(*) FROM busy WHERE source = ?", (source,)).fetchone()[0]
+
+    def busy(self, source: str, start: float, end: float) -> list:
+        """Belegt-Intervalle `(start, end)`, die [start, end) schneiden."""
+        with self._lock:
+            return self._conn.execute(
+                'SELECT start, "end" FROM busy WHERE source = ? AND start < ? AND "end" > ?',
+                (source, end, start),
+            ).fetchall()
+
+    def state(self, source: str) -> dict:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sync_token, last_sync, full_syncs, incremental_syncs, transferred "
+                "FROM sync_state WHERE source = ?", (source,),
+            ).fetchone()
+            count = self._conn.execute("SELECT COUNT(*) FROM busy WHERE source = ?", (source,)).fetchone()[0]
+        keys = ("sync_token", "last_sync", "full_syncs", "incremental_syncs", "transferred")
+        state = dict(zip(keys, row)) if row else dict.fromkeys(keys)
+        state["busy"] = count
+        return state
+
+    def clear(self, source: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM busy WHERE source = ?", (source,))
+            self._conn.execute("DELETE FROM sync_state WHERE source = ?", (source,))
+
+    def close(self):
+        self._conn.close()
+
+
+class CalendarSync:
+    """
+    Gleicht eine Quelle mit dem Cache ab und liefert freie Termine daraus.
+    `refresh()` fragt die Quelle höchstens alle `min_interval` Sekunden – gezählt
+    ab dem letzten Versuch, auch einem fehlgeschlagenen. Nach Fehlern verdoppelt
+    sich die Pause bis `MAX_BACKOFF`. Der Belegt-Index wird nur nach Änderungen
+    (oder an einem neuen Tag) neu gebaut.
+    """
+
+    def __init__(self, source: CalendarSource, cache: FreeBusyCache = None,
+                 min_interval: float = DEFAULT_MIN_INTERVAL):
+        self.source = source
+        self.cache = cache or get_default_cache()
+        self.min_interval = min_interval
+        self.last_result = None
+        self.failures = 0             # Fehlschläge in Folge (für den Backoff)
+        self._last_attempt = None
+        self._generation = 0
+        self._index = {}
+        self._lock = threading.Lock()
+
+    def refresh(self, force: bool = False) -> SyncResult:
+        with self._lock:
+            name = self.source.name
+            state = self.cache.state(name)
+            last_attempt = self._last_attempt or state["last_sync"]
+            if not force and last_attempt and time.time() - last_attempt < self.retry_interval():
+                error = self.last_result.error if self.last_result else None
+                return SyncResult(name, skipped=True, busy=state["busy"], error=error)
+            self._last_attempt = time.time()
+            start = time.perf_counter()
+            try:
+                try:
+                    page = self.source.changes(state["sync_token"])
+                except SyncTokenExpired as e:
+                    logging.info(f"Sync-Token für {name} abgelaufen ({e}), vollständiger Abgleich")
+                    page = self.source.changes(None)
+                busy = self.cache.apply(name, page)
+            except Exception as e:
+                self.failures += 1
+                logging.warning(f"Kalenderabgleich {name} fehlgeschlagen ({self.failures}× in Folge, "
+                                f"nächster Versuch in {self.retry_interval():.0f} s): {e}")
+                result = SyncResult(name, error=str(e), busy=state["busy"],
+                                    duration_s=time.perf_counter() - start)
+            else:
+                self.failures = 0
+                result = SyncResult(name, page.full, False, len(page.events), busy, time.perf_counter() - start)
+                if page.events or page.full:
+                    self._generation += 1
+                    self._index.clear()
+                metrics.observe("calendar_sync", result.duration_s, kind="full" if page.full else "incremental")
+            self.last_result = result
+            return result
+
+    def retry_interval(self) -> float:
+        """Mindestabstand bis zum nächsten Versuch: `min_interval`, nach Fehlern verdoppelt."""
+        if not self.failures:
+            return self.min_interval
+        return min(max(self.min_interval, 1) * 2 ** self.failures, max(MAX_BACKOFF, self.min_interval))
+
+    def busy_index(self, timezone_str: str = None, days_ahead: int = availability.DEFAULT_DAYS_AHEAD,
+                   now: datetime = None) -> availability.IntervalIndex:
+        """Belegt-Index (heute 00:00 bis `days_ahead` Tage voraus) aus dem Cache."""
+        timezone_str = timezone_str or config.TIMEZONE
+        tz = _load_tz(timezone_str)
+        now = now or datetime.now(tz)
+        key = (timezone_str, days_ahead, now.date(), self._generation)
+        index = self._index.get(key)
+        if index is None:
+            window_start = datetime.combine(now.date(), dtime(0), tzinfo=tz)
+            window_end = window_start + timedelta(days=days_ahead + 1)
+            index = availability.IntervalIndex(
+                self.cache.busy(self.source.name, window_start.timestamp(), window_end.timestamp()))
+            # Indizes vergangener Tage verwerfen (lange laufender Server)
+            for old in [k for k in list(self._index) if k[2] < now.date()]:
+                self._index.pop(old, None)
+            self._index[key] = index
+        return index
+
+    def free_slots(self, timezone_str: str = None, slot_minutes: int = availability.DEFAULT_SLOT_MINUTES,
+                   days_ahead: int = availability.DEFAULT_DAYS_AHEAD, refresh: bool = True, **kwargs) -> list:
+        """Wie `availability.get_free_slots`, aber aus dem abgeglichenen Cache."""
+        if refresh:
+            self.refresh()
+        timezone_str = timezone_str or config.TIMEZONE
+        index = self.busy_index(timezone_str, days_ahead)
+        slots = availability.free_slots(index, timezone_str, slot_minutes, days_ahead, **kwargs)
+        return [availability.format_slot(start, end) for start, end in slots]
+
+    def status(self) -> dict:
+        return {"source": self.source.name, "failures": self.failures, "last_attempt": self._last_attempt,
+                **self.cache.state(self.source.name)}
+
+
+_default_cache = None
+_default_sync = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache() -> FreeBusyCache:
+    global _default_cache
+    if _default_cache is None:
+        with _default_lock:
+            if _default_cache is None:
+                _default_cache = FreeBusyCache()
+    return _default_cache
+
+
+def make_source(kind: str = None) -> CalendarSource:
+    """Quelle nach Name ("ics", "google", "local"; Standard `config.CALENDAR_SOURCE`)."""
+    kind = (kind or config.CALENDAR_SOURCE).lower()
+    if kind == "google":
+        return GoogleCalendarSource(os.getenv("GOOGLE_CALENDAR_ID", "primary"))
+    if kind == "local":
+        return LocalCalendarSource(os.getenv("CALENDAR_LOCAL_PATH", DEFAULT_LOCAL_PATH))
+    if kind == "ics":
+        return IcsFileSource()
+    raise ValueError(f"Unbekannte Kalenderquelle: {kind}")
+
+
+def get_default_sync() -> CalendarSync:
+    """Prozessweiter Abgleich für die konfigurierte Quelle."""
+    global _default_sync
+    if _default_sync is None:
+        cache = get_default_cache()
+        with _default_lock:
+            if _default_sync is None:
+                _default_sync = CalendarSync(make_source(), cache)
+    return _default_sync
@@ -0,0 +1,118 @@
+"""
+Kontaktdaten-Erkennung (Verkäufer, Telefon, Adresse) für Anzeigen-Detailseiten.
+
+Durchsucht wird nur der Text der relevanten Seitenbereiche (Kontaktbox, Ort,
+Details, Beschreibung), nicht die ganze Seite mit Navigation, Footer und
+Werbung. Alle Muster sind vorkompiliert und so gebaut, dass sie nicht
+katastrophal backtracken:
+- Wiederholungen sind begrenzt und ihre Zeichenklassen überlappen nicht,
+- Adressen werden über die PLZ verankert; die Straße wird nur in einem
+  kurzen Fenster davor gesucht. Die Laufzeit bleibt damit linear in der
+  Textlänge.
+"""
+import re
+
+from data.models import ContactInfo
+
+# Deutsche Rufnummer: +49/0049 oder führende 0, danach Ziffern mit einzelnen Trennzeichen
+PHONE_RE = re.compile(r"(?<![\d+])(?:(?:\+|00)\d{1,3}[ ./-]?|0)\(?\d{2,5}\)?(?:[ ./-]?\d){4,12}(?!\d)")
+PLZ_CITY_RE = re.compile(
+    r"(?<!\d)(\d{5})(?!\d)[ \t]+([A-ZÄÖÜ][\w-]*(?:[ \t](?:am|an|im|bei|ob|[A-ZÄÖÜ][\w-]*)){0,3})"
+)
+# Straße + Hausnummer am Ende des Fensters vor der PLZ
+STREET_RE = re.compile(
+    r"((?:[A-ZÄÖÜ][\w.-]*[ \t]+){0,2}[\w.-]*"
+    r"(?i:straße|strasse|str\.|weg|allee|platz|gasse|ring|damm|ufer|chaussee|steig|pfad|markt)"
+    r"|[A-ZÄÖÜ][\w.-]*)"
+    r"[ \t]+(\d{1,4}[a-zA-Z]?)[ \t]*,?[ \t]*$"
+)
+STREET_WINDOW = 80          # Zeichen vor der PLZ, in denen die Straße stehen darf
+MIN_PHONE_DIGITS = 8
+MAX_PHONE_DIGITS = 15
+
+# Texte der Kontaktbox, die keine Namen sind
+_SELLER_LABELS = ("verkäufer", "anbieter", "aktiv seit", "nachricht", "anzeigen", "zufriedenheit",
+                  "freundlich", "zuverlässig", "antwortet", "folgen", "telefon")
+
+
+def find_phone(text: str) -> str:
+    """Erste plausible Telefonnummer (8–15 Ziffern) oder ''."""
+    for match in PHONE_RE.finditer(text):
+        digits = sum(ch.isdigit() for ch in match.group())
+        if MIN_PHONE_DIGITS <= digits <= MAX_PHONE_DIGITS:
+            return match.group().strip()
+    return ""
+
+
+def find_address(text: str) -> dict:
+    """
+    Sucht PLZ + Stadt und – falls direkt davor angegeben – Straße und Hausnummer.
+    Eine vollständige Adresse hat Vorrang vor einer reinen PLZ/Stadt-Angabe.
+    """
+    first = None
+    for match in PLZ_CITY_RE.finditer(text):
+        found = {"plz": match.group(1), "stadt": match.group(2).strip()}
+        window = text[max(0, match.start() - STREET_WINDOW):match.start()]
+        street = STREET_RE.search(window)
+        if street:
+            found["strasse"] = street.group(1).strip()
+            found["hausnummer"] = street.group(2)
+            return found
+        if first is None:
+            first = found
+    return first or {}
+
+
+def find_seller(contact_texts: list) -> tuple:
+    """
+    Ermittelt `(name, anbieter)` aus den Textstücken der Kontaktbox:
+    Name = erstes Textstück ohne Label/Ziffern, Anbieter = privat/gewerblich.
+    """
+    name, seller_type = "", ""
+    for text in contact_texts:
+        lowered = text.lower()
+        if not seller_type:
+            if "privat" in lowered:
+                seller_type = "privat"
+            elif "gewerblich" in lowered:
+                seller_type = "gewerblich"
+        if not name and len(text.split()) <= 4 and not any(ch.isdigit() for ch in text) \
+                and not any(label in lowered for label in _SELLER_LABELS):
+            name = text
+    return name, seller_type
+
+
+def extract_contact(sections: dict, seller_text: str = "") -> ContactInfo:
+    """
+    Baut `ContactInfo` aus den Bereichstexten des Extractors
+    (`contact`, `location`, `details`, `description`; siehe `logic.extractor`).
+    `seller_text` (Verkäufer-Element der Heuristik) ersetzt die Kontaktbox,
+    falls die Seite keine hat.
+    """
+    info = ContactInfo()
+    contact_texts = sections.get("contact") or ([seller_text] if seller_text else [])
+    name, info.anbieter = find_seller(contact_texts)
+    if name:
+        parts = name.split(" ", 1)
+        info.vorname = parts[0]
+        if len(parts) > 1:
+            info.nachname = parts[1]
+
+    # Reihenfolge = Priorität: Kontaktbox vor Ort vor Details vor Beschreibung
+    texts = ["\n".join(sections.get(key, [])) for key in ("contact", "location", "details", "description")]
+    address = {}
+    for text in texts:
+        if not info.telefon:
+            info.telefon = find_phone(text)
+        if "strasse" not in address:
+            found = find_address(text)
+            if found and (not address or "strasse" in found):
+                address = found
+        if not info.land and "deutschland" in text.lower():
+            info.land = "Deutschland"
+    if address:
+        info.strasse = address.get("strasse", "")
+        info.hausnummer = address.get("hausnummer", "")
+        info.plz = address["plz"]
+        info.stadt = address["stadt"]
+    return info
@@ -0,0 +1,400 @@
+"""
+Single-Pass-Extraktion von Anzeigen-Detailseiten und Suchergebnisseiten.
+
+Statt einen BeautifulSoup-Baum aufzubauen und ihn für Preis, Beschreibung und
+Verkäufer jeweils erneut zu durchsuchen, verarbeitet `_ListingCollector` einen
+Strom von Start-/End-/Text-Ereignissen genau einmal. Der Text eines Elements
+wird nur bei Bedarf als Ausschnitt einer gemeinsamen Textliste gebildet, damit
+verschachtelte Elemente nicht wiederholt `get_text()` auslösen.
+`_SearchCollector` arbeitet genauso für alle Ergebniskarten einer Suchseite.
+
+Backends (austauschbar, Auswahl über `backend=` oder ENV `PARSER_BACKEND`):
+- "html.parser": Standardbibliothek, immer verfügbar
+- "lxml": libxml2 über das Target-Interface von `lxml.etree.HTMLParser`
+- "selectolax": Lexbor-Parser, der Baum wird einmal iterativ abgelaufen
+- "auto": lxml, falls installiert, sonst html.parser
+"""
+import os
+from html.parser import HTMLParser
+
+DEFAULT_BACKEND = os.getenv("PARSER_BACKEND", "auto")
+
+# Elemente ohne End-Tag
+_VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+# Inhalte, die nie sichtbarer Text sind
+_SKIP_TAGS = {"script", "style", "noscript", "template"}
+# Bekannte IDs der Kleinanzeigen-Detailseite (werden den Heuristiken vorgezogen)
+_ID_FIELDS = {
+    "viewad-title": "title",
+    "viewad-price": "price",
+    "viewad-locality": "location",
+    "viewad-description-text": "description",
+}
+# Seitenbereiche, deren Text für die Kontakt-Erkennung gebraucht wird
+_SECTION_IDS = {
+    "viewad-contact": "contact",
+    "viewad-details": "details",
+}
+
+
+class _Frame:
+    __slots__ = ("tag", "text_start", "field", "section", "is_heading")
+
+    def __init__(self, tag, text_start, field=None, section=None):
+        self.tag = tag
+        self.text_start = text_start
+        self.field = field
+        self.section = section
+        self.is_heading = False
+
+
+class _ListingCollector:
+    """
+    Sammelt Titel, Preis, Ort, Beschreibung, Bilder und Verkäufertext in einem
+    Durchlauf. Die Methoden entsprechen dem Target-Interface von lxml
+    (`start`, `end`, `data`, `close`).
+    """
+
+    def __init__(self):
+        self.stack = []
+        self.texts = []          # alle sichtbaren, gestrippten Textstücke
+        self.skip_depth = 0
+        self.fields = {}         # Treffer über bekannte IDs
+        self.sections = {}       # Bereichs-Name -> Textstücke
+        self.title = None
+        self.price = None
+        self.seller = None
+        self.image_urls = []
+        self.desc_parts = []
+        self.desc_depth = None   # Stapeltiefe der Geschwister der "Beschreibung"-Überschrift
+        self.desc_done = False
+
+    # --- Target-Interface -------------------------------------------------
+    def start(self, tag, attrs):
+        tag = tag.lower()
+        if self.skip_depth:
+            if tag in _SKIP_TAGS:
+                self.skip_depth += 1
+            return
+        if tag in _SKIP_TAGS:
+            self.skip_depth = 1
+            return
+        if tag == "img":
+            src = attrs.get("src")
+            if src and "placeholder" not in src:
+                self.image_urls.append(src)
+        if tag in _VOID_TAGS:
+            if tag == "br":
+                self.texts.append("\n")
+            return
+        # <p> schließt ein offenes <p> implizit (html.parser liefert dafür kein End-Ereignis)
+        if tag == "p" and self.stack and self.stack[-1].tag == "p":
+            self._pop()
+        if self.desc_depth is not None and not self.desc_done and len(self.stack) == self.desc_depth and tag != "p":
+            self.desc_done = True
+        element_id = attrs.get("id")
+        self.stack.append(_Frame(tag, len(self.texts), _ID_FIELDS.get(element_id), _SECTION_IDS.get(element_id)))
+
+    def end(self, tag):
+        tag = tag.lower()
+        if self.skip_depth:
+            if tag in _SKIP_TAGS:
+                self.skip_depth -= 1
+            return
+        if tag in _VOID_TAGS:
+            return
+        # Bis zum passenden Start-Tag schließen; verirrte End-Tags ignorieren
+        for i in range(len(self.stack) - 1, -1, -1):
+            if self.stack[i].tag == tag:
+                while len(self.stack) > i:
+                    self._pop()
+                return
+
+    def data(self, text):
+        if self.skip_depth:
+            return
+        text = text.strip()
+        if not text:
+            return
+        self.texts.append(text)
+        if "Beschreibung" in text and self.desc_depth is None:
+            # Innerste Überschrift bzw. innerstes <div> um den Text markieren
+            for frame in reversed(self.stack):
+                if frame.tag in ("h2", "h3", "div"):
+                    frame.is_heading = True
+                    break
+        if self.seller is None and "verkäufer" in text.lower() and self.stack and self.stack[-1].tag in ("span", "div"):
+            self.seller = text
+
+    def close(self) -> dict:
+        while self.stack:
+            self._pop()
+        description = self.fields.get("description")
+        if description is None:
+            description = "\n".join(self.desc_parts)
+        description = description.strip()
+        location = self.fields.get("location") or ""
+        sections = dict(self.sections)
+        sections["location"] = [location] if location else []
+        sections["description"] = description.split("\n") if description else []
+        return {
+            "title": self.fields.get("title") or self.title or "",
+            "price": self.fields.get("price") or self.price or "",
+            "location": location,
+            "description": description,
+            "image_urls": self.image_urls,
+            "seller": self.seller or "",
+            "sections": sections,
+        }
+
+    # --- Hilfsfunktionen --------------------------------------------------
+    def _text(self, frame, sep=""):
+        return sep.join(t for t in self.texts[frame.text_start:] if t != "\n")
+
+    def _pop(self):
+        frame = self.stack.pop()
+        tag = frame.tag
+        if frame.section and frame.section not in self.sections:
+            self.sections[frame.section] = [t for t in self.texts[frame.text_start:] if t != "\n"]
+        if frame.field and frame.field not in self.fields:
+            if frame.field == "description":
+                raw = " ".join(self.texts[frame.text_start:])
+                self.fields["description"] = "\n".join(line.strip() for line in raw.split("\n")).strip()
+            else:
+                self.fields[frame.field] = self._text(frame)
+        if tag == "h1" and self.title is None:
+            self.title = self._text(frame)
+        elif tag == "span" and self.price is None:
+            text = self._text(frame)
+            if "€" in text:
+                self.price = text
+        if self.desc_depth is not None and not self.desc_done:
+            if tag == "p" and len(self.stack) == self.desc_depth:
+                self.desc_parts.append(self._text(frame))
+            elif len(self.stack) < self.desc_depth:
+                # Elternelement der Überschrift geschlossen – keine weiteren Geschwister
+                self.desc_done = True
+        if frame.is_heading and self.desc_depth is None:
+            # Beschreibung = direkt folgende <p>-Geschwister der Überschrift
+            self.desc_depth = len(self.stack)
+
+
+# Klassen der Ergebniskarten einer Suchseite -> Feld
+_CARD_FIELDS = {
+    "aditem-main--middle--price-shipping--price": "price",
+    "aditem-main--top--left": "location",
+}
+
+
+class _SearchCollector:
+    """
+    Sammelt Titel, Preis, Ort, Vorschaubild und Link aller Ergebniskarten
+    (`<article class="aditem">`) sowie den Link zur nächsten Seite in einem
+    Durchlauf. Text außerhalb der Karten wird gar nicht erst gesammelt.
+    """
+
+    def __init__(self):
+        self.stack = []          # Frames innerhalb der aktuellen Karte
+        self.texts = []
+        self.skip_depth = 0
+        self.cards = []
+        self.card = None         # Felder der offenen Karte
+        self.next_url = None     # Link "Nächste" der Seitennavigation
+        self.next_link = None    # <link rel="next"> im <head> als Ersatz
+
+    def start(self, tag, attrs):
+        tag = tag.lower()
+        if self.skip_depth:
+            if tag in _SKIP_TAGS:
+                self.skip_depth += 1
+            return
+        if tag in _SKIP_TAGS:
+            self.skip_depth = 1
+            return
+        classes = (attrs.get("class") or "").split()
+        if self.card is None:
+            if tag == "article" and "aditem" in classes:
+                self.card = {"href": attrs.get("data-href") or "", "image": "", "title": "",
+                             "price": "", "location": ""}
+                self.texts = []
+                self.stack = [_Frame(tag, 0)]
+            elif tag == "a" and "pagination-next" in classes and attrs.get("href"):
+                self.next_url = attrs["href"]
+            elif tag == "link" and attrs.get("rel") == "next" and attrs.get("href"):
+                self.next_link = attrs["href"]
+            return
+        card = self.card
+        if not card["image"]:
+            image = attrs.get("data-imgsrc") or (attrs.get("src") if tag == "img" else None)
+            if image and "placeholder" not in image:
+                card["image"] = image
+        if tag in _VOID_TAGS:
+            return
+        field = None
+        if tag == "a" and "ellipsis" in classes:
+            field = "title"
+            if not card["href"]:
+                card["href"] = attrs.get("href") or ""
+        else:
+            for name in classes:
+                if name in _CARD_FIELDS:
+                    field = _CARD_FIELDS[name]
+                    break
+        self.stack.append(_Frame(tag, len(self.texts), field))
+
+    def end(self, tag):
+        tag = tag.lower()
+        if self.skip_depth:
+            if tag in _SKIP_TAGS:
+                self.skip_depth -= 1
+            return
+        if self.card is None or tag in _VOID_TAGS:
+            return
+        for i in range(len(self.stack) - 1, -1, -1):
+            if self.stack[i].tag == tag:
+                while len(self.stack) > i:
+                    self._pop()
+                return
+
+    def data(self, text):
+        if self.card is None or self.skip_depth:
+            return
+        text = text.strip()
+        if text:
+            self.texts.append(text)
+
+    def close(self) -> dict:
+        while self.stack:
+            self._pop()
+        return {"cards": self.cards, "next_url": self.next_url or self.next_link}
+
+    def _pop(self):
+        frame = self.stack.pop()
+        if frame.field and not self.card[frame.field]:
+            self.card[frame.field] = " ".join(" ".join(self.texts[frame.text_start:]).split())
+        if not self.stack:
+            if self.card["href"]:
+                self.cards.append(self.card)
+            self.card = None
+
+
+class _StdlibParser(HTMLParser):
+    def __init__(self, target):
+        super().__init__(convert_charrefs=True)
+        self.target = target
+
+    def handle_starttag(self, tag, attrs):
+        self.target.start(tag, dict(attrs))
+
+    def handle_startendtag(self, tag, attrs):
+        self.target.start(tag, dict(attrs))
+        self.target.end(tag)
+
+    def handle_endtag(self, tag):
+        self.target.end(tag)
+
+    def handle_data(self, data):
+        self.target.data(data)
+
+
+def _decode(html) -> str:
+    if isinstance(html, bytes):
+        return html.decode("utf-8", errors="replace")
+    return html
+
+
+def _run_html_parser(html, collector):
+    parser = _StdlibParser(collector)
+    parser.feed(_decode(html))
+    parser.close()
+    return collector.close()
+
+
+def _run_lxml(html, collector):
+    from lxml import etree
+
+    parser = etree.HTMLParser(target=collector, encoding="utf-8" if isinstance(html, bytes) else None)
+    parser.feed(html)
+    return parser.close()
+
+
+def _run_selectolax(html, collector):
+    from selectolax.lexbor import LexborHTMLParser
+
+    tree = LexborHTMLParser(_decode(html))
+    root = tree.body or tree.root
+    if root is None:
+        return collector.close()
+    # Iterativer Tiefendurchlauf mit expliziten End-Ereignissen
+    stack = [(root, False)]
+    while stack:
+        node, closing = stack.pop()
+        if closing:
+            collector.end(node.tag)
+            continue
+        if node.tag == "-text":
+            collector.data(node.text(deep=False))
+            continue
+        if node.tag.startswith("-") or node.tag.startswith("_"):
+            continue
+        collector.start(node.tag, node.attributes)
+        stack.append((node, True))
+        children = []
+        child = node.child
+        while child is not None:
+            children.append(child)
+            child = child.next
+        stack.extend((c, False) for c in reversed(children))
+    return collector.close()
+
+
+BACKENDS = {
+    "html.parser": _run_html_parser,
+    "lxml": _run_lxml,
+    "selectolax": _run_selectolax,
+}
+
+
+def available_backends() -> list:
+    """Liefert die Backends, deren Bibliotheken importierbar sind."""
+    names = ["html.parser"]
+    for name, module in (("lxml", "lxml.etree"), ("selectolax", "selectolax.lexbor")):
+        try:
+            __import__(module)
+            names.append(name)
+        except ImportError:
+            pass
+    return names
+
+
+def _resolve_backend(backend: str) -> str:
+    if backend == "auto":
+        return "lxml" if "lxml" in available_backends() else "html.parser"
+    if backend not in BACKENDS:
+        raise ValueError(f"Unbekanntes Parser-Backend: {backend}")
+    return backend
+
+
+def extract_listing(html, backend: str = None) -> dict:
+    """
+    Extrahiert die Rohfelder einer Anzeigen-Detailseite in einem Durchlauf.
+
+    Rückgabe: Dictionary mit `title`, `price`, `location`, `description`,
+    `image_urls`, `seller` (Text des Verkäufer-Elements) und `sections`
+    (Textstücke von Kontaktbox, Ort, Details und Beschreibung für
+    `logic.contact`; Navigation, Footer und Werbung sind nicht enthalten).
+    """
+    name = _resolve_backend(backend or DEFAULT_BACKEND)
+    return BACKENDS[name](html, _ListingCollector())
+
+
+def extract_search_results(html, backend: str = None) -> dict:
+    """
+    Extrahiert alle Ergebniskarten einer Suchseite in einem Durchlauf.
+
+    Rückgabe: `{"cards": [...], "next_url": ...}`; jede Karte hat `href`
+    (relativ wie im HTML), `title`, `price`, `location` und `image`
+    (Vorschaubild oder ""). `next_url` ist der Link zur nächsten Seite oder None.
+    """
+    name = _resolve_backend(backend or DEFAULT_BACKEND)
+    return BACKENDS[name](html, _SearchCollector())
@@ -0,0 +1,239 @@
+"""
+HTTP-Abruf für Kleinanzeigen-Seiten.
+
+Alle Abrufe laufen über eine gemeinsame `requests.Session` mit Keep-Alive-Pool,
+damit nicht für jede Anzeige eine neue TCP/TLS-Verbindung aufgebaut wird.
+Zusätzlich wird pro Host ein Rate-Limit eingehalten und bei 429/5xx mit
+exponentiellem Backoff (inkl. `Retry-After`) erneut versucht.
+"""
+import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from logic import metrics
+from logic.http_cache import HttpCache, get_default_cache
+
+USER_AGENT = (
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+    '(KHTML, like Gecko) Chrome/97.0.4692.99 Safari/537.36'
+)
+DEFAULT_TIMEOUT = 15          # Sekunden pro Anfrage
+DEFAULT_POOL_SIZE = 32        # Verbindungen pro Host im Keep-Alive-Pool
+RETRY_STATUS = {429, 500, 502, 503, 504}
+MAX_BACKOFF = 60.0            # Obergrenze für Wartezeiten in Sekunden
+
+_session = None
+_session_pool_size = 0
+_session_lock = threading.Lock()
+
+
+def _mount_adapters(session: requests.Session, pool_size: int):
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+
+def get_session(pool_size: int = DEFAULT_POOL_SIZE) -> requests.Session:
+    """
+    Liefert die prozessweit geteilte Session (wird beim ersten Aufruf angelegt).
+    Die Session ist für parallele GET-Anfragen aus mehreren Threads ausgelegt.
+    Verlangt ein späterer Aufruf einen größeren Pool (z. B. `batch.py --concurrency 64`),
+    werden die Adapter vergrößert; laufende Anfragen behalten ihren bisherigen Pool.
+    """
+    global _session, _session_pool_size
+    if _session is None or pool_size > _session_pool_size:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                session.headers["User-Agent"] = USER_AGENT
+                _mount_adapters(session, pool_size)
+                _session_pool_size = pool_size
+                _session = session
+            elif pool_size > _session_pool_size:
+                _mount_adapters(_session, pool_size)
+                _session_pool_size = pool_size
+    return _session
+
+
+class HostRateLimiter:
+    """
+    Begrenzt die Anfragerate pro Host (Anfragen/Sekunde).
+
+    Nach 429/5xx-Antworten wird der Host für die Backoff-Dauer gesperrt und der
+    Mindestabstand zusätzlich verlängert; erfolgreiche Antworten bauen diesen
+    Aufschlag schrittweise wieder ab.
+    """
+
+    def __init__(self, rate: float = 10.0):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._next_slot = {}   # host -> frühester Zeitpunkt der nächsten Anfrage
+        self._penalty = {}     # host -> zusätzlicher Abstand nach Fehlern
+        self._lock = threading.Lock()
+
+    def acquire(self, host: str):
+        """Reserviert den nächsten freien Slot für `host` und wartet bis dahin."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval + self._penalty.get(host, 0.0)
+        wait = slot - now
+        if wait > 0:
+            time.sleep(wait)
+
+    def backoff(self, host: str, delay: float):
+        """Sperrt `host` für `delay` Sekunden und erhöht den Mindestabstand."""
+        with self._lock:
+            until = time.monotonic() + delay
+            self._next_slot[host] = max(self._next_slot.get(host, until), until)
+            penalty = self._penalty.get(host, 0.0)
+            self._penalty[host] = min(MAX_BACKOFF, penalty * 2 if penalty else max(self.interval, 0.1))
+
+    def success(self, host: str):
+        with self._lock:
+            penalty = self._penalty.get(host, 0.0) / 2
+            if penalty < 0.01:
+                self._penalty.pop(host, None)
+            else:
+                self._penalty[host] = penalty
+
+
+class RequestBudget:
+    """
+    Globales Anfragebudget als Token-Bucket: im Mittel `per_minute` Anfragen,
+    kurzfristig bis zu `burst` am Stück – unabhängig vom Host.
+    """
+
+    def __init__(self, per_minute: float = 60.0, burst: int = 5):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self) -> float:
+        """Sekunden, bis die nächste Anfrage erlaubt ist (0 = sofort)."""
+        with self._lock:
+            self._refill(time.monotonic())
+            return 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+
+    def acquire(self, timeout: float = None) -> bool:
+        """Verbraucht ein Token; wartet höchstens `timeout` Sekunden (None = unbegrenzt)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if deadline is not None:
+                if now + wait > deadline:
+                    return False
+            time.sleep(wait)
+
+
+def _retry_after(response) -> float | None:
+    """Wertet den `Retry-After`-Header aus (Sekunden oder HTTP-Datum)."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _backoff_delay(attempt: int, base: float = 0.5) -> float:
+    # Exponentieller Backoff mit "full jitter"
+    return random.uniform(0, min(MAX_BACKOFF, base * (2 ** attempt)))
+
+
+def fetch(url: str, session: requests.Session = None, limiter: HostRateLimiter = None,
+          retries: int = 3, timeout: float = DEFAULT_TIMEOUT, headers: dict = None) -> requests.Response:
+    """
+    Ruft `url` über die gepoolte Session ab.
+
+    Bei 429/5xx sowie Verbindungsfehlern wird bis zu `retries`-mal mit Backoff
+    wiederholt. Die letzte Antwort wird unverändert zurückgegeben (Statusprüfung
+    ist Sache des Aufrufers); Netzwerkfehler nach dem letzten Versuch werden
+    als `requests.exceptions.RequestException` weitergereicht.
+    """
+    session = session or get_session()
+    host = urlsplit(url).netloc
+    attempt = 0
+    while True:
+        if limiter:
+            limiter.acquire(host)
+        try:
+            response = session.get(url, headers=headers, timeout=timeout)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if attempt >= retries:
+                raise
+            delay = _backoff_delay(attempt)
+            logging.warning(f"Netzwerkfehler bei {url} ({e}), neuer Versuch in {delay:.1f}s")
+        else:
+            if response.status_code not in RETRY_STATUS or attempt >= retries:
+                if limiter and response.status_code not in RETRY_STATUS:
+                    limiter.success(host)
+                return response
+            delay = _retry_after(response)
+            if delay is None:
+                delay = _backoff_delay(attempt)
+            delay = min(delay, MAX_BACKOFF)
+            logging.warning(f"HTTP {response.status_code} von {host}, neuer Versuch in {delay:.1f}s")
+        if limiter:
+            limiter.backoff(host, delay)
+        else:
+            time.sleep(delay)
+        attempt += 1
+
+
+@metrics.timed("fetch")
+def fetch_cached(url: str, cache: HttpCache = None, **kwargs) -> bytes:
+    """
+    Wie `fetch`, aber über den persistenten HTTP-Cache (`logic.http_cache`).
+
+    Frische Einträge werden ohne Netzwerkzugriff geliefert; abgelaufene werden
+    mit If-None-Match/If-Modified-Since revalidiert. Gibt den Body zurück und
+    wirft `requests.HTTPError` bei Fehlerstatus.
+    """
+    cache = cache or get_default_cache()
+    entry = cache.get(url)
+    if entry and entry.is_fresh(cache.ttl):
+        cache.record("hits", len(entry.body))
+        metrics.inc("fetch_bytes", len(entry.body), source="cache")
+        return entry.body
+
+    headers = dict(kwargs.pop("headers", None) or {})
+    if entry:
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+    response = fetch(url, headers=headers or None, **kwargs)
+
+    if response.status_code == 304 and entry:
+        cache.touch(url)
+        cache.record("revalidated", len(entry.body))
+        metrics.inc("fetch_bytes", len(entry.body), source="revalidated")
+        return entry.body
+    response.raise_for_status()
+    cache.record("misses")
+    metrics.inc("fetch_bytes", len(response.content), source="network")
+    cache.put(url, response.content, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+    return response.content
@@ -0,0 +1,159 @@
+"""
+Persistenter HTTP-Cache für Anzeigen-Seiten (SQLite auf der lokalen Platte).
+
+Einträge werden über die normalisierte URL gefunden. Innerhalb der TTL wird
+direkt aus dem Cache geliefert; danach wird mit ETag/If-Modified-Since
+revalidiert, sodass eine unveränderte Anzeige nur ein 304 kostet.
+Die Gesamtgröße ist begrenzt, verdrängt wird nach LRU.
+"""
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Cache-Verzeichnis (Ordner "data/cache" neben dem Ordner "logic", per ENV `CACHE_DIR` umlenkbar)
+CACHE_DIR = os.getenv("CACHE_DIR") or os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "cache")
+DEFAULT_CACHE_PATH = os.path.join(CACHE_DIR, "http_cache.sqlite3")
+DEFAULT_TTL = 15 * 60                   # Sekunden ohne Revalidierung
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024   # Obergrenze für gespeicherte Bodies
+
+# Query-Parameter, die den Seiteninhalt nicht verändern
+_TRACKING_PARAMS = {"utm_source", "utm_medium", "utm_campaign", "utm_term", "utm_content", "fbclid", "gclid"}
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normalisiert eine Anzeigen-URL für den Cache-Schlüssel: Schema/Host klein,
+    ohne Fragment, ohne Tracking-Parameter, sortierte Query, ohne Slash am Ende.
+    """
+    parts = urlsplit(url.strip())
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                   if k.lower() not in _TRACKING_PARAMS)
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(query), ""))
+
+
+@dataclass
+class CacheEntry:
+    url: str
+    body: bytes
+    etag: str | None
+    last_modified: str | None
+    fetched_at: float
+
+    def is_fresh(self, ttl: float) -> bool:
+        return time.time() - self.fetched_at < ttl
+
+
+class HttpCache:
+    """
+    Größenbegrenzter LRU-Cache für HTTP-Antworten.
+
+    Die Zähler in `stats` werden von `logic.fetch.fetch_cached` über `record`
+    fortgeschrieben: `hits` (frisch aus dem Cache), `revalidated` (304) und
+    `misses` (voller Download).
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, ttl: float = DEFAULT_TTL,
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "revalidated": 0, "misses": 0, "evictions": 0, "bytes_saved": 0}
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, url TEXT, body BLOB, etag TEXT, last_modified TEXT,"
+            " fetched_at REAL, last_access REAL, size INTEGER)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses(last_access)")
+        # Gesamtgröße einmalig ermitteln und danach mitführen: SUM(size) liest pro Zeile die
+        # Overflow-Seiten des davor gespeicherten Bodys und würde jedes `put` mit der Cachegröße verlangsamen
+        self._total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, url: str) -> CacheEntry | None:
+        key = normalize_url(url)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, body, etag, last_modified, fetched_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+        return CacheEntry(*row)
+
+    def put(self, url: str, body: bytes, etag: str = None, last_modified: str = None):
+        key = normalize_url(url)
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, url, body, etag, last_modified, now, now, len(body)),
+            )
+            self._total += len(body) - (old[0] if old else 0)
+            self._evict()
+
+    def touch(self, url: str):
+        """Markiert einen Eintrag nach erfolgreicher Revalidierung (304) als frisch."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE responses SET fetched_at = ?, last_access = ? WHERE key = ?",
+                (now, now, normalize_url(url)),
+            )
+
+    def record(self, outcome: str, saved_bytes: int = 0):
+        """Zählt einen Abruf ('hits', 'revalidated' oder 'misses')."""
+        with self._lock:
+            self.stats[outcome] += 1
+            self.stats["bytes_saved"] += saved_bytes
+
+    def _evict(self):
+        if self._total <= self.max_bytes:
+            return
+        while self._total > self.max_bytes:
+            # Älteste Einträge (nach letztem Zugriff) blockweise entfernen
+            oldest = self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY last_access LIMIT 64"
+            ).fetchall()
+            if not oldest:
+                break
+            for key, size in oldest:
+                if self._total <= self.max_bytes:
+                    break
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._total -= size
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._total = 0
+
+    def summary(self) -> dict:
+        """Zähler plus Trefferquote (Treffer und 304 zählen als gespart)."""
+        s = dict(self.stats)
+        requests_total = s["hits"] + s["revalidated"] + s["misses"]
+        s["hit_ratio"] = (s["hits"] + s["revalidated"]) / requests_total if requests_total else 0.0
+        return s
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache() -> HttpCache:
+    """Prozessweit geteilter Cache unter `data/cache/` (wird bei Bedarf angelegt)."""
+    global _default_cache
+    if _default_cache is None:
+        with _default_lock:
+            if _default_cache is None:
+                _default_cache = HttpCache()
+    return _default_cache
@@ -0,0 +1,317 @@
+"""
+Bild-Pipeline für Anzeigenbilder: Download, Thumbnails, Perceptual Hashes.
+
+- Downloads laufen asynchron über einen gemeinsamen `httpx.AsyncClient`
+  (Keep-Alive-Pool, begrenzte Parallelität).
+- Dekodieren, Verkleinern und Hashen ist CPU-Arbeit und läuft in einem
+  Prozess-Pool, damit mehrere Kerne genutzt werden und die Event-Loop frei bleibt.
+  Der Pool wird beim ersten Aufruf gestartet (Start-Methode "spawn", kein fork
+  aus dem mehrfädigen Streamlit-Server) und über alle Aufrufe wiederverwendet.
+- Thumbnails liegen in einem größenbegrenzten Verzeichnis unter `data/cache/`
+  (LRU nach Zugriffszeit).
+- Für jedes Bild wird ein 64-Bit-dHash gespeichert. Die Suche nach ähnlichen
+  Bildern nutzt Multi-Index-Hashing: Der Hash wird in vier 16-Bit-Bänder
+  geteilt, die einzeln indexiert sind. Zwei Hashes mit Hamming-Abstand ≤ 3
+  stimmen in mindestens einem Band exakt überein (Schubfachprinzip) – statt
+  alle Paare zu vergleichen, genügen vier Index-Lookups.
+"""
+import asyncio
+import hashlib
+import io
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import Iterable
+
+from logic.fetch import USER_AGENT
+from logic.http_cache import CACHE_DIR
+
+THUMBNAIL_DIR = os.path.join(CACHE_DIR, "thumbnails")
+HASH_DB_PATH = os.path.join(CACHE_DIR, "image_hashes.sqlite3")
+THUMBNAIL_SIZE = (320, 320)
+DEFAULT_MAX_BYTES = 500 * 1024 * 1024
+DEFAULT_CONCURRENCY = 32
+MAX_DISTANCE = 3              # Hamming-Abstand, ab dem zwei Bilder als gleich gelten
+MAX_IMAGE_BYTES = 20 * 1024 * 1024
+_BANDS = 4                    # MAX_DISTANCE + 1 Bänder à 16 Bit
+
+
+def dhash(image, hash_size: int = 8) -> int:
+    """Differenz-Hash (64 Bit): Helligkeitsgefälle benachbarter Pixel eines 9×8-Graustufenbilds."""
+    from PIL import Image
+
+    gray = image.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.LANCZOS)
+    pixels = list(gray.getdata())
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def _process_image(data: bytes, size: tuple = THUMBNAIL_SIZE) -> tuple:
+    """
+    Läuft im Prozess-Pool: dekodiert das Bild, erzeugt ein JPEG-Thumbnail und
+    den dHash. Rückgabe `(thumbnail_bytes, hash, breite, höhe)`.
+    """
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as image:
+        image.draft("RGB", (size[0] * 2, size[1] * 2))   # JPEG: schon beim Dekodieren verkleinern
+        width, height = image.size
+        image = image.convert("RGB")
+        value = dhash(image)
+        image.thumbnail(size)
+        out = io.BytesIO()
+        image.save(out, "JPEG", quality=80, optimize=True)
+    return out.getvalue(), value, width, height
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def _bands(value: int) -> list:
+    return [(value >> (16 * i)) & 0xFFFF for i in range(_BANDS)]
+
+
+def _to_signed(value: int) -> int:
+    # SQLite speichert nur vorzeichenbehaftete 64-Bit-Ganzzahlen
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+class ThumbnailCache:
+    """Thumbnails als Dateien (Name = SHA-1 der Bild-URL), Gesamtgröße begrenzt (LRU)."""
+
+    def __init__(self, directory: str = THUMBNAIL_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(entry.stat().st_size for entry in os.scandir(directory) if entry.is_file())
+
+    def path_for(self, url: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".jpg")
+
+    def get(self, url: str) -> str | None:
+        path = self.path_for(url)
+        try:
+            os.utime(path)       # Zugriffszeit für LRU
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, url: str, data: bytes) -> str:
+        path = self.path_for(url)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        with self._lock:
+            try:
+                self._size -= os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+            os.replace(tmp_path, path)
+            self._size += len(data)
+            if self._size > self.max_bytes:
+                self._evict()
+        return path
+
+    def _evict(self):
+        # Älteste Dateien löschen, bis 90 % der Obergrenze erreicht sind
+        entries = sorted((e for e in os.scandir(self.directory) if e.is_file()), key=lambda e: e.stat().st_mtime)
+        for entry in entries:
+            if self._size <= self.max_bytes * 0.9:
+                break
+            size = entry.stat().st_size
+            try:
+                os.remove(entry.path)
+                self._size -= size
+            except FileNotFoundError:
+                pass
+
+
+class HashIndex:
+    """
+    Persistenter Index `Bild-URL → dHash` (SQLite) mit vier indexierten
+    16-Bit-Bändern für die Ähnlichkeitssuche.
+    """
+
+    def __init__(self, path: str = HASH_DB_PATH):
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS image_hashes ("
+            " image_url TEXT PRIMARY KEY, ad_url TEXT, hash INTEGER, width INTEGER, height INTEGER,"
+            " b0 INTEGER, b1 INTEGER, b2 INTEGER, b3 INTEGER, created_at REAL)"
+        )
+        for i in range(_BANDS):
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS image_hashes_b{i} ON image_hashes(b{i})")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS image_hashes_ad ON image_hashes(ad_url)")
+
+    def add(self, image_url: str, ad_url: str, value: int, width: int = 0, height: int = 0):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO image_hashes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (image_url, ad_url, _to_signed(value), width, height, *_bands(value), time.time()),
+            )
+
+    def get(self, image_url: str) -> int | None:
+        row = self._conn.execute("SELECT hash FROM image_hashes WHERE image_url = ?", (image_url,)).fetchone()
+        return row[0] & ((1 << 64) - 1) if row else None
+
+    def similar(self, value: int, max_distance: int = MAX_DISTANCE, exclude_ad: str = None) -> list:
+        """Bilder mit Hamming-Abstand ≤ `max_distance` als `(image_url, ad_url, abstand)`."""
+        bands = _bands(value)
+        rows = self._conn.execute(
+            "SELECT image_url, ad_url, hash FROM image_hashes WHERE "
+            + " OR ".join(f"b{i} = ?" for i in range(_BANDS)),
+            bands,
+        ).fetchall()
+        result = []
+        for image_url, ad_url, stored in rows:
+            distance = hamming(value, stored & ((1 << 64) - 1))
+            if distance <= max_distance and (exclude_ad is None or ad_url != exclude_ad):
+                result.append((image_url, ad_url, distance))
+        return sorted(result, key=lambda row: row[2])
+
+    def duplicate_ads(self, ad_url: str, max_distance: int = MAX_DISTANCE) -> dict:
+        """Andere Anzeigen mit (nahezu) gleichen Bildern: `{ad_url: anzahl_gleicher_bilder}`."""
+        counts = {}
+        for (stored,) in self._conn.execute("SELECT hash FROM image_hashes WHERE ad_url = ?", (ad_url,)):
+            seen = {other for _, other, _ in self.similar(stored & ((1 << 64) - 1), max_distance, ad_url)}
+            for other in seen:
+                counts[other] = counts.get(other, 0) + 1
+        return counts
+
+
+@dataclass(slots=True)
+class ImageResult:
+    image_url: str
+    ad_url: str = ""
+    thumbnail_path: str | None = None
+    dhash: int | None = None
+    cached: bool = False
+    error: str | None = None
+    duplicates: list = field(default_factory=list)   # [(image_url, ad_url, abstand)] aus anderen Anzeigen
+
+
+class ImagePipeline:
+    """
+    Lädt Bilder, erzeugt Thumbnails und Hashes und meldet Duplikate.
+    Bereits bekannte Bilder (Thumbnail + Hash vorhanden) werden nicht erneut geladen.
+    """
+
+    def __init__(self, thumbnails: ThumbnailCache = None, index: HashIndex = None,
+                 concurrency: int = DEFAULT_CONCURRENCY, workers: int = None, timeout: float = 15.0):
+        self.thumbnails = thumbnails or ThumbnailCache()
+        self.index = index or HashIndex()
+        self.concurrency = concurrency
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def _discard_pool(self, pool: ProcessPoolExecutor):
+        # Abgestürzter Worker: Pool verwerfen, der nächste Aufruf startet einen neuen
+        with self._pool_lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def close(self):
+        """Beendet den Prozess-Pool (wird bei Bedarf neu gestartet)."""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
+
+    async def process(self, images: Iterable[tuple]) -> list:
+        """Verarbeitet `(ad_url, image_url)`-Paare; Ergebnis in Eingabereihenfolge."""
+        import httpx
+
+        results = [ImageResult(image_url, ad_url) for ad_url, image_url in images]
+        semaphore = asyncio.Semaphore(self.concurrency)
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        broken = False
+        async with httpx.AsyncClient(limits=limits, timeout=self.timeout, follow_redirects=True,
+                                     headers={"User-Agent": USER_AGENT}) as client:
+            async def _run(result: ImageResult):
+                nonlocal broken
+                try:
+                    await self._process_one(result, client, semaphore, pool, loop)
+                except BrokenProcessPool as e:
+                    broken = True
+                    result.error = str(e) or e.__class__.__name__
+                except Exception as e:
+                    result.error = str(e) or e.__class__.__name__
+
+            await asyncio.gather(*(_run(result) for result in results))
+        if broken:
+            self._discard_pool(pool)
+        for result in results:
+            if result.dhash is not None:
+                result.duplicates = self.index.similar(result.dhash, exclude_ad=result.ad_url)
+        return results
+
+    async def _process_one(self, result: ImageResult, client, semaphore, pool, loop):
+        known = self.index.get(result.image_url)
+        path = self.thumbnails.get(result.image_url)
+        if known is not None and path:
+            result.dhash, result.thumbnail_path, result.cached = known, path, True
+            return
+        async with semaphore:
+            # Gestreamt, damit ein übergroßes Bild abgebrochen wird, bevor es ganz im Speicher liegt
+            async with client.stream("GET", result.image_url) as response:
+                response.raise_for_status()
+                length = response.headers.get("Content-Length", "")
+                if length.isdigit() and int(length) > MAX_IMAGE_BYTES:
+                    raise ValueError(f"Bild zu groß ({length} Bytes laut Content-Length)")
+                chunks, size = [], 0
+                async for chunk in response.aiter_bytes():
+                    size += len(chunk)
+                    if size > MAX_IMAGE_BYTES:
+                        raise ValueError(f"Bild zu groß (mehr als {MAX_IMAGE_BYTES} Bytes)")
+                    chunks.append(chunk)
+            data = b"".join(chunks)
+        thumbnail, value, width, height = await loop.run_in_executor(pool, _process_image, data)
+        result.thumbnail_path = await asyncio.to_thread(self.thumbnails.put, result.image_url, thumbnail)
+        result.dhash = value
+        self.index.add(result.image_url, result.ad_url, value, width, height)
+
+    def process_ads(self, ads: Iterable) -> list:
+        """Synchrone Variante für `AdInfo`-Objekte (alle `image_urls` aller Anzeigen)."""
+        pairs = [(ad.url, image_url) for ad in ads for image_url in ad.image_urls]
+        return asyncio.run(self.process(pairs))
+
+
+_default_pipeline = None
+_default_lock = threading.Lock()
+
+
+def get_default_pipeline() -> ImagePipeline:
+    """Prozessweit geteilte Pipeline mit Thumbnails und Hash-Index unter `data/cache/`."""
+    global _default_pipeline
+    if _default_pipeline is None:
+        with _default_lock:
+            if _default_pipeline is None:
+                _default_pipeline = ImagePipeline()
+    return _default_pipeline
@@ -0,0 +1,128 @@
+"""
+Persistenter Cache für LLM-Antworten (SQLite auf der lokalen Platte).
+
+Schlüssel ist das Modell (inkl. Backend) plus ein Hash des normalisierten
+Prompts. Ein wiederholter Klick auf "Nachricht generieren" mit derselben
+Anzeige und denselben Textbausteinen wird so in Millisekunden beantwortet.
+Einträge laufen nach der TTL ab; die Anzahl der Einträge ist begrenzt (LRU).
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+from logic.http_cache import CACHE_DIR
+
+DEFAULT_CACHE_PATH = os.path.join(CACHE_DIR, "llm_cache.sqlite3")
+DEFAULT_TTL = 7 * 24 * 3600       # Sekunden
+DEFAULT_MAX_ENTRIES = 5000
+
+_WHITESPACE = re.compile(r"[ \t]+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Unicode-NFC, Leerraum pro Zeile zusammengefasst, leere Zeilen entfernt."""
+    prompt = unicodedata.normalize("NFC", prompt)
+    lines = (_WHITESPACE.sub(" ", line).strip() for line in prompt.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def cache_key(model: str, prompt: str) -> str:
+    digest = hashlib.sha256(normalize_prompt(prompt).encode("utf-8")).hexdigest()
+    return f"{model}:{digest}"
+
+
+class LLMCache:
+    """
+    LRU-Cache für Completions mit TTL und Obergrenze für die Eintragsanzahl.
+    `stats` zählt Treffer, Fehlschläge und eingesparte Tokens – `tokens_saved`
+    ist die Summe aus Prompt- und Completion-Tokens der Treffer.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, ttl: float = DEFAULT_TTL,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "misses": 0, "tokens_saved": 0,
+                      "prompt_tokens_saved": 0, "completion_tokens_saved": 0}
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS completions ("
+            " key TEXT PRIMARY KEY, model TEXT, response TEXT, tokens INTEGER,"
+            " created_at REAL, last_access REAL, prompt_tokens INTEGER DEFAULT 0)"
+        )
+        # Ältere Cache-Dateien ohne Prompt-Tokens ergänzen (bestehende Einträge zählen 0)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(completions)")}
+        if "prompt_tokens" not in columns:
+            self._conn.execute("ALTER TABLE completions ADD COLUMN prompt_tokens INTEGER DEFAULT 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS completions_lru ON completions(last_access)")
+
+    def get(self, model: str, prompt: str) -> str | None:
+        """Liefert die gespeicherte Antwort oder `None` (zählt Treffer/Fehlschlag)."""
+        key = cache_key(model, prompt)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, tokens, created_at, prompt_tokens FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[2] >= self.ttl:
+                if row is not None:
+                    self._conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+                self.stats["misses"] += 1
+                return None
+            self._conn.execute("UPDATE completions SET last_access = ? WHERE key = ?", (now, key))
+            self.stats["hits"] += 1
+            self.stats["completion_tokens_saved"] += row[1] or 0
+            self.stats["prompt_tokens_saved"] += row[3] or 0
+            self.stats["tokens_saved"] += (row[1] or 0) + (row[3] or 0)
+        return row[0]
+
+    def put(self, model: str, prompt: str, response: str, tokens: int = 0, prompt_tokens: int = 0):
+        """Speichert eine Antwort; `tokens` = Completion-Tokens, `prompt_tokens` = Tokens des Prompts."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions"
+                " (key, model, response, tokens, created_at, last_access, prompt_tokens)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (cache_key(model, prompt), model, response, tokens, now, now, prompt_tokens),
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM completions WHERE key IN ("
+                    " SELECT key FROM completions ORDER BY last_access LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM completions")
+
+    def summary(self) -> dict:
+        s = dict(self.stats)
+        total = s["hits"] + s["misses"]
+        s["hit_ratio"] = s["hits"] / total if total else 0.0
+        return s
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache() -> LLMCache:
+    """Prozessweit geteilter Cache unter `data/cache/` (wird bei Bedarf angelegt)."""
+    global _default_cache
+    if _default_cache is None:
+        with _default_lock:
+            if _default_cache is None:
+                _default_cache = LLMCache()
+    return _default_cache
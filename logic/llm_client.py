@@ -1,49 +1,729 @@
-import openai
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field, fields
+from typing import Iterator
+
 import config
-import os
-import ollama
-import streamlit as st
-
-openai.api_key = st.secrets.get("openai_api_key", None) or os.getenv("openai_api_key")
-if not openai.api_key:
-    raise RuntimeError(
-        "OpenAI-Modus aktiv, aber kein API-Key gefunden. "
-        "Bitte in `.streamlit/secrets.toml` oder als ENV `openai_api_key` setzen "
-        "oder `USE_OLLAMA=True` in config.py wählen."
-    )
-    
-def ask_openai(prompt: str, model: str = None) -> str:
+from logic import metrics
+from logic.llm_cache import get_default_cache
+
+# Die Backends (openai, ollama) werden erst beim ersten Aufruf importiert und
+# ihre Clients nur einmal erzeugt (Verbindungspool wird wiederverwendet).
+# Ein fehlender OpenAI-Key fällt erst auf, wenn OpenAI tatsächlich genutzt wird.
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _cached_client(key: tuple, factory):
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = factory()
+    return client
+
+
+def _require_openai_key() -> str:
+    key = config.openai_api_key
+    if not key:
+        raise ValueError(
+            "openai_api_key ist nicht gesetzt. Bitte in `.streamlit/secrets.toml` oder "
+            "als ENV `openai_api_key` setzen oder das lokale Modell (Ollama) wählen."
+        )
+    return key
+
+
+def _prompt_tokens(prompt: str, backend: str, model: str, reported=None) -> int:
+    """Vom Backend gemeldete Prompt-Tokens, sonst geschätzt (siehe `logic.prompt.count_tokens`)."""
+    if reported:
+        return reported
+    from logic.prompt import count_tokens
+
+    return count_tokens(prompt, backend, model)
+
+
+def _record_usage(backend: str, model: str, prompt: str, prompt_tokens=None, completion_tokens=None):
+    """
+    Token-Zähler für eine tatsächlich gesendete und beantwortete Anfrage
+    (nicht für Cache-Treffer). Gestreamte Anfragen zählen in `StreamStats._finish`.
+    """
+    if not metrics.enabled():
+        return
+    metrics.inc("llm_tokens", _prompt_tokens(prompt, backend, model, prompt_tokens), backend=backend, kind="prompt")
+    if completion_tokens:
+        metrics.inc("llm_tokens", completion_tokens, backend=backend, kind="completion")
+
+
+def get_openai_client():
+    """Synchroner OpenAI-Client (einmal pro API-Key erzeugt)."""
+    key = _require_openai_key()
+
+    def _create():
+        import openai
+
+        return openai.OpenAI(api_key=key)
+
+    return _cached_client(("openai", key), _create)
+
+
+def get_ollama_client():
+    """Synchroner Ollama-Client (einmal erzeugt; Host aus ENV `OLLAMA_HOST`)."""
+    def _create():
+        import ollama
+
+        # Hook meldet gestreamte Antworten an den Router, damit er sie abbrechen kann
+        return ollama.Client(event_hooks={"response": [_register_response]})
+
+    return _cached_client(("ollama",), _create)
+
+
+# Pro Thread: Rückruf des Routers, der die laufende HTTP-Antwort übernimmt (siehe `LLMRouter._pump`)
+_stream_local = threading.local()
+
+
+def _register_response(response):
+    callback = getattr(_stream_local, "on_response", None)
+    if callback is not None:
+        callback(response)
+
+
+def _abort_response(response):
     """
-    Fragt das OpenAI-Modell (ChatCompletion) mit dem gegebenen Prompt an.
+    Bricht eine (gestreamte) httpx-Antwort sofort ab, auch wenn ein anderer
+    Thread gerade darauf wartet: `close()` allein weckt ein blockiertes Lesen
+    nicht auf, ein `shutdown` des Sockets schon.
+    """
+    try:
+        stream = response.extensions.get("network_stream")
+        sock = stream.get_extra_info("socket") if stream is not None else None
+        if sock is not None:
+            import socket
+
+            sock.shutdown(socket.SHUT_RDWR)
+        else:
+            response.close()
+    except Exception as e:
+        logging.debug(f"Antwort konnte nicht abgebrochen werden: {e}")
+
+
+def ask_openai(prompt: str, model: str = None, regenerate: bool = False) -> str:
+    """
+    Fragt das OpenAI-Modell (Chat Completions) mit dem gegebenen Prompt an.
     Nutzt `config.openai_api_key` sowie das Modell aus `config.OPENAI_MODEL` (falls kein anderes angegeben).
+    Antworten werden im LLM-Cache abgelegt; `regenerate=True` umgeht den Cache.
     """
-    if not config.openai_api_key:
-        raise ValueError("openai_api_key ist nicht gesetzt.")
-    openai.api_key = config.openai_api_key
+    client = get_openai_client()
     chosen_model = model or config.OPENAI_MODEL
+    cache = get_default_cache()
+    if not regenerate:
+        cached = cache.get(f"openai:{chosen_model}", prompt)
+        if cached is not None:
+            return cached
     try:
-        response = openai.ChatCompletion.create(
+        response = client.chat.completions.create(
             model=chosen_model,
             messages=[{"role": "user", "content": prompt}]
         )
     except Exception as e:
         # Fehler bei API-Anfrage weitergeben
         raise
-    return response.choices[0].message.content.strip()
+    text = response.choices[0].message.content.strip()
+    usage = getattr(response, "usage", None)
+    _record_usage("openai", chosen_model, prompt, getattr(usage, "prompt_tokens", None),
+                  getattr(usage, "completion_tokens", None))
+    cache.put(f"openai:{chosen_model}", prompt, text, getattr(usage, "completion_tokens", 0) or 0,
+              _prompt_tokens(prompt, "openai", chosen_model, getattr(usage, "prompt_tokens", None)))
+    return text
 
-def ask_ollama(prompt: str, model: str = "llama3.2") -> str:
+def ask_ollama(prompt: str, model: str = None, regenerate: bool = False, stats: "StreamStats" = None) -> str:
     """
     Sendet eine Anfrage an das lokal laufende Ollama-Modell und gibt die Antwort zurück.
 
     :param prompt: Die Eingabeaufforderung für das Modell.
     :param model: Der Name des zu verwendenden Modells.
+    :param regenerate: Antwort neu erzeugen, auch wenn sie im LLM-Cache liegt.
+    :param stats: Wird (falls angegeben) mit Lade- und Generierungszeiten befüllt.
     :return: Die Antwort des Modells als Zeichenkette.
     """
+    model = model or config.OLLAMA_MODEL
+    cache = get_default_cache()
+    if not regenerate:
+        cached = cache.get(f"ollama:{model}", prompt)
+        if cached is not None:
+            return cached
     try:
-        response = ollama.chat(
+        response = get_ollama_client().chat(
             model=model,
+            messages=[{"role": "user", "content": prompt}],
+            keep_alive=config.OLLAMA_KEEP_ALIVE,
+        )
+    except Exception as e:
+        raise RuntimeError(f"Fehler bei der Anfrage an Ollama: {e}")
+    text = response['message']['content']
+    if stats is not None:
+        stats.backend, stats.model = "ollama", model
+        _apply_ollama_timings(stats, response)
+        stats.prompt_tokens = _prompt_tokens(prompt, "ollama", model, stats.prompt_tokens)
+        stats._mark_chunk()
+        stats._finish()
+    else:
+        _record_usage("ollama", model, prompt, response.get('prompt_eval_count'), response.get('eval_count'))
+    cache.put(f"ollama:{model}", prompt, text, response.get('eval_count') or 0,
+              _prompt_tokens(prompt, "ollama", model, response.get('prompt_eval_count')))
+    return text
+
+
+def generate_ollama(prompt: str, model: str = None, context: list = None,
+                    stats: "StreamStats" = None) -> tuple:
+    """
+    Einzelne Anfrage über `/api/generate` mit optionalem `context` einer
+    vorherigen Antwort (Token-IDs des bisherigen Gesprächs). Ollama setzt das
+    Gespräch damit fort, ohne den Verlauf erneut zu verarbeiten – gesendet wird
+    nur der neue Teil. Rückgabe: `(antwort, neuer_context)`; der Context ist
+    None, wenn der Server keinen liefert. Nicht gecacht (die Antwort hängt am Context).
+    """
+    model = model or config.OLLAMA_MODEL
+    try:
+        response = get_ollama_client().generate(
+            model=model,
+            prompt=prompt,
+            context=context or None,
+            keep_alive=config.OLLAMA_KEEP_ALIVE,
+        )
+    except Exception as e:
+        raise RuntimeError(f"Fehler bei der Anfrage an Ollama: {e}")
+    if stats is not None:
+        stats.backend, stats.model = "ollama", model
+        _apply_ollama_timings(stats, response)
+        stats.prompt_tokens = _prompt_tokens(prompt, "ollama", model, stats.prompt_tokens)
+        stats._mark_chunk()
+        stats._finish()
+    else:
+        _record_usage("ollama", model, prompt, response.get('prompt_eval_count'), response.get('eval_count'))
+    return response['response'], response.get('context')
+
+
+def openai_async_client():
+    """
+    Erzeugt einen asynchronen OpenAI-Client (für Batch-Verarbeitung, siehe `logic.negotiation`).
+    Nicht gecacht: asynchrone Clients sind an die Event-Loop gebunden, in der sie laufen.
+    """
+    import openai
+
+    return openai.AsyncOpenAI(api_key=_require_openai_key())
+
+def ollama_async_client():
+    """Erzeugt einen asynchronen Ollama-Client mit eigenem Verbindungspool."""
+    import ollama
+
+    return ollama.AsyncClient()
+
+async def ask_openai_async(prompt: str, model: str = None, client=None, regenerate: bool = False) -> str:
+    """
+    Asynchrone Variante von `ask_openai`. Mit `client` (siehe `openai_async_client`)
+    teilen sich viele gleichzeitige Anfragen einen Verbindungspool.
+    """
+    chosen_model = model or config.OPENAI_MODEL
+    cache = get_default_cache()
+    if not regenerate:
+        cached = cache.get(f"openai:{chosen_model}", prompt)
+        if cached is not None:
+            return cached
+    own_client = client is None
+    client = client or openai_async_client()
+    try:
+        response = await client.chat.completions.create(
+            model=chosen_model,
             messages=[{"role": "user", "content": prompt}]
         )
-        return response['message']['content']
+    finally:
+        if own_client:
+            await client.close()
+    text = response.choices[0].message.content.strip()
+    usage = getattr(response, "usage", None)
+    _record_usage("openai", chosen_model, prompt, getattr(usage, "prompt_tokens", None),
+                  getattr(usage, "completion_tokens", None))
+    cache.put(f"openai:{chosen_model}", prompt, text, getattr(usage, "completion_tokens", 0) or 0,
+              _prompt_tokens(prompt, "openai", chosen_model, getattr(usage, "prompt_tokens", None)))
+    return text
+
+async def ask_ollama_async(prompt: str, model: str = None, client=None, regenerate: bool = False) -> str:
+    """Asynchrone Variante von `ask_ollama` (optional mit geteiltem `client`)."""
+    model = model or config.OLLAMA_MODEL
+    cache = get_default_cache()
+    if not regenerate:
+        cached = cache.get(f"ollama:{model}", prompt)
+        if cached is not None:
+            return cached
+    own_client = client is None
+    client = client or ollama_async_client()
+    try:
+        response = await client.chat(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            keep_alive=config.OLLAMA_KEEP_ALIVE,
+        )
     except Exception as e:
         raise RuntimeError(f"Fehler bei der Anfrage an Ollama: {e}")
+    finally:
+        if own_client:
+            await client.close()
+    text = response['message']['content']
+    _record_usage("ollama", model, prompt, response.get('prompt_eval_count'), response.get('eval_count'))
+    cache.put(f"ollama:{model}", prompt, text, response.get('eval_count') or 0,
+              _prompt_tokens(prompt, "ollama", model, response.get('prompt_eval_count')))
+    return text
+
+
+@dataclass
+class StreamStats:
+    """
+    Messwerte einer gestreamten Anfrage: Zeit bis zum ersten Token (TTFT),
+    Gesamtdauer und Tokens pro Sekunde. Wird während der Iteration befüllt.
+    """
+    backend: str = ""
+    model: str = ""
+    started: float = field(default_factory=time.perf_counter)
+    first_token_s: float | None = None
+    total_s: float | None = None
+    tokens: int = 0
+    eval_s: float | None = None   # reine Generierungszeit, falls vom Backend gemeldet
+    cached: bool = False          # Antwort stammt aus dem LLM-Cache
+    load_s: float | None = None   # Ollama: Zeit zum Laden des Modells (≈ 0, wenn es schon geladen war)
+    prompt_eval_s: float | None = None
+    prompt_tokens: int = 0
+
+    @property
+    def tokens_per_s(self) -> float:
+        duration = self.eval_s
+        if duration is None and self.total_s is not None and self.first_token_s is not None:
+            duration = self.total_s - self.first_token_s
+        return self.tokens / duration if duration else 0.0
+
+    def _mark_chunk(self):
+        if self.first_token_s is None:
+            self.first_token_s = time.perf_counter() - self.started
+
+    def _finish(self):
+        self.total_s = time.perf_counter() - self.started
+        STREAM_HISTORY.append(self)
+        source = "cache" if self.cached else self.backend
+        metrics.observe("llm", self.total_s, backend=source)
+        if self.first_token_s is not None:
+            metrics.observe("llm_first_token", self.first_token_s, backend=source)
+        if self.load_s is not None:
+            metrics.observe("llm_load", self.load_s, backend=self.backend)
+        if not self.cached:
+            metrics.inc("llm_tokens", self.tokens, backend=self.backend, kind="completion")
+            if self.prompt_tokens:
+                metrics.inc("llm_tokens", self.prompt_tokens, backend=self.backend, kind="prompt")
+        logging.info(
+            f"LLM-Stream {self.backend}/{self.model}: TTFT {self.first_token_s or 0:.2f}s, "
+            f"{self.tokens} Tokens, {self.tokens_per_s:.1f} Tokens/s"
+            + (f", Laden {self.load_s:.2f}s" if self.load_s else "")
+        )
+
+
+def _apply_ollama_timings(stats: StreamStats, meta):
+    """Übernimmt Token-Anzahl und Zeiten aus den Metadaten einer Ollama-Antwort (Nanosekunden)."""
+    if meta.get('eval_count'):
+        stats.tokens = meta['eval_count']
+    if meta.get('eval_duration'):
+        stats.eval_s = meta['eval_duration'] / 1e9
+    if meta.get('prompt_eval_count'):
+        stats.prompt_tokens = meta['prompt_eval_count']
+    if meta.get('prompt_eval_duration'):
+        stats.prompt_eval_s = meta['prompt_eval_duration'] / 1e9
+    if meta.get('load_duration') is not None:
+        stats.load_s = meta['load_duration'] / 1e9
+
+
+# Messwerte der letzten gestreamten Anfragen (neueste zuletzt)
+STREAM_HISTORY: deque = deque(maxlen=100)
+
+
+def _stream_from_cache(key_model: str, prompt: str, stats: StreamStats, regenerate: bool) -> str | None:
+    if regenerate:
+        return None
+    cached = get_default_cache().get(key_model, prompt)
+    if cached is not None:
+        stats.cached = True
+        stats._mark_chunk()
+        stats._finish()
+    return cached
+
+
+def stream_openai(prompt: str, model: str = None, stats: StreamStats = None,
+                  regenerate: bool = False) -> Iterator[str]:
+    """
+    Wie `ask_openai`, liefert die Antwort aber stückweise (Text-Chunks), sobald
+    das Modell sie erzeugt. `stats` wird dabei mit TTFT und Tokens/s befüllt.
+    Ein Cache-Treffer wird als ein einziger Chunk geliefert.
+    """
+    client = get_openai_client()
+    chosen_model = model or config.OPENAI_MODEL
+    stats = stats if stats is not None else StreamStats()
+    stats.backend, stats.model = "openai", chosen_model
+    cached = _stream_from_cache(f"openai:{chosen_model}", prompt, stats, regenerate)
+    if cached is not None:
+        yield cached
+        return
+    response = client.chat.completions.create(
+        model=chosen_model,
+        messages=[{"role": "user", "content": prompt}],
+        stream=True,
+        stream_options={"include_usage": True},
+    )
+    _register_response(response.response)
+    usage_tokens = None
+    parts = []
+    try:
+        for chunk in response:
+            if getattr(chunk, "usage", None):
+                usage_tokens = chunk.usage.completion_tokens
+                stats.prompt_tokens = chunk.usage.prompt_tokens or 0
+            if not chunk.choices:
+                continue
+            text = chunk.choices[0].delta.content
+            if text:
+                stats._mark_chunk()
+                stats.tokens += 1  # ein Chunk entspricht i. d. R. einem Token
+                parts.append(text)
+                yield text
+    finally:
+        # Auch bei Abbruch (z. B. verlorener Hedge im Router) die Verbindung freigeben
+        response.close()
+    if usage_tokens is not None:
+        stats.tokens = usage_tokens
+    stats.prompt_tokens = _prompt_tokens(prompt, "openai", chosen_model, stats.prompt_tokens)
+    stats._finish()
+    get_default_cache().put(f"openai:{chosen_model}", prompt, "".join(parts).strip(), stats.tokens, stats.prompt_tokens)
+
+
+def stream_ollama(prompt: str, model: str = None, stats: StreamStats = None,
+                  regenerate: bool = False) -> Iterator[str]:
+    """
+    Wie `ask_ollama`, liefert die Antwort aber stückweise (Text-Chunks).
+    Token-Anzahl, Lade- und Generierungszeit stammen aus den Metadaten des letzten Chunks.
+    """
+    model = model or config.OLLAMA_MODEL
+    stats = stats if stats is not None else StreamStats()
+    stats.backend, stats.model = "ollama", model
+    cached = _stream_from_cache(f"ollama:{model}", prompt, stats, regenerate)
+    if cached is not None:
+        yield cached
+        return
+    parts = []
+    try:
+        response = get_ollama_client().chat(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            stream=True,
+            keep_alive=config.OLLAMA_KEEP_ALIVE,
+        )
+        for chunk in response:
+            text = chunk['message']['content']
+            if text:
+                stats._mark_chunk()
+                stats.tokens += 1
+                parts.append(text)
+                yield text
+            if chunk.get('done'):
+                _apply_ollama_timings(stats, chunk)
+    except Exception as e:
+        raise RuntimeError(f"Fehler bei der Anfrage an Ollama: {e}")
+    stats.prompt_tokens = _prompt_tokens(prompt, "ollama", model, stats.prompt_tokens)
+    stats._finish()
+    get_default_cache().put(f"ollama:{model}", prompt, "".join(parts), stats.tokens, stats.prompt_tokens)
+
+
+# --- Router: Latenz-/Fehlerstatistik, Circuit Breaker, Hedging --------------
+
+STREAM_BACKENDS = {"openai": stream_openai, "ollama": stream_ollama}
+
+
+class BackendHealth:
+    """
+    Rollierende Statistik eines Backends (Zeit bis zum ersten Chunk, Fehler)
+    plus Circuit Breaker: nach `failure_threshold` Fehlern in Folge ist das
+    Backend für `cooldown_s` gesperrt ("open"). Danach ist genau ein
+    Probeaufruf erlaubt ("half_open"); Erfolg schließt den Breaker wieder.
+    """
+
+    def __init__(self, window: int = 50, failure_threshold: int = 3, cooldown_s: float = 30.0):
+        self.latencies = deque(maxlen=window)   # Sekunden bis zum ersten Chunk (nur Erfolge)
+        self.outcomes = deque(maxlen=window)    # True = Erfolg
+        self.failure_threshold = failure_threshold
+        self.cooldown_s = cooldown_s
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown_s:
+            return "half_open"
+        return "open"
+
+    def acquire(self) -> bool:
+        """True, wenn ein Aufruf erlaubt ist (im Zustand half_open nur einer)."""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self.trial_running:
+                self.trial_running = True
+                return True
+            return False
+
+    def record_success(self, latency_s: float):
+        with self._lock:
+            self.latencies.append(latency_s)
+            self.outcomes.append(True)
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.outcomes.append(False)
+            self.consecutive_failures += 1
+            if self.trial_running or self.consecutive_failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.trial_running = False
+
+    def release(self):
+        """Aufruf ohne Ergebnis beendet (z. B. abgebrochener Hedge)."""
+        with self._lock:
+            self.trial_running = False
+
+    def percentile(self, p: float) -> float | None:
+        with self._lock:
+            values = sorted(self.latencies)
+        if not values:
+            return None
+        return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+    @property
+    def error_rate(self) -> float:
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    def snapshot(self) -> dict:
+        return {"state": self.state, "calls": len(self.outcomes), "error_rate": self.error_rate,
+                "p50_s": self.percentile(50), "p95_s": self.percentile(95)}
+
+
+class _StreamRun:
+    __slots__ = ("backend", "stats", "cancelled", "started", "response")
+
+    def __init__(self, backend: str, model: str):
+        self.backend = backend
+        self.stats = StreamStats(backend=backend, model=model)
+        self.cancelled = threading.Event()
+        self.started = time.perf_counter()
+        self.response = None      # httpx-Antwort des Backends, sobald die Header da sind
+
+    def attach(self, response):
+        self.response = response
+        if self.cancelled.is_set():
+            _abort_response(response)
+
+    def abort(self):
+        self.cancelled.set()
+        if self.response is not None:
+            _abort_response(self.response)
+
+
+class LLMRouter:
+    """
+    Verteilt gestreamte Anfragen auf mehrere Backends.
+
+    - Reihenfolge: bevorzugtes Backend zuerst, Backends mit offenem Circuit
+      Breaker (oder ohne OpenAI-Key) werden übersprungen.
+    - Hedging: Liefert das erste Backend bis zur Deadline (p95 seiner Zeit bis
+      zum ersten Chunk, begrenzt auf [min_deadline_s, max_deadline_s]) keinen
+      Chunk, startet parallel das nächste. Wer zuerst liefert, gewinnt; die
+      Verbindung des Verlierers wird sofort getrennt.
+    - Ohne Hedging wird nach `timeout_s` ohne Chunk auf das nächste Backend gewechselt.
+    - Fehler vor dem ersten Chunk führen sofort zum nächsten Backend.
+    - Bleibt der Gewinner mitten in der Antwort `stall_timeout_s` ohne Chunk,
+      wird er abgebrochen, als Fehler gezählt und `TimeoutError` ausgelöst.
+      Schließt der Aufrufer den Generator vorzeitig, wird der Stream ebenfalls getrennt.
+    """
+
+    def __init__(self, backends: tuple = ("ollama", "openai"), models: dict = None, hedge: bool = True,
+                 failure_threshold: int = 3, cooldown_s: float = 30.0, min_deadline_s: float = 1.0,
+                 max_deadline_s: float = 15.0, default_deadline_s: float = 5.0, timeout_s: float = 60.0,
+                 stall_timeout_s: float = 30.0, min_samples: int = 5):
+        self.backends = tuple(backends)
+        self.models = models or {"openai": config.OPENAI_MODEL, "ollama": config.OLLAMA_MODEL}
+        self.hedge = hedge
+        self.min_deadline_s = min_deadline_s
+        self.max_deadline_s = max_deadline_s
+        self.default_deadline_s = default_deadline_s
+        self.timeout_s = timeout_s
+        self.stall_timeout_s = stall_timeout_s
+        self.min_samples = min_samples
+        self.health = {name: BackendHealth(failure_threshold=failure_threshold, cooldown_s=cooldown_s)
+                       for name in self.backends}
+
+    def deadline(self, backend: str) -> float:
+        """Hedge-Deadline in Sekunden (p95 der Zeit bis zum ersten Chunk)."""
+        health = self.health[backend]
+        if len(health.latencies) < self.min_samples:
+            return self.default_deadline_s
+        return min(self.max_deadline_s, max(self.min_deadline_s, health.percentile(95)))
+
+    def candidates(self, preferred: str = None) -> list:
+        names = list(self.backends)
+        if preferred in names:
+            names.remove(preferred)
+            names.insert(0, preferred)
+        if "openai" in names and not config.openai_api_key:
+            names.remove("openai")
+        return [name for name in names if self.health[name].state != "open"]
+
+    def snapshot(self) -> dict:
+        return {name: health.snapshot() for name, health in self.health.items()}
+
+    def stream(self, prompt: str, preferred: str = None, stats: StreamStats = None, regenerate: bool = False,
+               hedge: bool = None) -> Iterator[str]:
+        """
+        Wie `stream_openai`/`stream_ollama`, aber mit Backend-Auswahl, Hedging
+        und Fallback. `stats.backend` nennt danach das Backend, das geantwortet hat.
+        """
+        hedge = self.hedge if hedge is None else hedge
+        stats = stats if stats is not None else StreamStats()
+        pending = self.candidates(preferred)
+        events = queue.Queue()
+        active = []
+        last_error = None
+
+        def _start_next() -> bool:
+            while pending:
+                name = pending.pop(0)
+                if not self.health[name].acquire():
+                    continue
+                run = _StreamRun(name, self.models.get(name))
+                active.append(run)
+                threading.Thread(target=self._pump, args=(run, prompt, regenerate, events), name=f"llm-{name}",
+                                 daemon=True).start()
+                return True
+            return False
+
+        if not _start_next():
+            raise RuntimeError("Kein LLM-Backend verfügbar (Circuit Breaker offen oder nicht konfiguriert).")
+        switch_at = time.monotonic() + (self.deadline(active[0].backend) if hedge else self.timeout_s)
+        give_up_at = time.monotonic() + self.timeout_s
+        winner = None
+        while winner is None:
+            now = time.monotonic()
+            wait_until = min(switch_at, give_up_at) if pending else give_up_at
+            try:
+                run, kind, payload = events.get(timeout=max(0.0, wait_until - now))
+            except queue.Empty:
+                if pending and time.monotonic() >= switch_at:
+                    if not hedge:
+                        # Ohne Hedging: langsames Backend aufgeben und das nächste versuchen
+                        for run in active:
+                            self._cancel(run, "Timeout", failed=True)
+                        active.clear()
+                        give_up_at = time.monotonic() + self.timeout_s
+                    _start_next()
+                    switch_at = time.monotonic() + (self.deadline(active[-1].backend) if hedge else self.timeout_s)
+                    continue
+                for run in active:
+                    self._cancel(run, "Timeout", failed=True)
+                raise TimeoutError(f"Kein LLM-Backend hat innerhalb von {self.timeout_s:.0f} s geantwortet.")
+            if run not in active:
+                continue     # Nachzügler eines abgebrochenen Laufs
+            if kind == "error":
+                last_error = payload
+                active.remove(run)
+                if not active and not _start_next():
+                    raise last_error
+                continue
+            winner = run
+        for run in active:
+            if run is not winner:
+                self._cancel(run, "Hedge verloren")
+        # Messwerte des Gewinners übernehmen, Zeiten aber aus Sicht des Aufrufers
+        started = stats.started
+        _copy_stats(winner.stats, stats)
+        stats.started = started
+        stats.first_token_s = time.perf_counter() - started
+        finished = kind != "chunk"
+        try:
+            if kind == "chunk":
+                yield payload
+                while True:
+                    try:
+                        run, kind, payload = events.get(timeout=self.stall_timeout_s)
+                    except queue.Empty:
+                        finished = True
+                        self._cancel(winner, "hängt", failed=True)
+                        raise TimeoutError(f"{winner.backend} hat {self.stall_timeout_s:g} s lang keinen "
+                                           f"weiteren Chunk geliefert.")
+                    if run is not winner:
+                        continue
+                    if kind == "chunk":
+                        yield payload
+                        continue
+                    finished = True
+                    if kind == "error":
+                        raise payload
+                    break
+        finally:
+            if not finished:
+                # Aufrufer hat den Generator geschlossen (GeneratorExit) oder ist selbst gescheitert
+                self._cancel(winner, "vom Aufrufer beendet")
+        first_token_s = stats.first_token_s
+        _copy_stats(winner.stats, stats)
+        stats.started, stats.first_token_s = started, first_token_s
+        stats.total_s = time.perf_counter() - started
+
+    def _pump(self, run: _StreamRun, prompt: str, regenerate: bool, events: queue.Queue):
+        # Läuft in einem eigenen Thread und reicht die Chunks eines Backends weiter
+        health = self.health[run.backend]
+        first = True
+        _stream_local.on_response = run.attach
+        chunks = STREAM_BACKENDS[run.backend](prompt, run.stats.model, stats=run.stats, regenerate=regenerate)
+        try:
+            for chunk in chunks:
+                if run.cancelled.is_set():
+                    return
+                if first:
+                    first = False
+                    if not run.stats.cached:
+                        health.record_success(time.perf_counter() - run.started)
+                events.put((run, "chunk", chunk))
+            if first and not run.cancelled.is_set():
+                health.record_success(time.perf_counter() - run.started)   # leere Antwort
+        except Exception as e:
+            if not run.cancelled.is_set():
+                health.record_failure()
+            events.put((run, "error", e))
+            return
+        finally:
+            _stream_local.on_response = None
+            chunks.close()
+            health.release()
+        events.put((run, "done", None))
+
+    def _cancel(self, run: _StreamRun, reason: str, failed: bool = False):
+        run.abort()
+        if failed:
+            self.health[run.backend].record_failure()
+        logging.info(f"LLM-Router: {run.backend} abgebrochen ({reason})")
+
+
+def _copy_stats(source: StreamStats, target: StreamStats):
+    for f in fields(StreamStats):
+        setattr(target, f.name, getattr(source, f.name))
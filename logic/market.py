@@ -0,0 +1,276 @@
+"""
+Marktvergleich für Preisvorschläge.
+
+Aus einem lokalen Korpus bereits geparster Anzeigen werden ähnliche Artikel
+über einen invertierten Index der Titel-Tokens gefunden (Token → sortiertes
+NumPy-Array der Zeilennummern). Die IDF-gewichtete Überlappung wird
+vektorisiert per `np.bincount` berechnet (seltene Tokens wie Marke/Modell
+zählen mehr als "Fahrrad"), Median und Perzentile per `np.percentile` –
+ohne Python-Schleife über den Korpus, auch bei 100k Anzeigen im
+Millisekundenbereich.
+"""
+import atexit
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from data.prices import normalize_price
+from logic.http_cache import CACHE_DIR
+
+DEFAULT_CORPUS_PATH = os.path.join(CACHE_DIR, "market_corpus.npz")
+PERCENTILES = (10, 25, 50, 75, 90)
+MIN_COMPARABLES = 5       # weniger Treffer → Ähnlichkeitsschwelle wird gelockert
+# Mindestanteil des (IDF-gewichteten) Titels, den ein Vergleichsartikel teilen muss;
+# die weiteren Stufen greifen, wenn es zu wenige Treffer gibt
+SIMILARITY_STEPS = (0.6, 0.4, 0.2, 0.0)
+# Frühestens nach so vielen Sekunden wird der Korpus erneut geschrieben (`save_if_dirty`);
+# der Rest landet beim Beenden des Prozesses auf der Platte
+SAVE_INTERVAL_S = 60.0
+
+_TOKEN = re.compile(r"[a-zäöüß0-9]+")
+_STOPWORDS = {
+    "und", "mit", "für", "fuer", "von", "der", "die", "das", "den", "dem", "ein", "eine", "inkl",
+    "neu", "neuwertig", "top", "gut", "sehr", "zustand", "guter", "gebraucht", "wie", "vb", "nur",
+    "abholung", "versand", "set", "oder", "auch", "zum", "zur", "ohne", "original",
+}
+
+
+def tokenize(title: str) -> list:
+    """Eindeutige, kleingeschriebene Titel-Tokens (ab 3 Zeichen, ohne Füllwörter)."""
+    seen = []
+    for token in _TOKEN.findall((title or "").lower()):
+        if len(token) >= 3 and token not in _STOPWORDS and token not in seen:
+            seen.append(token)
+    return seen
+
+
+def _round_offer(amount: float) -> float:
+    # Glatte Beträge wirken in Nachrichten natürlicher
+    step = 1 if amount < 50 else 5 if amount < 1000 else 10
+    return float(max(step, round(amount / step) * step))
+
+
+def suggest_offer(asking: float | None, negotiable: bool, percentiles: dict) -> float | None:
+    """
+    Preisvorschlag aus Angebotspreis und Marktpreisen:
+    Ausgangspunkt ist der kleinere Wert aus Angebotspreis und Markt-Median,
+    davon 10 % (VB) bzw. 5 % Abschlag, aber nicht unter das 25. Perzentil
+    und nie über dem Angebotspreis.
+    """
+    if not percentiles:
+        return None
+    p25, median = percentiles[25], percentiles[50]
+    if asking is None:
+        return _round_offer(p25)
+    if asking <= 0:
+        return None    # verschenkt – kein Gegenangebot nötig
+    offer = min(asking, median) * (0.9 if negotiable else 0.95)
+    offer = max(offer, min(p25, asking * 0.95))
+    return min(_round_offer(offer), asking)
+
+
+@dataclass(slots=True)
+class MarketComparison:
+    """Ergebnis eines Marktvergleichs (Beträge in Euro)."""
+    count: int = 0                                  # Anzahl Vergleichsanzeigen mit Preis
+    percentiles: dict = field(default_factory=dict)  # {10: .., 25: .., 50: .., 75: .., 90: ..}
+    suggested_offer: float | None = None
+    asking: float | None = None
+    negotiable: bool = False
+
+    @property
+    def median(self) -> float | None:
+        return self.percentiles.get(50)
+
+    @property
+    def ok(self) -> bool:
+        return self.count > 0
+
+
+class MarketIndex:
+    """
+    Korpus aus (Titel, Betrag, URL) mit invertiertem Token-Index.
+    Anzeigen mit bekannter URL werden nicht doppelt aufgenommen.
+    """
+
+    def __init__(self):
+        self.titles = []
+        self.urls = []
+        self._amounts = []
+        self._url_rows = {}
+        self._postings = {}          # Token -> Liste der Zeilen
+        self._frozen = None          # (Token -> np.ndarray, Beträge als np.ndarray)
+        self._dirty = False          # Änderungen seit dem letzten `save`/`load`
+        self._saved_at = -math.inf   # time.monotonic() des letzten `save`
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.titles)
+
+    def add(self, title: str, amount: float | None, url: str = "") -> bool:
+        """Nimmt eine Anzeige auf; `amount=None`/NaN = Preis unbekannt."""
+        with self._lock:
+            if url and url in self._url_rows:
+                row = self._url_rows[url]
+                self._amounts[row] = math.nan if amount is None else amount
+                self._frozen = None
+                self._dirty = True
+                return False
+            row = len(self.titles)
+            self.titles.append(title)
+            self.urls.append(url)
+            self._amounts.append(math.nan if amount is None else amount)
+            if url:
+                self._url_rows[url] = row
+            for token in tokenize(title):
+                self._postings.setdefault(token, []).append(row)
+            self._frozen = None
+            self._dirty = True
+            return True
+
+    def add_ad(self, ad) -> bool:
+        """Nimmt ein `AdInfo` (bzw. ein Objekt mit title/price/url) auf."""
+        return self.add(ad.title, normalize_price(ad.price).amount, ad.url)
+
+    @classmethod
+    def from_ads(cls, ads) -> "MarketIndex":
+        index = cls()
+        for ad in ads:
+            index.add_ad(ad)
+        return index
+
+    @classmethod
+    def from_collection(cls, collection) -> "MarketIndex":
+        """Übernimmt Titel, Beträge und URLs einer `data.collection.AdCollection`."""
+        index = cls()
+        for title, amount, url in zip(collection.titles(), collection.price_values(), collection.urls()):
+            index.add(title, amount, url)
+        return index
+
+    def _freeze(self):
+        frozen = self._frozen
+        if frozen is None:
+            with self._lock:
+                # Ein paralleler Aufruf kann den Schnappschuss inzwischen erstellt haben
+                frozen = self._frozen
+                if frozen is None:
+                    postings = {t: np.asarray(rows, dtype=np.int32) for t, rows in self._postings.items()}
+                    frozen = self._frozen = (postings, np.asarray(self._amounts, dtype=np.float64))
+        return frozen
+
+    def similar_rows(self, title: str, exclude_url: str = "") -> np.ndarray:
+        """
+        Zeilen, die einen ausreichenden IDF-gewichteten Anteil der Titel-Tokens
+        teilen. Gibt es weniger als `MIN_COMPARABLES` Treffer, wird die Schwelle
+        stufenweise gesenkt (`SIMILARITY_STEPS`).
+        """
+        tokens = tokenize(title)
+        postings, amounts = self._freeze()
+        n = len(amounts)
+        # Zeile unter der Sperre lesen; ein nach dem Schnappschuss ergänztes Inserat liegt außerhalb von n
+        with self._lock:
+            exclude_row = self._url_rows.get(exclude_url) if exclude_url else None
+        lists = [postings[t] for t in tokens if t in postings]
+        if not lists:
+            return np.empty(0, dtype=np.int32)
+        # Tokens, die im Korpus fehlen, zählen mit maximalem Gewicht zur Gesamtsumme
+        weights = [math.log((n + 1) / (len(rows) + 1)) + 1.0 for rows in lists]
+        total = sum(weights) + (len(tokens) - len(lists)) * (math.log(n + 1) + 1.0)
+        score = np.bincount(np.concatenate(lists), minlength=n,
+                            weights=np.repeat(weights, [len(rows) for rows in lists]))
+        if exclude_row is not None and exclude_row < n:
+            score[exclude_row] = 0.0
+        for step in SIMILARITY_STEPS:
+            rows = np.flatnonzero(score > step * total) if step else np.flatnonzero(score)
+            if len(rows) >= MIN_COMPARABLES:
+                break
+        return rows
+
+    def compare(self, title: str, price_text: str = "", url: str = "") -> MarketComparison:
+        """Marktvergleich für eine Anzeige (die Anzeige selbst wird per URL ausgeschlossen)."""
+        price = normalize_price(price_text)
+        result = MarketComparison(asking=price.amount, negotiable=price.negotiable)
+        rows = self.similar_rows(title, exclude_url=url)
+        if not len(rows):
+            return result
+        values = self._freeze()[1][rows]
+        values = values[np.isfinite(values) & (values > 0)]   # ohne unbekannte/verschenkte
+        if len(values) >= 8:
+            # Ausreißer (z. B. Zubehör für 5 € oder "Tausch gegen ...") nach IQR-Regel entfernen
+            q1, q3 = np.percentile(values, (25, 75))
+            spread = 1.5 * (q3 - q1)
+            values = values[(values >= q1 - spread) & (values <= q3 + spread)]
+        if not len(values):
+            return result
+        result.count = int(len(values))
+        result.percentiles = dict(zip(PERCENTILES, (float(v) for v in np.percentile(values, PERCENTILES))))
+        result.suggested_offer = suggest_offer(price.amount, price.negotiable, result.percentiles)
+        return result
+
+    # --- Persistenz -------------------------------------------------------
+    def save(self, path: str = DEFAULT_CORPUS_PATH):
+        """
+        Schreibt den Korpus atomar (eindeutige Temp-Datei + `os.replace`). Die
+        Sperre bleibt über das Schreiben gehalten, damit sich zwei Aufrufe nicht
+        überholen und keine Änderung zwischen Kopie und Schreiben verloren geht.
+        """
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            with tempfile.NamedTemporaryFile(dir=directory, prefix=".market_", suffix=".npz", delete=False) as tmp:
+                try:
+                    np.savez_compressed(tmp, titles=np.array(self.titles, dtype=str),
+                                        urls=np.array(self.urls, dtype=str),
+                                        amounts=np.array(self._amounts, dtype=np.float64))
+                except BaseException:
+                    tmp.close()
+                    os.unlink(tmp.name)
+                    raise
+            os.replace(tmp.name, path)
+            self._dirty = False
+            self._saved_at = time.monotonic()
+
+    def save_if_dirty(self, path: str = DEFAULT_CORPUS_PATH, min_interval: float = SAVE_INTERVAL_S) -> bool:
+        """
+        Speichert nur bei ungesicherten Änderungen und frühestens `min_interval`
+        Sekunden nach dem letzten Speichern (`min_interval=0`: sofort). So kostet
+        nicht jede neue Anzeige ein komplettes `np.savez_compressed` des Korpus.
+        """
+        if not self._dirty or time.monotonic() - self._saved_at < min_interval:
+            return False
+        self.save(path)
+        return True
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_CORPUS_PATH) -> "MarketIndex":
+        index = cls()
+        if not os.path.exists(path):
+            return index
+        with np.load(path) as data:
+            for title, amount, url in zip(data["titles"].tolist(), data["amounts"].tolist(), data["urls"].tolist()):
+                index.add(title, amount, url)
+        index._dirty = False
+        return index
+
+
+_default_index = None
+_default_lock = threading.Lock()
+
+
+def get_default_index() -> MarketIndex:
+    """Prozessweit geteilter Korpus aus `data/cache/market_corpus.npz`."""
+    global _default_index
+    if _default_index is None:
+        with _default_lock:
+            if _default_index is None:
+                index = MarketIndex.load()
+                # Was `save_if_dirty` wegen des Intervalls zurückgehalten hat, beim Beenden sichern
+                atexit.register(index.save_if_dirty, min_interval=0)
+                _default_index = index
+    return _default_index
@@ -0,0 +1,244 @@
+"""
+Leichtgewichtige Laufzeitmessung: Spans, Latenz-Histogramme und Zähler.
+
+Jede Stufe der Pipeline (Abruf, Parsen, Kalender, Prompt, LLM) wird mit
+
+    with metrics.span("parse"):
+        ...
+
+gemessen. Die Dauer landet in einem Histogramm pro Stufe
+(`kleinanzeigen_stage_seconds{stage="parse"}`), die letzten Spans samt
+Verschachtelung in einem Ringpuffer. Zähler (`metrics.inc`) erfassen z. B.
+geladene Bytes und verbrauchte Tokens. Export als Prometheus-Textformat
+(`to_prometheus`) oder JSON (`to_json`).
+
+Standardmäßig ausgeschaltet (Umgebungsvariable `METRICS=1` oder `enable()`).
+Ausgeschaltet kostet ein Aufruf nur eine Abfrage des Schalters: `span()`
+liefert dann einen geteilten No-op-Kontextmanager, `inc()`/`observe()`
+kehren sofort zurück.
+"""
+import bisect
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+
+PREFIX = "kleinanzeigen"
+# Obergrenzen der Histogramm-Buckets in Sekunden (von Cache-Treffern bis zu langsamen LLM-Antworten)
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+RECENT_SPANS = 200
+# Felder eines Eintrags in `snapshot()["stages"]`, die keine Labels sind
+STAGE_FIELDS = ("stage", "count", "sum_s", "mean_s", "p50_s", "p95_s", "max_s", "buckets")
+
+_enabled = os.getenv("METRICS", "0").lower() in ("1", "true", "yes", "on")
+_NOOP = nullcontext()
+_lock = threading.Lock()
+_histograms = {}      # (name, labels) -> _Histogram
+_counters = {}        # (name, labels) -> float
+_recent = deque(maxlen=RECENT_SPANS)
+_current = contextvars.ContextVar("metrics_span", default=None)
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def enable(flag: bool = True):
+    """
+    Schaltet die Messung zur Laufzeit ein oder aus (bisherige Werte bleiben erhalten).
+    Gilt prozessweit – in der App daher nur per ENV `METRICS` beim Start, nicht pro Sitzung.
+    """
+    global _enabled
+    _enabled = bool(flag)
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+        _recent.clear()
+
+
+class _Histogram:
+    __slots__ = ("counts", "count", "sum", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)   # letzter Bucket: +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float | None:
+        """Schätzung aus den Buckets (lineare Interpolation wie `histogram_quantile`)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                # Obergrenze auf das beobachtete Maximum begrenzen (sonst p50 > max bei wenigen Werten)
+                upper = min(BUCKETS[i], self.max) if i < len(BUCKETS) else self.max
+                lower = min(BUCKETS[i - 1] if i else 0.0, upper)
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return self.max
+
+
+def _key(name: str, labels: dict) -> tuple:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def observe(stage: str, seconds: float, **labels):
+    """Trägt eine Dauer in das Histogramm der Stufe ein."""
+    if not _enabled:
+        return
+    key = _key("stage_seconds", dict(labels, stage=stage))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = _Histogram()
+        histogram.observe(seconds)
+
+
+def inc(name: str, value: float = 1, **labels):
+    """Erhöht einen Zähler, z. B. `inc("fetch_bytes", 5120, source="network")`."""
+    if not _enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+class _Span:
+    __slots__ = ("stage", "labels", "parent", "start", "_token")
+
+    def __init__(self, stage: str, labels: dict):
+        self.stage = stage
+        self.labels = labels
+
+    def __enter__(self):
+        self.parent = _current.get()
+        self._token = _current.set(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        _current.reset(self._token)
+        observe(self.stage, duration, **self.labels)
+        if exc_type is not None:
+            inc("stage_errors", stage=self.stage)
+        with _lock:
+            _recent.append({
+                "stage": self.stage,
+                "parent": self.parent.stage if self.parent else None,
+                "started_at": time.time() - duration,
+                "duration_s": round(duration, 6),
+                "error": exc_type.__name__ if exc_type else None,
+                **self.labels,
+            })
+        return False
+
+
+def span(stage: str, **labels):
+    """Kontextmanager, der die Dauer von `stage` misst (No-op, wenn ausgeschaltet)."""
+    if not _enabled:
+        return _NOOP
+    return _Span(stage, labels)
+
+
+def timed(stage: str):
+    """Dekorator-Variante von `span` für ganze Funktionen."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(stage, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def recent_spans(limit: int = 50) -> list:
+    """Die zuletzt beendeten Spans, neueste zuerst."""
+    with _lock:
+        spans = list(_recent)
+    return spans[::-1][:limit]
+
+
+def snapshot() -> dict:
+    """Aktueller Stand aller Messwerte als einfache Datenstruktur."""
+    with _lock:
+        stages = []
+        for (name, labels), h in sorted(_histograms.items()):
+            stages.append({
+                **dict(labels),
+                "count": h.count,
+                "sum_s": round(h.sum, 6),
+                "mean_s": round(h.sum / h.count, 6) if h.count else None,
+                "p50_s": round(h.quantile(0.5), 6),
+                "p95_s": round(h.quantile(0.95), 6),
+                "max_s": round(h.max, 6),
+                "buckets": dict(zip([*map(str, BUCKETS), "+Inf"], h.counts)),
+            })
+        counters = [{"name": name, **dict(labels), "value": value}
+                    for (name, labels), value in sorted(_counters.items())]
+    return {"enabled": _enabled, "stages": stages, "counters": counters}
+
+
+def to_json(indent: int = 2) -> str:
+    data = snapshot()
+    data["recent_spans"] = recent_spans(RECENT_SPANS)
+    return json.dumps(data, ensure_ascii=False, indent=indent)
+
+
+def format_value(value: float) -> str:
+    """Zählerwert ohne Genauigkeitsverlust (`:g` hätte nur 6 Stellen: 12345678 → 1.23457e+07)."""
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _format_labels(labels: tuple, extra: tuple = ()) -> str:
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ""
+    escape = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in pairs) + "}"
+
+
+def to_prometheus() -> str:
+    """Alle Messwerte im Prometheus-Textformat (Version 0.0.4)."""
+    lines = []
+    with _lock:
+        histograms = sorted(_histograms.items())
+        counters = sorted(_counters.items())
+    if histograms:
+        name = f"{PREFIX}_stage_seconds"
+        lines += [f"# HELP {name} Dauer der Pipeline-Stufen in Sekunden.", f"# TYPE {name} histogram"]
+        for (_, labels), h in histograms:
+            cumulative = 0
+            for bound, n in zip([*map(str, BUCKETS), "+Inf"], h.counts):
+                cumulative += n
+                lines.append(f"{name}_bucket{_format_labels(labels, (('le', bound),))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {h.sum:.6f}")
+            lines.append(f"{name}_count{_format_labels(labels)} {h.count}")
+    declared = set()
+    for (counter, labels), value in counters:
+        name = f"{PREFIX}_{counter}_total"
+        if name not in declared:
+            declared.add(name)
+            lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name}{_format_labels(labels)} {format_value(value)}")
+    return "\n".join(lines) + "\n"
@@ -1,7 +1,27 @@
 # Optionales Verhandlungs-Modul (derzeit nicht direkt in Benutzung, da LLM die Nachricht generiert)
 
+import asyncio
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import Iterable
+
+import config
 from logic import llm_client
+from logic.http_cache import CACHE_DIR
+from logic.prompt import count_tokens, get_compiler, shorten
 from data.models import AdInfo
+from data.prices import normalize_price
+
+def _build_prompt(ad_info: AdInfo, text_options: list, chosen_model: str = "openai") -> str:
+    # Gleicher Prompt wie in app.py (Bausteintabelle + Token-Budget für die Beschreibung)
+    backend = "openai" if chosen_model.lower() == "openai" else "ollama"
+    return get_compiler().compile_ad(ad_info, text_options, backend=backend).text
 
 def generate_message(ad_info: AdInfo, text_options: list, chosen_model="openai") -> str:
     """
@@ -10,9 +30,7 @@ def generate_message(ad_info: AdInfo, text_options: list, chosen_model="openai")
     Hier könnte man das LLM ansprechen oder eine regelbasierte Logik implementieren.
     (Derzeit als Platzhalter.)
     """
-    # Prompt aus AdInfo und Optionen zusammenbauen (nur Platzhalter-Implementierung)
-    prompt = f"Artikel: {ad_info.title} (Preis: {ad_info.price})\n"
-    prompt += "Ausgewählte Optionen:\n" + ", ".join(text_options)
+    prompt = _build_prompt(ad_info, text_options, chosen_model)
     # LLM je nach Modelltyp ansprechen
     if chosen_model.lower() == "openai":
         try:
@@ -24,3 +42,374 @@ def generate_message(ad_info: AdInfo, text_options: list, chosen_model="openai")
             return llm_client.ask_ollama(prompt)
         except Exception as e:
             raise
+
+
+@dataclass
+class MessageResult:
+    """Ergebnis eines Batch-Eintrags: entweder `message` oder `error` ist gesetzt."""
+    ad_info: AdInfo
+    text_options: list = field(default_factory=list)
+    message: str | None = None
+    error: str | None = None
+    attempts: int = 0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+async def agenerate_messages(items: Iterable[tuple], chosen_model: str = "openai", concurrency: int = 8,
+                             retries: int = 3, base_delay: float = 0.5, max_delay: float = 10.0) -> list:
+    """
+    Erzeugt Nachrichten für viele `(AdInfo, text_options)`-Paare gleichzeitig.
+
+    - Höchstens `concurrency` Anfragen laufen parallel; alle teilen sich einen
+      asynchronen Client (und damit dessen Verbindungspool).
+    - Fehlgeschlagene Anfragen werden bis zu `retries`-mal mit exponentiellem
+      Backoff und Jitter wiederholt.
+    - Fehler brechen den Batch nicht ab, sondern landen in `MessageResult.error`.
+
+    Die Ergebnisse haben dieselbe Reihenfolge wie `items`.
+    """
+    use_openai = chosen_model.lower() == "openai"
+    results = [MessageResult(ad_info, list(options)) for ad_info, options in items]
+    if not results:
+        return results
+    semaphore = asyncio.Semaphore(concurrency)
+    try:
+        client = llm_client.openai_async_client() if use_openai else llm_client.ollama_async_client()
+    except Exception as e:
+        # z. B. fehlender API-Key – betrifft alle Einträge gleichermaßen
+        for result in results:
+            result.error = str(e)
+        return results
+
+    async def _run(result: MessageResult):
+        prompt = _build_prompt(result.ad_info, result.text_options, chosen_model)
+        for attempt in range(retries + 1):
+            result.attempts = attempt + 1
+            try:
+                async with semaphore:
+                    if use_openai:
+                        result.message = await llm_client.ask_openai_async(prompt, client=client)
+                    else:
+                        result.message = await llm_client.ask_ollama_async(prompt, client=client)
+                result.error = None
+                return
+            except Exception as e:
+                result.error = str(e) or e.__class__.__name__
+                if attempt < retries:
+                    # Exponentieller Backoff mit "full jitter" (außerhalb des Semaphors)
+                    await asyncio.sleep(random.uniform(0, min(max_delay, base_delay * (2 ** attempt))))
+
+    try:
+        await asyncio.gather(*(_run(result) for result in results))
+    finally:
+        await client.close()
+    return results
+
+
+def generate_messages(items: Iterable[tuple], chosen_model: str = "openai", concurrency: int = 8,
+                      retries: int = 3) -> list:
+    """
+    Synchrone Variante von `agenerate_messages` (z. B. für Streamlit oder Skripte).
+    Die Laufzeit liegt bei ca. max. Latenz × Anzahl der Wellen (`len(items) / concurrency`)
+    statt bei der Summe aller Latenzen.
+    """
+    return asyncio.run(agenerate_messages(items, chosen_model, concurrency=concurrency, retries=retries))
+
+
+# --- Mehrrundige Verhandlung -------------------------------------------------
+
+DEFAULT_SESSION_DIR = os.path.join(CACHE_DIR, "negotiations")
+DEFAULT_HISTORY_BUDGET = 500     # Tokens für Zusammenfassung + wörtliche Nachrichten im Prompt
+DEFAULT_SUMMARY_BUDGET = 150     # Tokens für die laufende Zusammenfassung
+DEFAULT_KEEP_RECENT = 4          # so viele letzte Nachrichten bleiben immer wörtlich erhalten
+DEFAULT_MAX_CONTEXT = 4096       # Ollama-Context (Token-IDs) ab dieser Länge neu aufbauen
+SESSION_DESCRIPTION_BUDGET = 120
+SUMMARY_TURN_BUDGET = 30         # Tokens pro verdichteter Nachricht
+
+_ROLE_LABELS = {"buyer": "Du", "seller": "Verkäufer"}
+_AMOUNT = re.compile(r"\d[\d.]*(?:,\d{1,2})?\s*(?:€|EUR\b|Euro\b)", re.IGNORECASE)
+
+REPLY_INSTRUCTION = (
+    "Schreibe die nächste Nachricht des Käufers auf Deutsch: freundlich, kurz und "
+    "passend zur letzten Nachricht des Verkäufers. Nur den Nachrichtentext ausgeben."
+)
+
+
+@dataclass(slots=True)
+class Turn:
+    """Eine Nachricht der Verhandlung (`role` = "buyer" oder "seller")."""
+    role: str
+    text: str
+    tokens: int = 0
+    at: float = field(default_factory=time.time)
+    prompt_tokens: int = 0    # Größe des gesendeten Prompts (nur bei eigenen Nachrichten)
+
+
+def extractive_summary(summary: str, turns: list, budget: int, counter) -> str:
+    """
+    Fasst `summary` und die zu verdichtenden `turns` ohne LLM-Aufruf zusammen:
+    Vorn steht eine Zeile mit den zuletzt genannten Beträgen (wer hat welchen
+    Preis genannt), danach eine Zeile pro Nachricht, jeweils mit `shorten`
+    gekürzt (Sätze mit Preis, Zustand, Abholung ... haben Vorrang). Reicht das
+    Budget nicht, fallen die ältesten Zeilen weg – die Beträge bleiben erhalten.
+    """
+    lines = summary.split("\n") if summary else []
+    mentioned = []
+    if lines and lines[0].startswith("Genannte Beträge: "):
+        mentioned = lines.pop(0)[len("Genannte Beträge: "):].split("; ")
+    for turn in turns:
+        label = _ROLE_LABELS.get(turn.role, turn.role)
+        for match in _AMOUNT.findall(turn.text):
+            amount = normalize_price(match).amount
+            if amount is not None:
+                mentioned.append(f"{label} {amount:g} €")
+        text, _ = shorten(" ".join(turn.text.split()), SUMMARY_TURN_BUDGET, counter)
+        line = f"{label}: {text}"
+        if line not in lines:
+            lines.append(line)
+    head = f"Genannte Beträge: {'; '.join(mentioned[-6:])}" if mentioned else ""
+    result = "\n".join([head] + lines if head else lines)
+    while lines and counter(result) > budget:
+        lines.pop(0)
+        result = "\n".join([head] + lines if head else lines)
+    return result
+
+
+def llm_summarizer(backend: str = "ollama", model: str = None):
+    """Zusammenfassung per LLM (kostet einen zusätzlichen Aufruf pro Verdichtung)."""
+    def summarize(summary: str, turns: list, budget: int, counter) -> str:
+        history = "\n".join(f"{_ROLE_LABELS.get(t.role, t.role)}: {t.text}" for t in turns)
+        prompt = (f"Bisherige Zusammenfassung:\n{summary or '–'}\n\nNeue Nachrichten:\n{history}\n\n"
+                  f"Fasse den Verhandlungsstand in höchstens {int(budget * 0.6)} Wörtern zusammen. "
+                  "Nenne alle genannten Preise, Zusagen und offenen Fragen.")
+        if backend == "openai":
+            text = llm_client.ask_openai(prompt, model=model)
+        else:
+            text = llm_client.ask_ollama(prompt, model=model or config.OLLAMA_MODEL)
+        return shorten(text, budget, counter)[0]
+    return summarize
+
+
+class NegotiationSession:
+    """
+    Mehrrundige Verhandlung zu einer Anzeige mit begrenztem Prompt.
+
+    Der Prompt jeder Runde besteht aus einem festen Kopf (Anzeige mit gekürzter
+    Beschreibung, gewählte Bausteine), einer laufenden Zusammenfassung älterer
+    Nachrichten und den letzten Nachrichten im Wortlaut. Überschreiten
+    Zusammenfassung + Nachrichten `history_budget` Tokens, werden die ältesten
+    Nachrichten (bis auf `keep_recent`) in die Zusammenfassung verdichtet – die
+    Promptgröße bleibt so über beliebig viele Runden etwa konstant.
+
+    Bei Ollama wird zusätzlich der `context` der letzten Antwort wiederverwendet:
+    Dann geht nur die neue Verkäufer-Nachricht an den Server. Wird der Context
+    länger als `max_context`, beginnt die nächste Runde wieder mit dem
+    kompakten Prompt.
+
+    Sitzungen liegen als JSON in `data/cache/negotiations/` (`save`/`load`).
+    """
+
+    def __init__(self, ad_info: AdInfo, text_options=(), backend: str = "ollama", model: str = None,
+                 history_budget: int = DEFAULT_HISTORY_BUDGET, summary_budget: int = DEFAULT_SUMMARY_BUDGET,
+                 keep_recent: int = DEFAULT_KEEP_RECENT, max_context: int = DEFAULT_MAX_CONTEXT,
+                 use_context: bool = True, summarizer=extractive_summary, session_id: str = None,
+                 directory: str = DEFAULT_SESSION_DIR):
+        self.ad_info = ad_info
+        self.text_options = list(text_options)
+        self.backend = "openai" if backend.lower() == "openai" else "ollama"
+        self.model = model or (config.OPENAI_MODEL if self.backend == "openai" else config.OLLAMA_MODEL)
+        self.history_budget = history_budget
+        self.summary_budget = summary_budget
+        self.keep_recent = keep_recent
+        self.max_context = max_context
+        self.use_context = use_context and self.backend == "ollama"
+        self.summarizer = summarizer
+        self.session_id = session_id or uuid.uuid4().hex[:12]
+        self.directory = directory
+        self.turns = []           # alle Nachrichten (für Anzeige und Export)
+        self.compacted = 0        # so viele Nachrichten stecken bereits in `summary`
+        self.summary = ""
+        self.context = None       # Ollama-Context der letzten Antwort
+        self.created_at = time.time()
+        self._header = None
+        self._lock = threading.Lock()
+
+    # --- Prompt -------------------------------------------------------------
+    def _count(self, text: str) -> int:
+        return count_tokens(text, self.backend, self.model)
+
+    @property
+    def header(self) -> str:
+        """Fester Prompt-Kopf: Anzeige (Beschreibung gekürzt) und gewählte Bausteine."""
+        if self._header is None:
+            compiled = get_compiler().compile_ad(self.ad_info, self.text_options, backend=self.backend,
+                                                 model=self.model, description_budget=SESSION_DESCRIPTION_BUDGET)
+            # Schlussanweisung des Einzelnachricht-Prompts durch die der Verhandlung ersetzen
+            lines = compiled.text.split("\n")[:-1]
+            self._header = "\n".join(["Du verhandelst als Käufer über diese Kleinanzeige."] + lines)
+        return self._header
+
+    @property
+    def recent(self) -> list:
+        return self.turns[self.compacted:]
+
+    def _history_tokens(self) -> int:
+        return self._count(self.summary) + sum(turn.tokens for turn in self.recent)
+
+    def build_prompt(self) -> str:
+        """Vollständiger Prompt für die nächste Käufer-Nachricht (ohne Ollama-Context)."""
+        parts = [self.header]
+        if self.summary:
+            parts.append(f"**Bisheriger Verlauf (zusammengefasst):**\n{self.summary}")
+        if self.recent:
+            parts.append("**Letzte Nachrichten:**")
+            parts.extend(f"{_ROLE_LABELS[turn.role]}: {turn.text}" for turn in self.recent)
+        parts.append(REPLY_INSTRUCTION if self.turns else
+                     "Schreibe die erste Nachricht an den Verkäufer auf Deutsch, freundlich und "
+                     "mit allen oben genannten Punkten. Nur den Nachrichtentext ausgeben.")
+        return "\n".join(parts)
+
+    def compact(self) -> bool:
+        """Verdichtet die ältesten Nachrichten, solange das Budget überschritten ist."""
+        changed = False
+        while self._history_tokens() > self.history_budget and len(self.recent) > self.keep_recent:
+            # Mindestens die Hälfte der überzähligen Nachrichten auf einmal verdichten,
+            # damit nicht jede Runde erneut zusammengefasst werden muss
+            surplus = len(self.recent) - self.keep_recent
+            batch = self.recent[:max(1, (surplus + 1) // 2)]
+            self.summary = self.summarizer(self.summary, batch, self.summary_budget, self._count)
+            self.compacted += len(batch)
+            changed = True
+        return changed
+
+    # --- Runden -------------------------------------------------------------
+    def _add(self, role: str, text: str, prompt_tokens: int = 0) -> Turn:
+        turn = Turn(role, text.strip(), self._count(text), prompt_tokens=prompt_tokens)
+        self.turns.append(turn)
+        return turn
+
+    def _ask(self, seller_text: str | None, stats: "llm_client.StreamStats" = None,
+             regenerate: bool = False) -> tuple:
+        if self.use_context and self.context and seller_text is not None:
+            # Gespräch auf dem Server fortsetzen: nur die neue Nachricht senden
+            prompt = f"Verkäufer: {seller_text}\n{REPLY_INSTRUCTION}"
+        else:
+            prompt = self.build_prompt()
+        if self.backend == "openai":
+            return llm_client.ask_openai(prompt, model=self.model, regenerate=regenerate), prompt
+        if not self.use_context:
+            return llm_client.ask_ollama(prompt, model=self.model, regenerate=regenerate, stats=stats), prompt
+        text, context = llm_client.generate_ollama(prompt, model=self.model, context=self.context, stats=stats)
+        # Ohne Context vom Server (oder zu lang) wird die nächste Runde wieder voll aufgebaut
+        self.context = context if context and len(context) <= self.max_context else None
+        return text, prompt
+
+    def opening_message(self, stats: "llm_client.StreamStats" = None, regenerate: bool = False) -> str:
+        """Erste Nachricht an den Verkäufer (Bausteine aus `text_options`)."""
+        with self._lock:
+            text, prompt = self._ask(None, stats, regenerate)
+            self._add("buyer", text, self._count(prompt))
+            self.save()
+            return self.turns[-1].text
+
+    def reply(self, seller_text: str, stats: "llm_client.StreamStats" = None, regenerate: bool = False) -> str:
+        """
+        Nimmt die Antwort des Verkäufers auf und erzeugt die nächste Käufer-Nachricht.
+        Ohne Ollama-Context gilt der LLM-Cache wie bei Einzelnachrichten (`regenerate` umgeht ihn).
+        Schlägt der LLM-Aufruf fehl, bleibt die Sitzung unverändert (die Verkäufer-
+        Nachricht wird nicht übernommen und nicht verdichtet) – ein erneuter
+        Aufruf mit derselben Nachricht zeichnet sie nur einmal auf.
+        """
+        with self._lock:
+            checkpoint = (len(self.turns), self.compacted, self.summary, self.context)
+            self._add("seller", seller_text)
+            try:
+                self.compact()
+                text, prompt = self._ask(seller_text.strip(), stats, regenerate)
+            except BaseException:
+                del self.turns[checkpoint[0]:]
+                self.compacted, self.summary, self.context = checkpoint[1:]
+                raise
+            self._add("buyer", text, self._count(prompt))
+            self.compact()
+            self.save()
+            return self.turns[-1].text
+
+    def add_message(self, role: str, text: str):
+        """Nachricht ohne LLM-Aufruf übernehmen (z. B. selbst geschrieben)."""
+        with self._lock:
+            self._add(role, text)
+            self.context = None    # Server-Context kennt die Nachricht nicht
+            self.compact()
+            self.save()
+
+    # --- Persistenz ---------------------------------------------------------
+    @property
+    def path(self) -> str:
+        return os.path.join(self.directory, f"{self.session_id}.json")
+
+    def to_dict(self) -> dict:
+        return {
+            "session_id": self.session_id,
+            "created_at": self.created_at,
+            "ad_info": self.ad_info.to_dict(),
+            "text_options": self.text_options,
+            "backend": self.backend,
+            "model": self.model,
+            "budgets": {"history": self.history_budget, "summary": self.summary_budget,
+                        "keep_recent": self.keep_recent, "max_context": self.max_context},
+            "use_context": self.use_context,
+            "summary": self.summary,
+            "compacted": self.compacted,
+            "context": self.context,
+            "turns": [asdict(turn) for turn in self.turns],
+        }
+
+    def save(self):
+        """Schreibt die Sitzung atomar (temporäre Datei + Umbenennen)."""
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    @classmethod
+    def load(cls, session_id: str, directory: str = DEFAULT_SESSION_DIR, **kwargs) -> "NegotiationSession":
+        with open(os.path.join(directory, f"{session_id}.json"), encoding="utf-8") as f:
+            data = json.load(f)
+        budgets = data.get("budgets", {})
+        session = cls(AdInfo(**data["ad_info"]), data.get("text_options", ()), data["backend"], data["model"],
+                      history_budget=budgets.get("history", DEFAULT_HISTORY_BUDGET),
+                      summary_budget=budgets.get("summary", DEFAULT_SUMMARY_BUDGET),
+                      keep_recent=budgets.get("keep_recent", DEFAULT_KEEP_RECENT),
+                      max_context=budgets.get("max_context", DEFAULT_MAX_CONTEXT),
+                      use_context=data.get("use_context", True), session_id=data["session_id"],
+                      directory=directory, **kwargs)
+        session.created_at = data.get("created_at", session.created_at)
+        session.summary = data.get("summary", "")
+        session.compacted = data.get("compacted", 0)
+        session.context = data.get("context")
+        session.turns = [Turn(**turn) for turn in data.get("turns", [])]
+        return session
+
+
+def list_sessions(directory: str = DEFAULT_SESSION_DIR) -> list:
+    """Gespeicherte Sitzungen (neueste zuerst) als `(session_id, titel, nachrichten, geändert)`."""
+    if not os.path.isdir(directory):
+        return []
+    sessions = []
+    for name in os.listdir(directory):
+        if not name.endswith(".json"):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        sessions.append((data["session_id"], data["ad_info"].get("title", ""), len(data.get("turns", [])),
+                         os.path.getmtime(path)))
+    return sorted(sessions, key=lambda s: s[3], reverse=True)
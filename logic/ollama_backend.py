@@ -0,0 +1,139 @@
+"""
+Verwaltetes Ollama-Backend: Modell vorladen und im Speicher halten.
+
+Ollama lädt ein Modell erst bei der ersten Anfrage in den Speicher und
+entlädt es nach `keep_alive` ohne weitere Anfrage wieder (Ollama-Standard:
+5 Minuten). Die erste Anfrage danach wartet die komplette Ladezeit ab –
+bei lokalen 3B-Modellen mehrere Sekunden vor dem ersten Token.
+
+Deshalb
+- wird `config.OLLAMA_MODEL` im Hintergrund vorgeladen, sobald in der App
+  Ollama ausgewählt ist (mit `OLLAMA_PRELOAD=1` schon beim Start; Anfrage an
+  `/api/generate` ohne Prompt, so wie Ollama es dafür vorsieht),
+- schickt `logic.llm_client` mit jeder Anfrage `keep_alive=config.OLLAMA_KEEP_ALIVE`
+  mit, sodass das Fenster bei Nutzung immer neu beginnt,
+- werden Lade-, Prompt- und Generierungszeiten aus den Antwort-Metadaten in
+  `StreamStats` übernommen (`load_s`, `prompt_eval_s`, `eval_s`).
+
+Alle Aufrufe nutzen den gepoolten Client aus `llm_client.get_ollama_client`.
+"""
+import logging
+import threading
+import time
+
+import config
+from logic import llm_client, metrics
+
+
+class OllamaBackend:
+    """
+    Zustand eines Modells auf dem Ollama-Server aus Sicht der App:
+    "idle" (noch nicht vorgeladen), "loading", "ready" oder "error".
+    """
+
+    def __init__(self, model: str = None, keep_alive=None):
+        self.model = model or config.OLLAMA_MODEL
+        self.keep_alive = config.OLLAMA_KEEP_ALIVE if keep_alive is None else keep_alive
+        self.state = "idle"
+        self.error = None
+        self.load_s = None        # vom Server gemeldete Ladezeit des letzten Vorladens
+        self.preload_s = None     # Dauer des Vorladens aus Sicht der App (inkl. Verbindung)
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def client(self):
+        return llm_client.get_ollama_client()
+
+    def preload(self, background: bool = True) -> "OllamaBackend":
+        """
+        Lädt das Modell (falls nicht schon geschehen) und hält es `keep_alive`
+        lang im Speicher. Mit `background=True` kehrt der Aufruf sofort zurück.
+        Ein laufendes Vorladen wird nicht doppelt gestartet.
+        """
+        with self._lock:
+            if self.state == "loading":
+                return self
+            self.state, self.error = "loading", None
+            self._ready.clear()
+            if background:
+                self._thread = threading.Thread(target=self._load, name="ollama-preload", daemon=True)
+                self._thread.start()
+                return self
+        self._load()
+        return self
+
+    def _load(self):
+        start = time.perf_counter()
+        try:
+            response = self.client.generate(model=self.model, prompt="", keep_alive=self.keep_alive)
+        except Exception as e:
+            self.state, self.error = "error", str(e)
+            logging.warning(f"Ollama-Modell {self.model} konnte nicht vorgeladen werden: {e}")
+        else:
+            self.preload_s = time.perf_counter() - start
+            load = response.get('load_duration')
+            self.load_s = load / 1e9 if load is not None else None
+            self.state = "ready"
+            metrics.observe("llm_preload", self.preload_s, backend="ollama")
+            logging.info(f"Ollama-Modell {self.model} geladen in {self.preload_s:.2f}s "
+                         f"(keep_alive {self.keep_alive})")
+        finally:
+            self._ready.set()
+
+    def wait(self, timeout: float = None) -> bool:
+        """Wartet auf das Ende des Vorladens; True, wenn das Modell bereit ist."""
+        if self.state == "idle":
+            return False
+        self._ready.wait(timeout)
+        return self.state == "ready"
+
+    def loaded_models(self) -> dict:
+        """Aktuell geladene Modelle des Servers: Name -> Ablaufzeitpunkt (`/api/ps`)."""
+        return {m.model: m.expires_at for m in self.client.ps().models}
+
+    def is_resident(self) -> bool:
+        """True, wenn das Modell laut Server gerade im Speicher liegt."""
+        try:
+            names = self.loaded_models()
+        except Exception:
+            return False
+        return any(name == self.model or name.split(":")[0] == self.model for name in names)
+
+    def unload(self):
+        """Entlädt das Modell sofort (`keep_alive=0`)."""
+        self.client.generate(model=self.model, prompt="", keep_alive=0)
+        with self._lock:
+            self.state = "idle"
+
+    def status(self) -> dict:
+        return {"model": self.model, "state": self.state, "keep_alive": self.keep_alive,
+                "load_s": self.load_s, "preload_s": self.preload_s, "error": self.error}
+
+
+_default_backend = None
+_default_lock = threading.Lock()
+
+
+def get_default_backend() -> OllamaBackend:
+    """Prozessweites Backend für `config.OLLAMA_MODEL`."""
+    global _default_backend
+    if _default_backend is None:
+        with _default_lock:
+            if _default_backend is None:
+                _default_backend = OllamaBackend()
+    return _default_backend
+
+
+def preload_default_model(force: bool = False) -> OllamaBackend | None:
+    """
+    Startet das Vorladen von `config.OLLAMA_MODEL`, wenn `force` gesetzt
+    (Ollama ausgewählt) oder `OLLAMA_PRELOAD` eingeschaltet ist.
+    """
+    if not (force or config.OLLAMA_PRELOAD):
+        return None
+    backend = get_default_backend()
+    if backend.state == "idle":
+        backend.preload()
+    return backend
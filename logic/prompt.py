@@ -0,0 +1,231 @@
+"""
+Prompt-Compiler für die Verhandlungsnachricht.
+
+Die Textbausteine stehen in einer deklarativen Tabelle (`TEXT_MODULES`); der
+Compiler baut daraus einmalig ein Lookup und setzt pro Anfrage nur noch die
+ausgewählten Bausteine in Tabellenreihenfolge zusammen. Die Beschreibung der
+Anzeige wird auf ein Token-Budget gekürzt: Es bleiben der erste Satz und
+Sätze mit kaufrelevanten Stichworten (Zustand, Mängel, Zubehör, ...) in
+Originalreihenfolge erhalten.
+
+Tokens werden mit `tiktoken` gezählt (OpenAI, falls installiert), sonst mit
+einer Schätzung über die Zeichenzahl (Ollama-Modelle haben eigene Tokenizer,
+die hier nicht geladen werden).
+"""
+import logging
+import math
+import os
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+
+from logic import metrics
+
+DEFAULT_DESCRIPTION_BUDGET = int(os.getenv("PROMPT_DESCRIPTION_TOKENS", "300"))
+CHARS_PER_TOKEN = 3.5      # Schätzwert für deutschen Text ohne Tokenizer
+ELLIPSIS = " …"
+
+CLOSING_INSTRUCTION = (
+    "Bitte schreibe eine freundliche, höfliche Nachricht auf Deutsch an den Anbieter, "
+    "in der alle oben genannten Punkte eingebunden werden."
+)
+
+
+@dataclass(frozen=True, slots=True)
+class TextModule:
+    """Ein Textbaustein: Anzeigename, Satz für den Prompt, benötigter Kontextwert."""
+    name: str
+    template: str
+    requires: str | None = None    # Baustein entfällt, wenn dieser Wert fehlt
+
+
+TEXT_MODULES = (
+    TextModule("Interesse bekunden", "Du willst dein Interesse am Artikel bekunden."),
+    TextModule("Preisvorschlag machen", "Du möchtest einen Preisvorschlag von {offered_price} Euro unterbreiten.",
+               requires="offered_price"),
+    TextModule("Preis verhandelbar erfragen", "Du fragst, ob der Preis noch verhandelbar ist."),
+    TextModule("Nach Zustand fragen", "Du möchtest mehr über den Zustand des Artikels erfahren."),
+    TextModule("Verfügbarkeit prüfen", "Du fragst, ob der Artikel noch verfügbar ist."),
+    TextModule("Versand/Lieferung anfragen", "Du fragst, ob Versand oder Lieferung möglich ist."),
+    TextModule("Garantie erfragen", "Du fragst nach eventuell bestehender Garantie."),
+    TextModule("Abholungstermin vorschlagen", "Du möchtest an folgenden Terminen abholen: {slots}.",
+               requires="slots"),
+    TextModule("Besichtigung erbitten", "Du möchtest den Artikel vor dem Kauf besichtigen."),
+    TextModule("Zubehör/Umfang erfragen", "Du fragst, ob sämtliches Zubehör (z.B. Kabel, Verpackung) dabei ist."),
+    TextModule("Weitere Bilder anfragen", "Du möchtest weitere Bilder vom Artikel sehen."),
+    TextModule("Grund des Verkaufs erfragen", "Du erkundigst dich nach dem Grund des Verkaufs."),
+    TextModule("Zahlungsmethode klären", "Du möchtest wissen, welche Zahlungsmethode bevorzugt wird."),
+    TextModule("Reservierung erbitten",
+               "Du fragst, ob der Artikel bis zu einem bestimmten Datum reserviert werden kann."),
+    TextModule("Bundle-Angebot vorschlagen", "Du fragst, ob es einen Rabatt gibt, falls du mehrere Artikel kaufst."),
+)
+MODULE_NAMES = [module.name for module in TEXT_MODULES]
+
+# Sätze mit diesen Stichworten bleiben beim Kürzen bevorzugt erhalten
+# (Wortstämme auch in Komposita wie "unbeschädigt"/"Neupreis"; kurze Wörter nur als
+# ganzes Wort, damit "neu" nicht in "Neuigkeit" und "alter" nicht in "Halter" trifft)
+_KEY_TERMS = re.compile(
+    r"zustand|defekt|mängel|mangel|kratzer|beschädig|funktion|zubehör|rechnung|garantie|original|"
+    r"neuwertig|jahr|größe|maße|abholung|versand|preis|festpreis|tausch"
+    r"|\b(?:neu(?:e[mnrs]?)?|alter|vb)\b",
+    re.IGNORECASE,
+)
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+@lru_cache(maxsize=8)
+def _tiktoken_encoding(model: str):
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # Die BPE-Dateien werden beim ersten Aufruf heruntergeladen – offline bzw. hinter
+        # einem Proxy schlägt das fehl; dann wie bei fehlendem tiktoken schätzen
+        logging.warning(f"tiktoken-Kodierung für {model} nicht verfügbar ({e}), Tokens werden geschätzt")
+        return None
+
+
+def count_tokens(text: str, backend: str = "openai", model: str = "gpt-3.5-turbo") -> int:
+    """Tokenanzahl von `text` für das Backend ("openai" exakt per tiktoken, sonst geschätzt)."""
+    if not text:
+        return 0
+    if backend == "openai":
+        encoding = _tiktoken_encoding(model or "gpt-3.5-turbo")
+        if encoding is not None:
+            return len(encoding.encode(text))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _cut_to_budget(sentence: str, budget: int, counter) -> str:
+    # Einzelner, zu langer Satz: an Wortgrenze per Binärsuche kürzen
+    words = sentence.split(" ")
+    lo, hi = 0, len(words)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if counter(" ".join(words[:mid]) + ELLIPSIS) <= budget:
+            lo = mid
+        else:
+            hi = mid - 1
+    return " ".join(words[:lo]) + ELLIPSIS if lo else ""
+
+
+def shorten(text: str, budget: int, counter=count_tokens) -> tuple:
+    """
+    Kürzt `text` auf höchstens `budget` Tokens. Rückgabe `(text, gekürzt?)`.
+
+    Der erste Satz bleibt immer erhalten (ggf. selbst gekürzt); danach werden
+    Sätze mit Stichworten aus `_KEY_TERMS` vor den übrigen aufgenommen,
+    jeweils solange das Budget reicht. Die Reihenfolge im Ergebnis entspricht
+    dem Original; Lücken werden mit "…" markiert.
+    """
+    text = (text or "").strip()
+    if counter(text) <= budget:
+        return text, False
+    sentences = [s.strip() for s in _SENTENCE_END.split(text) if s.strip()]
+    if not sentences:
+        return "", True
+    costs = [counter(s) for s in sentences]
+    key = [i for i in range(1, len(sentences)) if _KEY_TERMS.search(sentences[i])]
+    rest = [i for i in range(1, len(sentences)) if not _KEY_TERMS.search(sentences[i])]
+    chosen = []
+    used = 0
+    for i in [0] + key + rest:
+        if used + costs[i] + 1 <= budget:
+            chosen.append(i)
+            used += costs[i] + 1
+    if not chosen:
+        return _cut_to_budget(sentences[0], budget, counter), True
+    result = _join_sentences(sentences, chosen)
+    # Die "…"-Marker kosten zusätzlich Tokens – notfalls zuletzt gewählte Sätze streichen
+    while counter(result) > budget and len(chosen) > 1:
+        chosen.pop()
+        result = _join_sentences(sentences, chosen)
+    return result, True
+
+
+def _join_sentences(sentences: list, chosen: list) -> str:
+    chosen = sorted(chosen)
+    parts = []
+    for n, i in enumerate(chosen):
+        if n and chosen[n - 1] != i - 1:
+            parts.append("…")
+        parts.append(sentences[i])
+    if chosen[-1] < len(sentences) - 1:
+        parts.append("…")
+    return " ".join(parts)
+
+
+@dataclass(slots=True)
+class CompiledPrompt:
+    """Fertiger Prompt samt Token-Zählung (vor dem Senden)."""
+    text: str
+    tokens: int
+    description_tokens: int = 0
+    description_truncated: bool = False
+    backend: str = "openai"
+
+
+class PromptCompiler:
+    """
+    Baut Prompts aus Anzeige und ausgewählten Textbausteinen.
+    Unbekannte Bausteine (freie Texte) werden unverändert angehängt.
+    """
+
+    def __init__(self, modules=TEXT_MODULES, description_budget: int = DEFAULT_DESCRIPTION_BUDGET):
+        self.modules = tuple(modules)
+        self.description_budget = description_budget
+        self._order = {module.name: i for i, module in enumerate(self.modules)}
+
+    @metrics.timed("prompt")
+    def compile(self, title: str = "", description: str = "", price: str = "", selected=(),
+                offered_price=None, slots=(), backend: str = "openai", model: str = None,
+                description_budget: int = None) -> CompiledPrompt:
+        budget = self.description_budget if description_budget is None else description_budget
+        counter = lambda text: count_tokens(text, backend, model)
+        description, truncated = shorten(description, budget, counter) if description else ("", False)
+
+        parts = []
+        if title:
+            parts.append(f"**Angebotstitel:** {title}")
+        if description:
+            parts.append(f"**Angebotsbeschreibung:** {description}")
+        if price:
+            parts.append(f"**Angebotspreis laut Anzeige:** {price}")
+
+        context = {
+            "offered_price": int(offered_price) if offered_price else None,
+            "slots": ", ".join(slots) if slots else None,
+        }
+        known = sorted((self._order[name] for name in set(selected) if name in self._order))
+        for i in known:
+            module = self.modules[i]
+            if module.requires and not context.get(module.requires):
+                continue
+            parts.append(module.template.format(**context))
+        parts.extend(option for option in selected if option not in self._order)
+        parts.append(CLOSING_INSTRUCTION)
+
+        text = "\n".join(parts)
+        # Verbrauchte Prompt-Tokens zählt `llm_client` erst beim tatsächlichen Senden
+        return CompiledPrompt(text, counter(text), counter(description), truncated, backend)
+
+    def compile_ad(self, ad_info, selected=(), **kwargs) -> CompiledPrompt:
+        """Wie `compile`, mit Titel/Beschreibung/Preis aus einem `AdInfo`."""
+        return self.compile(ad_info.title, ad_info.description, ad_info.price, selected, **kwargs)
+
+
+_default_compiler = None
+
+
+def get_compiler() -> PromptCompiler:
+    """Einmalig gebauter Standard-Compiler (Tabelle `TEXT_MODULES`)."""
+    global _default_compiler
+    if _default_compiler is None:
+        _default_compiler = PromptCompiler()
+    return _default_compiler
@@ -0,0 +1,79 @@
+"""
+Parser für Kleinanzeigen-Suchergebnisseiten.
+
+Eine Suchseite enthält bis zu 25 Ergebniskarten (`<article class="aditem">`)
+mit Titel, Preis, Ort, Vorschaubild und Link zur Detailseite. Daraus werden
+`AdInfo`-Objekte ohne Beschreibung und Kontaktdaten – die Detailseite wird
+nur bei Bedarf abgerufen (`logic.parser.parse_ad`). Für 25 Anzeigen genügt
+so ein Abruf statt 25.
+
+Das HTML wird wie bei den Detailseiten in einem Durchlauf verarbeitet
+(`logic.extractor.extract_search_results`, gleiche Backends).
+"""
+from typing import Iterator
+from urllib.parse import urljoin
+
+import requests
+
+from data.models import AdInfo
+from logic import metrics
+from logic.extractor import extract_search_results
+from logic.fetch import HostRateLimiter, fetch_cached
+
+BASE_URL = "https://www.kleinanzeigen.de/"
+MAX_PAGES = 50               # Kleinanzeigen liefert höchstens 50 Ergebnisseiten
+
+
+def _to_ads(cards: list, base_url: str) -> list:
+    return [AdInfo(title=card["title"], price=card["price"], location=card["location"],
+                   image_urls=[urljoin(base_url, card["image"])] if card["image"] else [],
+                   url=urljoin(base_url, card["href"]))
+            for card in cards]
+
+
+@metrics.timed("parse_search")
+def parse_search_results(html, base_url: str = BASE_URL, backend: str = None) -> tuple:
+    """Liefert `(anzeigen, url_der_nächsten_seite)` für eine Suchseite (URLs absolut)."""
+    result = extract_search_results(html, backend=backend)
+    next_url = urljoin(base_url, result["next_url"]) if result["next_url"] else None
+    return _to_ads(result["cards"], base_url), next_url
+
+
+def parse_search_page(html, base_url: str = BASE_URL, backend: str = None) -> list:
+    """Alle Ergebniskarten einer Suchseite als `AdInfo` (URLs absolut, Bild = Vorschaubild)."""
+    return parse_search_results(html, base_url, backend)[0]
+
+
+def next_page_url(html, base_url: str = BASE_URL, backend: str = None) -> str | None:
+    """Link auf die nächste Ergebnisseite (oder None auf der letzten Seite)."""
+    return parse_search_results(html, base_url, backend)[1]
+
+
+def iter_search_results(url: str, max_pages: int = MAX_PAGES, limiter: HostRateLimiter = None,
+                        backend: str = None) -> Iterator[AdInfo]:
+    """
+    Liefert die Anzeigen einer Suche seitenweise als Generator.
+
+    Die nächste Ergebnisseite wird erst abgerufen, wenn alle Anzeigen der
+    vorigen verbraucht sind – wer nach 30 Treffern aufhört, löst nur zwei
+    Abrufe aus. Abrufe laufen über HTTP-Cache, gemeinsame Session und
+    Rate-Limit (`logic.fetch`). Eine Anzeige, die beim Blättern auf zwei
+    Seiten erscheint (neue Anzeigen verschieben die Liste), wird nur einmal
+    geliefert. Ein Abruffehler beendet den Generator mit einer Meldung.
+    """
+    limiter = limiter or HostRateLimiter(2.0)
+    seen_pages, seen_ads = set(), set()
+    pages = 0
+    while url and url not in seen_pages and pages < max_pages:
+        seen_pages.add(url)
+        pages += 1
+        try:
+            html = fetch_cached(url, limiter=limiter)
+        except requests.exceptions.RequestException as e:
+            print(f"Fehler beim Abrufen der Suchseite {url}: {e}")
+            return
+        ads, url = parse_search_results(html, url, backend)
+        for ad in ads:
+            if ad.url not in seen_ads:
+                seen_ads.add(ad.url)
+                yield ad
@@ -0,0 +1,310 @@
+"""
+Lokaler Anzeigen-Speicher (SQLite mit FTS5-Volltextindex).
+
+Jede geparste Anzeige wird als Zeile in `listings` abgelegt. Duplikate werden
+über die Anzeigen-ID aus der URL erkannt, ersatzweise über einen Hash des
+Inhalts (Titel, Beschreibung, Ort) – so wird auch eine Anzeige ohne ID mit
+gleichem Text wiedererkannt. Der Hash verbindet nur, wenn höchstens eine
+Seite eine ID hat: zwei Anzeigen mit verschiedenen IDs bleiben getrennt, und
+leerer Inhalt wird nie über den Hash zugeordnet. Ändert sich der Preis, landet der
+alte Wert in `price_history`.
+
+Titel und Beschreibung sind zusätzlich in einer FTS5-Tabelle indexiert
+(external content, per Trigger synchron gehalten). `similar()` sucht darüber
+per BM25-Ranking und bleibt damit auch bei Millionen Zeilen schnell.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Iterable, Iterator
+
+from data.models import AdInfo
+from data.prices import normalize_price
+from logic.http_cache import CACHE_DIR, normalize_url
+from logic.market import tokenize
+
+DEFAULT_STORE_PATH = os.path.join(CACHE_DIR, "listings.sqlite3")
+DEFAULT_BATCH_SIZE = 500
+
+# Anzeigen-ID im Pfad, z. B. /s-anzeige/fahrrad-28-zoll/2734567890-217-3331
+_AD_ID_RE = re.compile(r"/s-anzeige/(?:[^/]+/)?(\d{6,})")
+_WHITESPACE = re.compile(r"\s+")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS listings (
+    id INTEGER PRIMARY KEY,
+    ad_id TEXT UNIQUE,
+    url TEXT,
+    title TEXT,
+    price TEXT,
+    price_amount REAL,
+    negotiable INTEGER,
+    location TEXT,
+    description TEXT,
+    image_urls TEXT,
+    contact_info TEXT,
+    content_hash TEXT,
+    first_seen REAL,
+    last_seen REAL
+);
+CREATE INDEX IF NOT EXISTS listings_hash ON listings(content_hash);
+CREATE INDEX IF NOT EXISTS listings_url ON listings(url);
+CREATE TABLE IF NOT EXISTS price_history (
+    listing_id INTEGER REFERENCES listings(id) ON DELETE CASCADE,
+    price TEXT,
+    price_amount REAL,
+    seen_at REAL
+);
+CREATE INDEX IF NOT EXISTS price_history_listing ON price_history(listing_id, seen_at);
+CREATE VIRTUAL TABLE IF NOT EXISTS listings_fts USING fts5(
+    title, description, content='listings', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS listings_ai AFTER INSERT ON listings BEGIN
+    INSERT INTO listings_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+END;
+CREATE TRIGGER IF NOT EXISTS listings_ad AFTER DELETE ON listings BEGIN
+    INSERT INTO listings_fts(listings_fts, rowid, title, description)
+    VALUES ('delete', old.id, old.title, old.description);
+END;
+CREATE TRIGGER IF NOT EXISTS listings_au AFTER UPDATE OF title, description ON listings BEGIN
+    INSERT INTO listings_fts(listings_fts, rowid, title, description)
+    VALUES ('delete', old.id, old.title, old.description);
+    INSERT INTO listings_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+END;
+"""
+
+_COLUMNS = "id, ad_id, url, title, price, location, description, image_urls, contact_info"
+
+
+def ad_id_from_url(url: str) -> str | None:
+    """Numerische Anzeigen-ID aus einer Kleinanzeigen-URL (oder None)."""
+    match = _AD_ID_RE.search(url or "")
+    return match.group(1) if match else None
+
+
+def content_hash(ad: AdInfo) -> str:
+    """Hash über Titel, Beschreibung und Ort (ohne Preis, Leerraum normalisiert)."""
+    parts = (_WHITESPACE.sub(" ", text or "").strip().lower() for text in (ad.title, ad.description, ad.location))
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+# Hash ohne Titel, Beschreibung und Ort – taugt nicht zur Duplikaterkennung
+_EMPTY_HASH = content_hash(AdInfo())
+
+
+def _fts_query(text: str, operator: str = "OR") -> str:
+    # Tokens in Anführungszeichen, damit Sonderzeichen keine FTS-Syntax auslösen
+    return f" {operator} ".join(f'"{token}"' for token in tokenize(text))
+
+
+def _row_to_ad(row) -> AdInfo:
+    return AdInfo(title=row[3] or "", price=row[4] or "", location=row[5] or "", description=row[6] or "",
+                  image_urls=json.loads(row[7] or "[]"), contact_info=json.loads(row[8] or "{}"), url=row[2] or "")
+
+
+class ListingStore:
+    """
+    Persistenter Speicher für `AdInfo`-Datensätze.
+    `upsert`/`upsert_many` liefern pro Anzeige "new", "updated" oder "unchanged".
+    """
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(_SCHEMA)
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM listings").fetchone()[0]
+
+    # --- Schreiben --------------------------------------------------------
+    def upsert(self, ad: AdInfo, seen_at: float = None) -> str:
+        return self.upsert_many([ad], seen_at=seen_at)[0]
+
+    def upsert_many(self, ads: Iterable[AdInfo], batch_size: int = DEFAULT_BATCH_SIZE,
+                    seen_at: float = None) -> list:
+        """
+        Schreibt viele Anzeigen; je `batch_size` Anzeigen teilen sich eine
+        Transaktion (ein fsync statt einem pro Zeile).
+        """
+        statuses = []
+        batch = []
+        for ad in ads:
+            batch.append(ad)
+            if len(batch) >= batch_size:
+                statuses += self._write_batch(batch, seen_at or time.time())
+                batch = []
+        if batch:
+            statuses += self._write_batch(batch, seen_at or time.time())
+        return statuses
+
+    def _write_batch(self, ads: list, now: float) -> list:
+        statuses = []
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for ad in ads:
+                    statuses.append(self._upsert_one(ad, now))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return statuses
+
+    def _upsert_one(self, ad: AdInfo, now: float) -> str:
+        ad_id = ad_id_from_url(ad.url)
+        digest = content_hash(ad)
+        price = normalize_price(ad.price)
+        # Ein Lookup für beide Schlüssel; ein Treffer über die Anzeigen-ID hat Vorrang.
+        # Über den Hash nur, wenn eine Seite keine ID hat (nie zwei verschiedene IDs
+        # zusammenlegen) und der Inhalt nicht leer ist.
+        row = self._conn.execute(
+            "SELECT id, price, ad_id, content_hash, 0 AS prio FROM listings WHERE ad_id = ?"
+            " UNION ALL SELECT id, price, ad_id, content_hash, 1 FROM listings"
+            " WHERE content_hash = ? AND (? IS NULL OR ad_id IS NULL)"
+            " ORDER BY prio LIMIT 1",
+            (ad_id, None if digest == _EMPTY_HASH else digest, ad_id),
+        ).fetchone()
+        url = ad.url and normalize_url(ad.url)
+        images = json.dumps(ad.image_urls, ensure_ascii=False)
+        contact = json.dumps(ad.contact_info, ensure_ascii=False)
+        if row is None:
+            cursor = self._conn.execute(
+                "INSERT INTO listings (url, title, price, price_amount, negotiable, location, description,"
+                " image_urls, contact_info, content_hash, ad_id, first_seen, last_seen)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, ad.title, ad.price, price.amount, int(price.negotiable), ad.location, ad.description,
+                 images, contact, digest, ad_id, now, now),
+            )
+            self._conn.execute("INSERT INTO price_history VALUES (?, ?, ?, ?)",
+                               (cursor.lastrowid, ad.price, price.amount, now))
+            return "new"
+        listing_id, old_price, old_ad_id, old_hash, _ = row
+        if old_hash == digest:
+            # Text unverändert: Titel/Beschreibung nicht anfassen (kein FTS-Update per Trigger)
+            self._conn.execute(
+                "UPDATE listings SET url = ?, price = ?, price_amount = ?, negotiable = ?, image_urls = ?,"
+                " contact_info = ?, ad_id = ?, last_seen = ? WHERE id = ?",
+                (url, ad.price, price.amount, int(price.negotiable), images, contact,
+                 old_ad_id or ad_id, now, listing_id),
+            )
+        else:
+            self._conn.execute(
+                "UPDATE listings SET url = ?, title = ?, price = ?, price_amount = ?, negotiable = ?,"
+                " location = ?, description = ?, image_urls = ?, contact_info = ?, content_hash = ?,"
+                " ad_id = ?, last_seen = ? WHERE id = ?",
+                (url, ad.title, ad.price, price.amount, int(price.negotiable), ad.location, ad.description,
+                 images, contact, digest, old_ad_id or ad_id, now, listing_id),
+            )
+        if old_price != ad.price:
+            self._conn.execute("INSERT INTO price_history VALUES (?, ?, ?, ?)",
+                               (listing_id, ad.price, price.amount, now))
+            return "updated"
+        return "unchanged"
+
+    # --- Lesen ------------------------------------------------------------
+    def get(self, ad_id_or_url: str) -> AdInfo | None:
+        """Anzeige per Anzeigen-ID oder URL."""
+        ad_id = ad_id_from_url(ad_id_or_url) or ad_id_or_url
+        row = self._conn.execute(f"SELECT {_COLUMNS} FROM listings WHERE ad_id = ?", (ad_id,)).fetchone()
+        if row is None:
+            row = self._conn.execute(f"SELECT {_COLUMNS} FROM listings WHERE url = ?",
+                                     (normalize_url(ad_id_or_url),)).fetchone()
+        return _row_to_ad(row) if row else None
+
+    def price_history(self, ad_id_or_url: str) -> list:
+        """Preisverlauf als Liste von `(zeitpunkt, preistext, betrag)`, älteste zuerst."""
+        ad_id = ad_id_from_url(ad_id_or_url) or ad_id_or_url
+        return self._conn.execute(
+            "SELECT h.seen_at, h.price, h.price_amount FROM price_history h"
+            " JOIN listings l ON l.id = h.listing_id WHERE l.ad_id = ? OR l.url = ? ORDER BY h.seen_at",
+            (ad_id, normalize_url(ad_id_or_url)),
+        ).fetchall()
+
+    def search(self, text: str, limit: int = 20) -> list:
+        """Volltextsuche über Titel und Beschreibung (Treffer als `AdInfo`, beste zuerst)."""
+        return [ad for ad, _ in self._match(_fts_query(text), limit)]
+
+    def similar(self, ad: AdInfo, limit: int = 20, max_price: float = None) -> list:
+        """
+        Ähnliche Anzeigen zu `ad` als Liste von `(AdInfo, score)` (kleinerer
+        BM25-Score = ähnlicher). Gesucht wird mit den Titel-Tokens; Titeltreffer
+        zählen doppelt so viel wie Treffer in der Beschreibung. Die Anzeige
+        selbst ist nicht enthalten.
+
+        Zuerst werden Anzeigen mit allen Titel-Tokens gesucht (AND – kleine
+        Schnittmenge, schnell auch bei Millionen Zeilen); nur wenn das nicht
+        für `limit` Treffer reicht, wird mit OR aufgefüllt.
+        """
+        exclude = dict(exclude_ad_id=ad_id_from_url(ad.url), exclude_hash=content_hash(ad), max_price=max_price)
+        results = self._match(_fts_query(ad.title, "AND"), limit, **exclude)
+        if len(results) < limit and len(tokenize(ad.title)) > 1:
+            seen = {found.url for found, _ in results}
+            for found, score in self._match(_fts_query(ad.title), limit, **exclude):
+                if found.url not in seen and len(results) < limit:
+                    results.append((found, score))
+        return results
+
+    def _match(self, query: str, limit: int, exclude_ad_id: str = None, exclude_hash: str = None,
+               max_price: float = None) -> list:
+        if not query:
+            return []
+        sql = (f"SELECT {', '.join('l.' + c.strip() for c in _COLUMNS.split(','))},"
+               " bm25(listings_fts, 2.0, 1.0) AS score"
+               " FROM listings_fts JOIN listings l ON l.id = listings_fts.rowid"
+               " WHERE listings_fts MATCH ?")
+        params = [query]
+        if exclude_ad_id:
+            sql += " AND (l.ad_id IS NULL OR l.ad_id != ?)"
+            params.append(exclude_ad_id)
+        if exclude_hash and exclude_hash != _EMPTY_HASH:
+            sql += " AND l.content_hash != ?"
+            params.append(exclude_hash)
+        if max_price is not None:
+            sql += " AND l.price_amount <= ?"
+            params.append(max_price)
+        sql += " ORDER BY score LIMIT ?"
+        params.append(limit)
+        return [(_row_to_ad(row), row[-1]) for row in self._conn.execute(sql, params)]
+
+    def iter_ads(self, batch_size: int = 1000) -> Iterator[AdInfo]:
+        """Alle gespeicherten Anzeigen (z. B. für `logic.market.MarketIndex.from_ads`)."""
+        last_id = 0
+        while True:
+            rows = self._conn.execute(
+                f"SELECT {_COLUMNS} FROM listings WHERE id > ? ORDER BY id LIMIT ?", (last_id, batch_size)
+            ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield _row_to_ad(row)
+            last_id = rows[-1][0]
+
+    def optimize(self):
+        """FTS-Segmente zusammenführen (nach großen Bulk-Imports sinnvoll)."""
+        with self._lock:
+            self._conn.execute("INSERT INTO listings_fts(listings_fts) VALUES ('optimize')")
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def get_default_store() -> ListingStore:
+    """Prozessweit geteilter Speicher unter `data/cache/listings.sqlite3`."""
+    global _default_store
+    if _default_store is None:
+        with _default_lock:
+            if _default_store is None:
+                _default_store = ListingStore()
+    return _default_store
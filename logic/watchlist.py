@@ -0,0 +1,298 @@
+"""
+Beobachtungsliste: gespeicherte Suchen regelmäßig abrufen und Änderungen melden.
+
+- Jede Suche hat ein eigenes Intervall; der nächste Abruf wird mit ±20 %
+  Jitter geplant, damit hunderte Suchen nicht gleichzeitig fällig werden.
+- Ein globales Anfragebudget (`RequestBudget`, Token-Bucket) begrenzt die
+  Abrufe aller Suchen zusammen; fällige Suchen warten in einer Heap-Warteschlange
+  (die am längsten überfällige zuerst).
+- Abrufe sind bedingt (If-None-Match/If-Modified-Since). Ein 304 oder ein
+  unveränderter Body (SHA-1) beendet den Abruf ohne Parsen und Diff.
+- Die Ergebnisse werden mit allen bisher in dieser Suche gesehenen Anzeigen
+  verglichen: unbekannte Anzeige → Ereignis "new", gesunkener Preis →
+  "price_drop". Der erste Abruf einer Suche legt nur den Stand an.
+
+Zustand (Suchen, Validatoren, gesehene Anzeigen) liegt in SQLite unter
+`data/cache/`, sodass ein Neustart nahtlos fortsetzt.
+"""
+import hashlib
+import heapq
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+
+from data.models import AdInfo
+from data.prices import normalize_price
+from logic.fetch import HostRateLimiter, RequestBudget, fetch, get_session
+from logic.http_cache import CACHE_DIR, normalize_url
+from logic.search import parse_search_page
+from logic.store import ad_id_from_url
+
+DEFAULT_DB_PATH = os.path.join(CACHE_DIR, "watchlist.sqlite3")
+DEFAULT_INTERVAL = 10 * 60          # Sekunden zwischen zwei Abrufen einer Suche
+DEFAULT_BUDGET_PER_MINUTE = 30      # Abrufe pro Minute über alle Suchen
+JITTER = 0.2
+MAX_ERROR_BACKOFF = 60 * 60
+SEEN_RETENTION = 30 * 24 * 3600     # Anzeigen, die so lange nicht mehr auftauchten, werden vergessen
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS searches (
+    url TEXT PRIMARY KEY,
+    name TEXT,
+    interval_s REAL,
+    next_due REAL,
+    etag TEXT,
+    last_modified TEXT,
+    body_hash TEXT,
+    last_polled REAL,
+    failures INTEGER DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS seen_ads (
+    search_url TEXT,
+    ad_key TEXT,
+    price TEXT,
+    price_amount REAL,
+    first_seen REAL,
+    last_seen REAL,
+    PRIMARY KEY (search_url, ad_key)
+);
+"""
+
+
+@dataclass(slots=True)
+class WatchEvent:
+    """Neue Anzeige ("new") oder Preissenkung ("price_drop") in einer beobachteten Suche."""
+    kind: str
+    search_url: str
+    ad: AdInfo
+    old_price: float | None = None
+    new_price: float | None = None
+    at: float = field(default_factory=time.time)
+
+
+@dataclass(slots=True)
+class PollResult:
+    """Ergebnis eines Abrufs: status "changed", "unchanged", "not_modified" oder "error"."""
+    search_url: str
+    status: str
+    events: list = field(default_factory=list)
+    ads: int = 0
+    error: str | None = None
+    duration_s: float = 0.0
+
+
+def _ad_key(ad: AdInfo) -> str:
+    return ad_id_from_url(ad.url) or normalize_url(ad.url)
+
+
+class Watchlist:
+    """
+    Verwaltet beobachtete Suchen und ruft sie mit `run()` im Hintergrund ab.
+    `poll()` ruft eine einzelne Suche sofort ab (z. B. für die App).
+    """
+
+    def __init__(self, path: str = DEFAULT_DB_PATH, budget_per_minute: float = DEFAULT_BUDGET_PER_MINUTE,
+                 burst: int = 5, workers: int = 4, per_host_rate: float = 2.0, parser=parse_search_page):
+        self.budget = RequestBudget(budget_per_minute, burst)
+        self.limiter = HostRateLimiter(per_host_rate)
+        self.session = get_session()
+        self.workers = workers
+        self.parser = parser
+        self.stats = {"changed": 0, "unchanged": 0, "not_modified": 0, "error": 0, "events": 0}
+        self._lock = threading.Lock()
+        self._heap = []                # (next_due, url)
+        self._stop = threading.Event()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        for url, next_due in self._conn.execute("SELECT url, next_due FROM searches"):
+            self._heap.append((next_due or 0.0, url))
+        heapq.heapify(self._heap)
+
+    # --- Suchen verwalten -------------------------------------------------
+    def add(self, url: str, interval_s: float = DEFAULT_INTERVAL, name: str = ""):
+        """Beobachtet eine Suche (bestehende Einträge behalten Stand und Validatoren)."""
+        # Erster Abruf leicht gestreut, damit viele neue Suchen nicht im selben Moment starten
+        due = time.time() + random.uniform(0, min(interval_s * JITTER, 30.0))
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO searches (url, name, interval_s, next_due) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET name = excluded.name, interval_s = excluded.interval_s",
+                (url, name, interval_s, due),
+            )
+            if all(entry[1] != url for entry in self._heap):
+                heapq.heappush(self._heap, (due, url))
+
+    def _reschedule(self, url: str, due: float):
+        # Aufruf unter self._lock; ein evtl. noch vorhandener Eintrag (direktes poll()) wird ersetzt
+        if any(entry[1] == url for entry in self._heap):
+            self._heap = [entry for entry in self._heap if entry[1] != url]
+            heapq.heapify(self._heap)
+        heapq.heappush(self._heap, (due, url))
+
+    def remove(self, url: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM searches WHERE url = ?", (url,))
+            self._conn.execute("DELETE FROM seen_ads WHERE search_url = ?", (url,))
+            self._heap = [entry for entry in self._heap if entry[1] != url]
+            heapq.heapify(self._heap)
+
+    def searches(self) -> list:
+        rows = self._conn.execute(
+            "SELECT s.url, s.name, s.interval_s, s.next_due, s.last_polled, s.failures, COUNT(a.ad_key) "
+            "FROM searches s LEFT JOIN seen_ads a ON a.search_url = s.url GROUP BY s.url ORDER BY s.url"
+        ).fetchall()
+        keys = ("url", "name", "interval_s", "next_due", "last_polled", "failures", "seen_ads")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM searches").fetchone()[0]
+
+    # --- Einzelner Abruf --------------------------------------------------
+    def poll(self, url: str) -> PollResult:
+        """Ruft die Suche bedingt ab, vergleicht mit dem letzten Stand und plant den nächsten Abruf."""
+        start = time.perf_counter()
+        row = self._conn.execute(
+            "SELECT interval_s, etag, last_modified, body_hash, last_polled, failures FROM searches WHERE url = ?",
+            (url,),
+        ).fetchone()
+        if row is None:
+            return PollResult(url, "error", error="Suche wird nicht beobachtet")
+        interval_s, etag, last_modified, body_hash, last_polled, failures = row
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        self.budget.acquire()   # zählt auch direkte Aufrufe außerhalb von run()
+        try:
+            response = fetch(url, session=self.session, limiter=self.limiter, retries=1, headers=headers or None)
+            if response.status_code == 304:
+                result = PollResult(url, "not_modified")
+            else:
+                response.raise_for_status()
+                new_hash = hashlib.sha1(response.content).hexdigest()
+                if new_hash == body_hash:
+                    result = PollResult(url, "unchanged")
+                else:
+                    ads = self.parser(response.content, url)
+                    result = PollResult(url, "changed", ads=len(ads))
+                    result.events = self._diff(url, ads, initial=last_polled is None)
+                etag = response.headers.get("ETag") or etag
+                last_modified = response.headers.get("Last-Modified") or last_modified
+                body_hash = new_hash
+            failures = 0
+        except Exception as e:
+            result = PollResult(url, "error", error=str(e) or e.__class__.__name__)
+            failures += 1
+        now = time.time()
+        if failures:
+            delay = min(MAX_ERROR_BACKOFF, interval_s * 2 ** (failures - 1))
+        else:
+            delay = interval_s * random.uniform(1 - JITTER, 1 + JITTER)
+        with self._lock:
+            updated = self._conn.execute(
+                "UPDATE searches SET etag = ?, last_modified = ?, body_hash = ?, last_polled = ?, "
+                "failures = ?, next_due = ? WHERE url = ?",
+                (etag, last_modified, body_hash, now if result.status != "error" else last_polled,
+                 failures, now + delay, url),
+            ).rowcount
+            if updated:   # während des Abrufs entfernte Suchen nicht wieder einplanen
+                self._reschedule(url, now + delay)
+            self.stats[result.status] += 1
+            self.stats["events"] += len(result.events)
+        result.duration_s = time.perf_counter() - start
+        return result
+
+    def _diff(self, url: str, ads: list, initial: bool) -> list:
+        now = time.time()
+        events = []
+        with self._lock:
+            known = {key: amount for key, amount in self._conn.execute(
+                "SELECT ad_key, price_amount FROM seen_ads WHERE search_url = ?", (url,))}
+            rows = []
+            for ad in ads:
+                key = _ad_key(ad)
+                amount = normalize_price(ad.price).amount
+                if key not in known:
+                    if not initial:
+                        events.append(WatchEvent("new", url, ad, new_price=amount))
+                elif amount is not None and known[key] is not None and amount < known[key]:
+                    events.append(WatchEvent("price_drop", url, ad, known[key], amount))
+                known[key] = amount
+                rows.append((url, key, ad.price, amount, now, now))
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT INTO seen_ads VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(search_url, ad_key) DO UPDATE SET "
+                "price = excluded.price, price_amount = excluded.price_amount, last_seen = excluded.last_seen",
+                rows,
+            )
+            self._conn.execute("DELETE FROM seen_ads WHERE search_url = ? AND last_seen < ?",
+                               (url, now - SEEN_RETENTION))
+            self._conn.execute("COMMIT")
+        return events
+
+    # --- Scheduler --------------------------------------------------------
+    def run(self, on_event, max_polls: int = None, on_poll=None):
+        """
+        Ruft fällige Suchen ab, bis `stop()` aufgerufen wird (oder `max_polls`
+        Abrufe erledigt sind). `on_event(WatchEvent)` und `on_poll(PollResult)`
+        laufen im Scheduler-Thread.
+        """
+        self._stop.clear()
+        polls = 0
+        pending = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while not self._stop.is_set() and (max_polls is None or polls < max_polls):
+                if pending:
+                    done, _ = wait(pending, timeout=0 if len(pending) < self.workers else 1.0,
+                                   return_when=FIRST_COMPLETED)
+                    for future in done:
+                        pending.pop(future)
+                        self._deliver(future.result(), on_event, on_poll)
+                    if len(pending) >= self.workers:
+                        continue
+                with self._lock:
+                    due, url = self._heap[0] if self._heap else (None, None)
+                now = time.time()
+                if due is None or due > now:
+                    self._stop.wait(min(1.0, due - now) if due is not None else 1.0)
+                    continue
+                wait_s = self.budget.wait_time()
+                if wait_s > 0:
+                    self._stop.wait(min(wait_s, 1.0))
+                    continue
+                with self._lock:
+                    if not self._heap or self._heap[0][1] != url:
+                        continue
+                    heapq.heappop(self._heap)
+                pending[pool.submit(self.poll, url)] = url
+                polls += 1
+            for future in pending:
+                self._deliver(future.result(), on_event, on_poll)
+
+    def _deliver(self, result: PollResult, on_event, on_poll):
+        if result.status == "error":
+            logging.warning(f"Suche {result.search_url} fehlgeschlagen: {result.error}")
+        for event in result.events:
+            try:
+                on_event(event)
+            except Exception:
+                logging.exception("Fehler im Ereignis-Handler der Beobachtungsliste")
+        if on_poll:
+            on_poll(result)
+
+    def stop(self):
+        self._stop.set()
+
+    def close(self):
+        self.stop()
+        self._conn.close()
@@ -0,0 +1,71 @@
+"""
+Beobachtungsliste ohne Streamlit: gespeicherte Suchen regelmäßig abrufen und
+neue Anzeigen sowie Preissenkungen als JSONL-Zeilen ausgeben.
+
+Aufruf:
+    python watch.py add <such-url> [--interval 600] [--name Fahrräder]
+    python watch.py remove <such-url>
+    python watch.py list
+    python watch.py run [--budget 30] [-o events.jsonl]
+"""
+import argparse
+import json
+import sys
+
+from logic.watchlist import DEFAULT_BUDGET_PER_MINUTE, DEFAULT_INTERVAL, Watchlist
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gespeicherte Kleinanzeigen-Suchen beobachten.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    add = sub.add_parser("add", help="Suche beobachten")
+    add.add_argument("url")
+    add.add_argument("--interval", type=float, default=DEFAULT_INTERVAL, help="Sekunden zwischen Abrufen")
+    add.add_argument("--name", default="")
+    remove = sub.add_parser("remove", help="Suche nicht mehr beobachten")
+    remove.add_argument("url")
+    sub.add_parser("list", help="beobachtete Suchen anzeigen")
+    run = sub.add_parser("run", help="Suchen abrufen, bis Strg+C gedrückt wird")
+    run.add_argument("--budget", type=float, default=DEFAULT_BUDGET_PER_MINUTE, help="Abrufe pro Minute insgesamt")
+    run.add_argument("--workers", type=int, default=4)
+    run.add_argument("-o", "--output", help="Ereignisse zusätzlich an diese JSONL-Datei anhängen")
+    args = parser.parse_args(argv)
+
+    watchlist = Watchlist(budget_per_minute=getattr(args, "budget", DEFAULT_BUDGET_PER_MINUTE),
+                          workers=getattr(args, "workers", 4))
+    if args.command == "add":
+        watchlist.add(args.url, args.interval, args.name)
+        print(f"Beobachte {args.url} (alle {args.interval:.0f} s)")
+    elif args.command == "remove":
+        watchlist.remove(args.url)
+    elif args.command == "list":
+        for search in watchlist.searches():
+            print(f"{search['url']}  {search['name'] or ''}  alle {search['interval_s']:.0f} s · "
+                  f"{search['seen_ads']} Anzeigen bekannt · Fehler in Folge: {search['failures']}")
+    else:
+        out = open(args.output, "a", encoding="utf-8") if args.output else None
+
+        def on_event(event):
+            record = {"kind": event.kind, "search": event.search_url, "url": event.ad.url, "title": event.ad.title,
+                      "price": event.ad.price, "old_price": event.old_price, "new_price": event.new_price,
+                      "at": event.at}
+            line = json.dumps(record, ensure_ascii=False)
+            print(line, flush=True)
+            if out:
+                out.write(line + "\n")
+                out.flush()
+
+        print(f"{len(watchlist)} Suchen, höchstens {args.budget:g} Abrufe/min", file=sys.stderr)
+        try:
+            watchlist.run(on_event)
+        except KeyboardInterrupt:
+            watchlist.stop()
+        finally:
+            if out:
+                out.close()
+        print(f"Abrufe: {watchlist.stats}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())